@@ -54,8 +54,19 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.querycount.QueryBudgetMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
+    'core.tracing.TracingMiddleware',
 ]
 
+# Log requests that exceed their query budget (core.querycount.QUERY_BUDGETS).
+QUERY_BUDGET_LOGGING = os.getenv("QUERY_BUDGET_LOGGING", "0") == "1"
+
+# Per-phase spans reported in a Server-Timing header (core.tracing); a
+# TRACE_SAMPLE_RATE fraction of traced requests is also logged as JSON.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0") == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+
 ROOT_URLCONF = 'buggy_project.urls'
 
 TEMPLATES = [
@@ -100,6 +111,24 @@ else:
     }
 
 
+AUTHENTICATION_BACKENDS = [
+    'core.backends.PooledPasswordBackend',
+]
+
+# Password hashing runs in a per-worker process pool (0 = hash on the request thread).
+PASSWORD_HASH_POOL_SIZE = int(os.getenv("PASSWORD_HASH_POOL_SIZE", "2"))
+PASSWORD_HASH_TIMEOUT_S = float(os.getenv("PASSWORD_HASH_TIMEOUT_S", "10"))
+# Large routing plans (bulk assignment over a big fleet) run in a per-worker process
+# pool (0 = always plan on the request thread); plans under ROUTING_POOL_MIN_WORK
+# candidate simulations stay inline.
+ROUTING_POOL_SIZE = int(os.getenv("ROUTING_POOL_SIZE", "2"))
+ROUTING_POOL_MIN_WORK = int(os.getenv("ROUTING_POOL_MIN_WORK", "2000"))
+ROUTING_POOL_TIMEOUT_S = float(os.getenv("ROUTING_POOL_TIMEOUT_S", "30"))
+# Logins allowed in flight per worker; extra ones wait up to LOGIN_ADMISSION_TIMEOUT_S, then get 429.
+LOGIN_MAX_CONCURRENT = int(os.getenv("LOGIN_MAX_CONCURRENT", "4"))
+LOGIN_ADMISSION_TIMEOUT_S = float(os.getenv("LOGIN_ADMISSION_TIMEOUT_S", "5"))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -150,7 +179,7 @@ CORS_ALLOW_ALL_ORIGINS = True
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -160,4 +189,33 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=12),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
+    "TOKEN_OBTAIN_SERIALIZER": "core.authentication.ClaimsTokenObtainPairSerializer",
+    "TOKEN_USER_CLASS": "core.authentication.ClaimsUser",
 }
+
+# Seconds a per-process cached user (role, assigned buggy) stays valid.
+USER_CACHE_TTL_S = int(os.getenv("USER_CACHE_TTL_S", "30"))
+
+# Prometheus metrics (GET /metrics). With several gunicorn workers, point
+# PROMETHEUS_METRICS_DIR at a directory shared by them; each worker writes its
+# values there and a scrape sums them. gunicorn.conf.py empties it on start and
+# folds exited workers' files into one.
+PROMETHEUS_METRICS_ENABLED = os.getenv("PROMETHEUS_METRICS_ENABLED", "1") == "1"
+PROMETHEUS_METRICS_DIR = os.getenv("PROMETHEUS_METRICS_DIR", "")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Rows fetched per server-side cursor round trip by the history exports.
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# Completed rides older than this move to the history tables (archive_rides command).
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+
+# rides/create-and-assign/: "sync" assigns before answering (201); "async" answers
+# 202 and leaves assignment to `manage.py assignment_worker`. Clients can also
+# ask for async per request with a "Prefer: respond-async" header.
+RIDE_ASSIGNMENT_MODE = os.getenv("RIDE_ASSIGNMENT_MODE", "sync")
+# A claimed job whose worker hasn't finished it after this long is claimed again.
+ASSIGNMENT_LEASE_S = float(os.getenv("ASSIGNMENT_LEASE_S", "60"))
+ASSIGNMENT_MAX_ATTEMPTS = int(os.getenv("ASSIGNMENT_MAX_ATTEMPTS", "5"))
+# Re-plans when the chosen buggy's route changed between scoring and locking it.
+ASSIGNMENT_CONFLICT_RETRIES = int(os.getenv("ASSIGNMENT_CONFLICT_RETRIES", "3"))
@@ -16,10 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView
+from core.views import LoginView, prometheus_metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
-    path("api/auth/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("api/auth/login/", LoginView.as_view(), name="token_obtain_pair"),
     path("api/", include("core.urls")),
+    path("metrics", prometheus_metrics, name="prometheus-metrics"),
 ]
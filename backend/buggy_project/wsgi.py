@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'buggy_project.settings')
 
 application = get_wsgi_application()
+
+# start the routing planners with the worker, not on the first large batch
+from core.services import routing_pool  # noqa: E402
+routing_pool.warm()
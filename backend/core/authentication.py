@@ -0,0 +1,95 @@
+from typing import Optional
+
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from core.models import Buggy
+from core.services import user_cache
+
+ROLE_CLAIM = "role"
+BUGGY_CLAIM = "buggy_id"
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Embed the username, role and assigned buggy in issued tokens."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["username"] = user.username
+        token[ROLE_CLAIM] = user.role
+        token[BUGGY_CLAIM] = Buggy.objects.filter(driver=user).values_list("id", flat=True).first()
+        return token
+
+
+class ClaimsUser(TokenUser):
+    """
+    Stateless user built from token claims.
+
+    Tokens issued before role claims existed carry only the user id; for
+    those the role and buggy come from the per-process user cache instead.
+    """
+
+    def __init__(self, token, principal: Optional[user_cache.Principal] = None):
+        super().__init__(token)
+        self._principal = principal
+
+    @cached_property
+    def username(self) -> str:
+        if self._principal is not None:
+            return self._principal.username
+        return self.token.get("username", "")
+
+    @cached_property
+    def role(self) -> Optional[str]:
+        if self._principal is not None:
+            return self._principal.role
+        return self.token.get(ROLE_CLAIM)
+
+    @cached_property
+    def assigned_buggy_id(self) -> Optional[int]:
+        if self._principal is not None:
+            return self._principal.buggy_id
+        return self.token.get(BUGGY_CLAIM)
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """JWT authentication that trusts role claims and never loads the User row on the hot path."""
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if ROLE_CLAIM in validated_token:
+            return user
+
+        principal = user_cache.get_principal(user.id)
+        if principal is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        return ClaimsUser(validated_token, principal=principal)
+
+
+def get_assigned_buggy_id(user, *, verify: bool = False) -> Optional[int]:
+    """
+    Return the id of the buggy assigned to ``user``.
+
+    Read endpoints use the token claim. Endpoints that change route state,
+    and the driver's route they act on, pass ``verify=True`` to check the
+    assignment against the user cache, which is invalidated whenever drivers
+    or buggies are edited, so a driver moved to another buggy can't keep
+    reading or acting on the old one.
+    """
+    if isinstance(user, ClaimsUser) and not verify:
+        return user.assigned_buggy_id
+    principal = user_cache.get_principal(user.pk)
+    return principal.buggy_id if principal else None
+
+
+def get_role(user, *, verify: bool = False) -> Optional[str]:
+    if isinstance(user, ClaimsUser) and not verify:
+        return user.role
+    if not verify:
+        return getattr(user, "role", None)
+    principal = user_cache.get_principal(user.pk)
+    return principal.role if principal else None
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from core.services import passwords
+
+UserModel = get_user_model()
+
+
+class PooledPasswordBackend(ModelBackend):
+    """ModelBackend that verifies passwords in the hashing pool instead of the request thread."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown usernames take as long as wrong passwords.
+            passwords.make_password(password)
+            return None
+
+        if not passwords.check_password(password, user.password) or not self.user_can_authenticate(user):
+            return None
+
+        if passwords.must_update(user.password):
+            user.password = passwords.make_password(password)
+            user.save(update_fields=["password"])
+        return user
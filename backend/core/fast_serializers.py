@@ -0,0 +1,157 @@
+"""
+Fast read path for high-volume list endpoints.
+
+The DRF serializers in ``core.serializers`` build field objects and
+OrderedDicts for every nested row. The mappers below fetch flat tuples with
+``values_list()`` and turn them into plain dicts with closures compiled once
+at import time. Their output must stay byte-identical to the matching DRF
+serializer (see ``core/tests/test_fast_serializers.py``).
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from rest_framework import serializers
+
+from core.models import Buggy, RideRequest
+
+# Reuse DRF's own field so timezone handling and "Z" suffixing match exactly.
+_datetime = serializers.DateTimeField().to_representation
+
+# A spec is a sequence of entries:
+#   "name"                      -> plain column copied as-is
+#   ("name", converter)         -> column passed through ``converter``
+#   ("name", "lookup")          -> column fetched from ``lookup`` (e.g. "ride_request__public_code")
+#   ("name", [nested spec])     -> nested object, ``None`` when its id is NULL;
+#                                  nested specs must start with "id"
+POI_SPEC = ["id", "code", "name"]
+
+BUGGY_SPEC = [
+    "id",
+    "code",
+    "display_name",
+    "capacity",
+    "status",
+    ("current_poi", POI_SPEC),
+    "current_onboard_guests",
+]
+
+RIDE_SPEC = [
+    "id",
+    "public_code",
+    ("pickup_poi", POI_SPEC),
+    ("dropoff_poi", POI_SPEC),
+    "num_guests",
+    "room_number",
+    "guest_name",
+    "status",
+    ("assigned_buggy", BUGGY_SPEC),
+    ("requested_at", _datetime),
+    ("assigned_at", _datetime),
+    ("pickup_completed_at", _datetime),
+    ("dropoff_completed_at", _datetime),
+]
+
+ROUTE_STOP_SPEC = [
+    "id",
+    "stop_type",
+    "status",
+    "sequence_index",
+    ("poi", POI_SPEC),
+    ("ride_request_code", "ride_request__public_code"),
+    ("num_guests", "ride_request__num_guests"),
+]
+
+
+class RowMapper:
+    """Compile a field spec into a function mapping a ``values_list()`` row to a dict."""
+
+    def __init__(self, spec: Sequence[Any]):
+        self.columns: List[str] = []
+        self._map = self._compile(spec, prefix="")
+
+    def _compile(self, spec: Sequence[Any], prefix: str) -> Callable[[Tuple], dict]:
+        entries = []
+        for entry in spec:
+            if isinstance(entry, str):
+                entries.append((entry, self._add_column(prefix + entry), None, None))
+                continue
+            name, target = entry
+            if isinstance(target, str):
+                entries.append((name, self._add_column(target), None, None))
+            elif callable(target):
+                entries.append((name, self._add_column(prefix + name), target, None))
+            else:
+                assert target[0] == "id", "nested specs must start with 'id'"
+                nested_prefix = f"{prefix}{name}__"
+                id_index = len(self.columns)
+                nested = self._compile(target, nested_prefix)
+                entries.append((name, id_index, None, nested))
+
+        def map_row(row: Tuple) -> dict:
+            out = {}
+            for name, index, convert, nested in entries:
+                if nested is not None:
+                    out[name] = nested(row) if row[index] is not None else None
+                elif convert is not None:
+                    out[name] = convert(row[index])
+                else:
+                    out[name] = row[index]
+            return out
+
+        return map_row
+
+    def _add_column(self, lookup: str) -> int:
+        self.columns.append(lookup)
+        return len(self.columns) - 1
+
+    def map_rows(self, rows: Iterable[Tuple]) -> List[dict]:
+        map_row = self._map
+        return [map_row(row) for row in rows]
+
+    def map_queryset(self, queryset) -> List[dict]:
+        return self.map_rows(queryset.values_list(*self.columns))
+
+    def map_instance(self, instance) -> dict:
+        """Map an already-loaded model instance, following relations like the serializer would."""
+        return self._map(tuple(_resolve(instance, lookup) for lookup in self.columns))
+
+
+def _resolve(instance, lookup: str):
+    value = instance
+    for part in lookup.split("__"):
+        if value is None:
+            return None
+        value = getattr(value, part)
+    return value
+
+
+poi_mapper = RowMapper(POI_SPEC)
+buggy_mapper = RowMapper(BUGGY_SPEC)
+ride_mapper = RowMapper(RIDE_SPEC)
+route_stop_mapper = RowMapper(ROUTE_STOP_SPEC)
+
+
+def ride_with_assignment_data(ride: RideRequest, buggy: Buggy) -> dict:
+    """Fast equivalent of ``RideWithAssignmentSerializer({"ride": ride, "assigned_buggy": buggy}).data``."""
+    return {
+        "ride": ride_mapper.map_instance(ride),
+        "assigned_buggy": buggy_mapper.map_instance(buggy),
+    }
+
+
+def add_ride_etas(rows: List[dict], etas: Dict[int, Any]) -> List[dict]:
+    """Add ``pickup_eta`` and ``dropoff_eta`` to mapped rides, from ``core.services.eta.for_buggies``."""
+    for row in rows:
+        buggy_etas = etas.get(row["assigned_buggy"]["id"]) if row["assigned_buggy"] else None
+        pickup, dropoff = buggy_etas.rides.get(row["id"], (None, None)) if buggy_etas else (None, None)
+        row["pickup_eta"] = _datetime(pickup) if pickup else None
+        row["dropoff_eta"] = _datetime(dropoff) if dropoff else None
+    return rows
+
+
+def add_stop_etas(rows: List[dict], etas: Optional[Any]) -> List[dict]:
+    """Add ``eta`` to mapped route stops of one buggy, from its ``core.services.eta.BuggyEtas``."""
+    stops = etas.stops if etas else {}
+    for row in rows:
+        at = stops.get(row["id"])
+        row["eta"] = _datetime(at) if at else None
+    return rows
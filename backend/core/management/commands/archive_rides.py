@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.services import archive
+
+
+class Command(BaseCommand):
+    help = "Move completed rides and their route stops into the history tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days", type=int, help="Archive rides completed before this many days ago "
+            "(default: ARCHIVE_AFTER_DAYS)",
+        )
+        parser.add_argument("--batch-size", type=int, default=archive.DEFAULT_BATCH_SIZE)
+        parser.add_argument("--max-batches", type=int, help="Stop after this many batches; rerun to continue")
+
+    def handle(self, *args, **options):
+        cutoff = None
+        if options["older_than_days"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+        moved = archive.archive_completed(
+            cutoff, batch_size=options["batch_size"], max_batches=options["max_batches"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} rides"))
@@ -0,0 +1,46 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from core.services import assignment_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Assign rides queued by rides/create-and-assign/ in async mode. Run as many processes as needed; "
+        "each runs --threads workers claiming jobs from the database queue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=1)
+        parser.add_argument("--poll-interval", type=float, default=assignment_queue.DEFAULT_POLL_INTERVAL_S,
+                            help="Seconds to wait when the queue is empty")
+        parser.add_argument("--batch-size", type=int, default=10, help="Jobs claimed at a time per thread")
+        parser.add_argument("--once", action="store_true", help="Drain the due jobs once and exit")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            total = 0
+            while ran := assignment_queue.work(limit=options["batch_size"]):
+                total += ran
+            self.stdout.write(self.style.SUCCESS(f"Ran {total} assignment jobs"))
+            return
+
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+        threads = [
+            threading.Thread(
+                target=assignment_queue.run_worker,
+                args=(stop, options["poll_interval"], options["batch_size"]),
+                name=f"assign-{i}",
+            )
+            for i in range(options["threads"])
+        ]
+        for t in threads:
+            t.start()
+        self.stdout.write(f"{len(threads)} assignment worker thread(s) running; Ctrl-C to stop")
+        for t in threads:
+            while t.is_alive():
+                t.join(0.5)
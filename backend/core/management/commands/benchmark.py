@@ -0,0 +1,74 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import benchmarks
+
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+
+
+class Command(BaseCommand):
+    help = (
+        "Time graph loading, shortest paths, route simulation, assignment per fleet size, the rides list "
+        "serializer and driver stop transitions on a synthetic resort (in a scratch database); "
+        "write JSON results and compare them with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pois", type=int, default=500)
+        parser.add_argument("--fleet-sizes", default=",".join(str(n) for n in benchmarks.DEFAULT_FLEET_SIZES),
+                            help="Comma-separated active fleet sizes for assignment, e.g. 10,50,200")
+        parser.add_argument("--list-rides", type=int, default=100, help="Rides rendered by the list benchmark")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--only", help="Run only benchmarks whose name contains this")
+        parser.add_argument("--output", "-o", help="Write the results JSON to this file")
+        parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                            help=f"Baseline JSON (default: {DEFAULT_BASELINE})")
+        parser.add_argument("--threshold", type=float, default=benchmarks.DEFAULT_THRESHOLD,
+                            help="Flag medians this much slower than the baseline (0.2 = 20%%)")
+        parser.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+        parser.add_argument("--fail-on-regression", action="store_true",
+                            help="Exit with an error if any benchmark is flagged")
+
+    def handle(self, *args, **options):
+        try:
+            fleet_sizes = sorted({int(n) for n in options["fleet_sizes"].split(",") if n.strip()})
+        except ValueError:
+            raise CommandError("--fleet-sizes must be comma-separated integers")
+        if not fleet_sizes or min(fleet_sizes) < 1:
+            raise CommandError("--fleet-sizes must be positive")
+
+        dataset = benchmarks.Dataset(
+            pois=options["pois"], fleet_sizes=fleet_sizes, list_rides=options["list_rides"], seed=options["seed"]
+        )
+        try:
+            report = benchmarks.run_benchmarks(dataset, iterations=options["iterations"], only=options["only"])
+        except benchmarks.BenchmarkError as e:
+            raise CommandError(str(e))
+
+        baseline_path = options["baseline"]
+        if os.path.exists(baseline_path) and not options["update_baseline"]:
+            baseline = benchmarks.load_report(baseline_path)
+            if baseline.get("dataset") != report["dataset"]:
+                self.stderr.write(self.style.WARNING(
+                    f"Baseline was measured on a different dataset: {baseline.get('dataset')}"
+                ))
+            report["comparison"] = benchmarks.compare(report, baseline, options["threshold"])
+        if options["output"]:
+            benchmarks.save_report(report, options["output"])
+            self.stderr.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+        if options["update_baseline"]:
+            benchmarks.save_report(report, baseline_path)
+            self.stderr.write(self.style.SUCCESS(f"Updated baseline {baseline_path}"))
+
+        self.stdout.write(json.dumps(report, indent=2))
+        slower = [row for row in report.get("comparison", []) if row["status"] == "slower"]
+        for row in slower:
+            self.stderr.write(self.style.WARNING(
+                f"{row['benchmark']}: {row['median_ms']} ms vs {row['baseline_median_ms']} ms baseline "
+                f"({row['ratio']}x)"
+            ))
+        if slower and options["fail_on_regression"]:
+            raise CommandError(f"{len(slower)} benchmark(s) slower than the baseline")
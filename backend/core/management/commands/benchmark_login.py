@@ -0,0 +1,110 @@
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import User
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login latency (p50/p95) against a running server while dashboards poll, "
+        "e.g. a shift change where many drivers log in at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://localhost:8000/api")
+        parser.add_argument("--logins", type=int, default=30, help="Drivers logging in at the same time")
+        parser.add_argument("--pollers", type=int, default=10, help="Dashboards polling /rides/ meanwhile")
+        parser.add_argument("--poll-interval", type=float, default=0.5)
+        parser.add_argument("--password", default="bench-driver")
+
+    def handle(self, *args, **options):
+        base_url = options["base_url"].rstrip("/")
+        usernames = self._ensure_users(options["logins"], options["password"])
+
+        token = self._login(base_url, usernames[0], options["password"])[1]
+        if not token:
+            raise CommandError(f"Could not log in against {base_url}")
+
+        stop = threading.Event()
+        poll_latencies = []
+        pollers = [
+            threading.Thread(
+                target=self._poll,
+                args=(f"{base_url}/rides/", token, options["poll_interval"], stop, poll_latencies),
+                daemon=True,
+            )
+            for _ in range(options["pollers"])
+        ]
+        for t in pollers:
+            t.start()
+        time.sleep(1)  # let polling reach a steady state
+
+        with ThreadPoolExecutor(max_workers=len(usernames)) as pool:
+            results = list(pool.map(lambda u: self._login(base_url, u, options["password"]), usernames))
+
+        stop.set()
+        for t in pollers:
+            t.join()
+
+        login_latencies = [latency for latency, tok, _ in results if tok]
+        statuses = [code for _, _, code in results]
+        self.stdout.write(json.dumps({
+            "logins": len(results),
+            "login_ok": len(login_latencies),
+            "login_statuses": {str(c): statuses.count(c) for c in sorted(set(statuses))},
+            "login_p50_ms": self._ms(statistics.median(login_latencies) if login_latencies else None),
+            "login_p95_ms": self._ms(_percentile(login_latencies, 95)),
+            "poll_requests": len(poll_latencies),
+            "poll_p50_ms": self._ms(statistics.median(poll_latencies) if poll_latencies else None),
+            "poll_p95_ms": self._ms(_percentile(poll_latencies, 95)),
+        }, indent=2))
+
+    def _ms(self, seconds):
+        return None if seconds is None else round(seconds * 1000, 1)
+
+    def _ensure_users(self, count, password):
+        usernames = [f"bench_driver_{i}" for i in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+        for username in usernames:
+            if username not in existing:
+                User.objects.create_user(username=username, password=password, role=User.Role.DRIVER)
+        return usernames
+
+    def _login(self, base_url, username, password):
+        body = json.dumps({"username": username, "password": password}).encode()
+        req = urllib.request.Request(
+            f"{base_url}/auth/login/", data=body, headers={"Content-Type": "application/json"}
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                token = json.loads(resp.read())["access"]
+                return time.perf_counter() - start, token, resp.status
+        except urllib.error.HTTPError as exc:
+            return time.perf_counter() - start, None, exc.code
+
+    def _poll(self, url, token, interval, stop, latencies):
+        req = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=60) as resp:
+                    resp.read()
+                latencies.append(time.perf_counter() - start)
+            except urllib.error.URLError:
+                pass
+            stop.wait(interval)
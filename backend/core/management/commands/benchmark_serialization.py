@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from core import fast_serializers
+from core.models import Buggy, POI, RideRequest
+from core.renderers import FastJSONRenderer
+from core.serializers import RideRequestSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare the DRF serializer and the fast read path for the rides list (runs in a rolled-back transaction)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rides", type=int, default=100, help="Number of rides to render")
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._seed(options["rides"])
+            qs = (
+                RideRequest.objects
+                .select_related("pickup_poi", "dropoff_poi", "assigned_buggy", "assigned_buggy__current_poi")
+                .order_by("-requested_at")[:options["rides"]]
+            )
+            iterations = options["iterations"]
+
+            drf_s = self._time(iterations, lambda: JSONRenderer().render(RideRequestSerializer(qs.all(), many=True).data))
+            fast_s = self._time(
+                iterations,
+                lambda: FastJSONRenderer().render(fast_serializers.ride_mapper.map_queryset(qs.all())),
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"DRF serializer: {drf_s * 1000:.2f} ms/request")
+        self.stdout.write(f"Fast read path: {fast_s * 1000:.2f} ms/request")
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {drf_s / fast_s:.1f}x"))
+
+    def _time(self, iterations, fn):
+        fn()  # warm up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        return (time.perf_counter() - start) / iterations
+
+    def _seed(self, count):
+        a = POI.objects.create(code="BENCH_A", name="Bench A")
+        b = POI.objects.create(code="BENCH_B", name="Bench B")
+        buggy = Buggy.objects.create(code="BENCH_BUGGY", display_name="Bench Buggy", current_poi=a)
+        rides = []
+        for i in range(count):
+            ride = RideRequest(pickup_poi=a, dropoff_poi=b, num_guests=2, assigned_buggy=buggy if i % 2 else None)
+            ride.assign_public_code()
+            rides.append(ride)
+        RideRequest.objects.bulk_create(rides)
@@ -0,0 +1,46 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import exports
+from core.services.metrics import day_bucket
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream ride or route-stop history to a CSV/NDJSON file (or stdout). "
+        "--from/--to select [from, to) by local midnight, as the export API does: --to is not included."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=sorted(exports.DATASETS))
+        parser.add_argument("--format", dest="fmt", choices=exports.FORMATS, default=exports.FORMAT_CSV)
+        parser.add_argument("--columns", help="Comma-separated column names (default: all)")
+        parser.add_argument("--from", dest="start", type=date.fromisoformat, help="First day included (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="end", type=date.fromisoformat, help="First day not included (YYYY-MM-DD)")
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output")
+        parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+
+    def handle(self, *args, **options):
+        columns = [c.strip() for c in (options["columns"] or "").split(",") if c.strip()]
+        start = day_bucket(options["start"]) if options["start"] else None
+        end = day_bucket(options["end"]) if options["end"] else None
+        if start and end and start >= end:
+            raise CommandError("--from must be before --to")
+        try:
+            chunks = exports.stream_export(
+                options["dataset"], options["fmt"], columns, start, end, gzip=options["gzip"]
+            )
+        except exports.ExportError as e:
+            raise CommandError(str(e))
+
+        if options["output"]:
+            with open(options["output"], "wb") as out:
+                written = sum(out.write(chunk) for chunk in chunks)
+            self.stderr.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
+        else:
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
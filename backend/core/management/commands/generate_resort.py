@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.services import synthetic
+from core.services.metrics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load a synthetic resort (POIs, sparse edges, buggies, drivers and ride/stop history) "
+        "for benchmarks and scaling tests. Deterministic for a given size and seed."
+    )
+
+    def add_arguments(self, parser):
+        defaults = synthetic.ResortSpec()
+        parser.add_argument("--pois", type=int, default=defaults.pois)
+        parser.add_argument("--buggies", type=int, default=defaults.buggies)
+        parser.add_argument("--drivers", type=int, default=defaults.drivers)
+        parser.add_argument("--active-ratio", type=float, default=defaults.active_ratio,
+                            help="Share of buggies that are ACTIVE")
+        parser.add_argument("--days", type=int, default=defaults.days, help="Days of completed ride history")
+        parser.add_argument("--rides-per-day", type=int, default=defaults.rides_per_day)
+        parser.add_argument("--open-rides-per-buggy", type=int, default=defaults.open_rides_per_buggy,
+                            help="Assigned rides left on each active buggy's route")
+        parser.add_argument("--seed", type=int, default=defaults.seed)
+        parser.add_argument("--prefix", default=defaults.prefix,
+                            help="Tag for generated codes and usernames (1-3 letters or digits)")
+        parser.add_argument("--password", default=defaults.driver_password, help="Password for every driver")
+        parser.add_argument("--chunk-size", type=int, default=synthetic.DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--replace", action="store_true",
+                            help="First delete data previously generated with this prefix")
+        parser.add_argument("--with-metrics", action="store_true",
+                            help="Rebuild metrics rollups and sketches for the generated days")
+
+    def handle(self, *args, **options):
+        spec = synthetic.ResortSpec(
+            pois=options["pois"],
+            buggies=options["buggies"],
+            drivers=options["drivers"],
+            active_ratio=options["active_ratio"],
+            days=options["days"],
+            rides_per_day=options["rides_per_day"],
+            open_rides_per_buggy=options["open_rides_per_buggy"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+            driver_password=options["password"],
+        )
+        started = time.perf_counter()
+        if options["replace"]:
+            synthetic.clear_resort(spec.prefix)
+        try:
+            out = synthetic.generate_resort(spec, chunk_size=options["chunk_size"])
+        except synthetic.SyntheticDataError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"Created {out.pois} POIs, {out.edges} edges, {out.drivers} drivers, {out.buggies} buggies, "
+            f"{out.rides} rides and {out.stops} stops"
+        )
+        if options["with_metrics"] and out.first_day:
+            written = rebuild_rollups(timezone.localtime(out.first_day).date(), timezone.localdate())
+            self.stdout.write(f"Wrote {written} rollup rows")
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f}s"))
@@ -0,0 +1,66 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services.loadtest import HttpTransport, LoadConfig, LoadTest, LoadTestError, WsgiTransport
+
+
+class Command(BaseCommand):
+    help = (
+        "Run dispatchers creating rides, drivers working their routes and dashboards polling at the same "
+        "time, then report throughput, latency percentiles, error rates and lock waits as JSON."
+    )
+
+    def add_arguments(self, parser):
+        defaults = LoadConfig()
+        parser.add_argument("--transport", choices=["http", "wsgi"], default="wsgi",
+                            help="HTTP against --base-url, or the app in this process (default)")
+        parser.add_argument("--base-url", default="http://localhost:8000/api")
+        parser.add_argument("--duration", type=float, default=defaults.duration_s, help="Seconds to run")
+        parser.add_argument("--dispatchers", type=int, default=defaults.dispatchers)
+        parser.add_argument("--ride-rate", type=float, default=defaults.ride_rate,
+                            help="Rides per second per dispatcher (Poisson arrivals)")
+        parser.add_argument("--bulk-fraction", type=float, default=defaults.bulk_fraction,
+                            help="Share of dispatcher arrivals sent as bulk batches")
+        parser.add_argument("--bulk-size", type=int, default=defaults.bulk_size)
+        parser.add_argument("--drivers", type=int, default=defaults.drivers)
+        parser.add_argument("--driver-interval", type=float, default=defaults.driver_interval_s,
+                            help="Mean seconds between a driver's route polls")
+        parser.add_argument("--dashboards", type=int, default=defaults.dashboards)
+        parser.add_argument("--dashboard-interval", type=float, default=defaults.dashboard_interval_s)
+        parser.add_argument("--seed", type=int, default=defaults.seed)
+        parser.add_argument("--password", help="Password for the load-test users (default: random per run)")
+        parser.add_argument("--allow-writes", action="store_true",
+                            help="Run even though the configured database is not a throwaway one")
+        parser.add_argument("--output", "-o", help="Also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        if options["ride_rate"] <= 0:
+            raise CommandError("--ride-rate must be positive")
+        config = LoadConfig(
+            duration_s=options["duration"],
+            dispatchers=options["dispatchers"],
+            ride_rate=options["ride_rate"],
+            bulk_fraction=options["bulk_fraction"],
+            bulk_size=options["bulk_size"],
+            drivers=options["drivers"],
+            driver_interval_s=options["driver_interval"],
+            dashboards=options["dashboards"],
+            dashboard_interval_s=options["dashboard_interval"],
+            seed=options["seed"],
+        )
+        transport = HttpTransport(options["base_url"]) if options["transport"] == "http" else WsgiTransport()
+
+        try:
+            report = LoadTest(
+                config, transport, password=options["password"], allow_writes=options["allow_writes"]
+            ).run()
+        except LoadTestError as e:
+            raise CommandError(str(e))
+
+        text = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(text + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote report to {options['output']}"))
+        self.stdout.write(text)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Buggy, DispatchRanking
+from core.services import dispatch_table
+from core.services.routing import refresh_dispatch_rankings
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-POI dispatch ranking table for every active buggy"
+
+    def handle(self, *args, **options):
+        dispatch_table.clear()
+        refresh_dispatch_rankings(list(Buggy.objects.filter(status=Buggy.Status.ACTIVE).order_by("id")))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {DispatchRanking.objects.count()} ranking rows"))
@@ -0,0 +1,18 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.services.metrics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild hourly/daily ride metrics rollups from ride history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=date.fromisoformat, help="First day (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Last day (YYYY-MM-DD)")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        written = rebuild_rollups(options["start"], options["end"], chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} rollup rows"))
@@ -0,0 +1,48 @@
+import json
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.services import policies, replay
+from core.services.metrics import day_bucket
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay recorded rides from a date range through assignment policies (in a scratch database), "
+        "against the graph as it was then, and report KPIs and per-ride differences against the recorded "
+        "day as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=date.fromisoformat, required=True,
+                            help="First day (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Last day (default: --from)")
+        parser.add_argument("--policy", action="append", choices=sorted(policies.POLICIES),
+                            help="Policy to replay (repeatable; default: all)")
+        parser.add_argument("--buggies", type=int,
+                            help="Fleet size (default: the buggies that served the recorded rides)")
+        parser.add_argument("--summary-only", action="store_true", help="Leave out per-ride differences")
+        parser.add_argument("--output", "-o", help="Also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        first = options["start"]
+        last = options["end"] or first
+        if last < first:
+            raise CommandError("--to must not be before --from")
+        try:
+            result = replay.replay(
+                day_bucket(first),
+                day_bucket(last + timedelta(days=1)),
+                policy_names=options["policy"],
+                fleet_size=options["buggies"],
+            )
+        except replay.ReplayError as e:
+            raise CommandError(str(e))
+
+        text = json.dumps(replay.report(result, per_ride=not options["summary_only"]), indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(text + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote report to {options['output']}"))
+        self.stdout.write(text)
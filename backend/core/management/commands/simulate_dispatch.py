@@ -0,0 +1,60 @@
+import json
+from datetime import date, datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.services import policies, simulation
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a day of ride requests through an assignment policy (in a scratch database) and "
+        "report guest wait and ride times, fleet utilization and assignment compute time as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--policy", choices=sorted(policies.POLICIES), default=policies.DEFAULT_POLICY)
+        parser.add_argument("--buggies", type=int, help="Fleet size (default: the number of active buggies)")
+        parser.add_argument("--rides-per-hour", type=float, default=40.0,
+                            help="Resort-wide demand, spread evenly over POIs (ignored with --profile)")
+        parser.add_argument("--hours", default="7-23", help="Service hours for --rides-per-hour, e.g. 7-23")
+        parser.add_argument("--profile",
+                            help='JSON file of hourly pickup rates per POI: {"RECEPTION": [24 rates], ...}')
+        parser.add_argument("--date", type=date.fromisoformat, help="Simulated day (default: today)")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", "-o", help="Also write the JSON report to this file")
+
+    def handle(self, *args, **options):
+        profile = None
+        if options["profile"]:
+            with open(options["profile"]) as f:
+                profile = json.load(f)
+            if not all(isinstance(rates, list) and len(rates) == 24 for rates in profile.values()):
+                raise CommandError("Profile values must be lists of 24 hourly rates")
+        try:
+            first, last = (int(h) for h in options["hours"].split("-"))
+        except ValueError:
+            raise CommandError("--hours must look like 7-23")
+
+        day = options["date"] or timezone.localdate()
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        try:
+            result = simulation.simulate_day(
+                profile,
+                rides_per_hour=options["rides_per_hour"],
+                hours=range(first, last),
+                seed=options["seed"],
+                policy=options["policy"],
+                start=start,
+                fleet_size=options["buggies"],
+            )
+        except simulation.SimulationError as e:
+            raise CommandError(str(e))
+
+        text = json.dumps(simulation.summarize(result), indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(text + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote report to {options['output']}"))
+        self.stdout.write(text)
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core.querycount import record_queries
+from core.services import telemetry
+
+
+class RequestMetricsMiddleware:
+    """Record latency, status, query count and DB time per view for /metrics."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROMETHEUS_METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with record_queries(fingerprints=False) as stats:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        # URL names keep the label set small; unmatched paths share one series.
+        view = (match.url_name or match.view_name) if match else "unmatched"
+        telemetry.observe(telemetry.REQUEST_LATENCY, elapsed, view, request.method)
+        telemetry.inc(telemetry.REQUESTS, view, request.method, str(response.status_code))
+        telemetry.observe(telemetry.REQUEST_QUERIES, stats.count, view)
+        telemetry.observe(telemetry.REQUEST_DB_TIME, stats.duration_s, view)
+        return response
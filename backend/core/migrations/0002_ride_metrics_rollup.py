@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideMetricsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('HOUR', 'Hour'), ('DAY', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('dimension', models.CharField(choices=[('POI', 'Pickup POI'), ('BUGGY', 'Buggy')], max_length=10)),
+                ('dimension_id', models.BigIntegerField()),
+                ('ride_count', models.PositiveIntegerField(default=0)),
+                ('wait_sum_ms', models.BigIntegerField(default=0)),
+                ('wait_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('ride_duration_sum_ms', models.BigIntegerField(default=0)),
+                ('ride_duration_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket_start', 'dimension', 'dimension_id'), name='uniq_ride_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_ride_metrics_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideMetricsSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('ASSIGNMENT_WAIT', 'Assignment wait'), ('PICKUP_WAIT', 'Pickup wait'), ('RIDE_DURATION', 'Ride duration')], max_length=20)),
+                ('bucket_start', models.DateTimeField()),
+                ('poi_id', models.BigIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('sketch', models.BinaryField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('metric', 'bucket_start', 'poi_id'), name='uniq_ride_sketch_bucket')],
+            },
+        ),
+    ]
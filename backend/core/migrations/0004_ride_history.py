@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_ride_metrics_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideRequestHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('public_code', models.CharField(db_index=True, max_length=12)),
+                ('num_guests', models.PositiveIntegerField()),
+                ('room_number', models.CharField(blank=True, max_length=20)),
+                ('guest_name', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('ASSIGNED', 'Assigned'), ('PICKING_UP', 'Picking up'), ('IN_PROGRESS', 'In progress'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('requested_at', models.DateTimeField(db_index=True)),
+                ('assigned_at', models.DateTimeField(blank=True, null=True)),
+                ('pickup_completed_at', models.DateTimeField(blank=True, null=True)),
+                ('dropoff_completed_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('assigned_buggy', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.buggy')),
+                ('dropoff_poi', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.poi')),
+                ('pickup_poi', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.poi')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BuggyRouteStopHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('stop_type', models.CharField(choices=[('PICKUP', 'Pickup'), ('DROPOFF', 'Dropoff')], max_length=10)),
+                ('status', models.CharField(choices=[('PLANNED', 'Planned'), ('ON_ROUTE', 'On route'), ('COMPLETED', 'Completed')], max_length=15)),
+                ('sequence_index', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('buggy', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.buggy')),
+                ('poi', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.poi')),
+                ('ride_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='route_stops', to='core.riderequesthistory')),
+            ],
+            options={
+                'ordering': ['sequence_index'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_ride_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='buggy',
+            index=models.Index(fields=['status'], name='buggy_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='buggyroutestop',
+            index=models.Index(fields=['buggy', 'status', 'sequence_index'], name='stop_buggy_status_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='buggyroutestop',
+            index=models.Index(condition=models.Q(('status', 'COMPLETED'), _negated=True), fields=['buggy', 'sequence_index'], name='stop_open_buggy_seq_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(fields=['status', 'requested_at'], name='ride_status_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(fields=['-requested_at'], name='ride_requested_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='riderequest',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'ASSIGNED', 'PICKING_UP', 'IN_PROGRESS'])), fields=['requested_at'], name='ride_open_requested_idx'),
+        ),
+    ]
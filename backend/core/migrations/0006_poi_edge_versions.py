@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:55
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_edge_versions(apps, schema_editor):
+    # Edges that predate versioning are assumed to have always looked like this.
+    PoiEdge = apps.get_model("core", "PoiEdge")
+    PoiEdgeVersion = apps.get_model("core", "PoiEdgeVersion")
+    since = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+    PoiEdgeVersion.objects.bulk_create([
+        PoiEdgeVersion(
+            edge_id=e.id, from_poi_id=e.from_poi_id, to_poi_id=e.to_poi_id,
+            travel_time_s=e.travel_time_s, valid_from=since,
+        )
+        for e in PoiEdge.objects.all()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PoiEdgeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('edge_id', models.BigIntegerField()),
+                ('travel_time_s', models.PositiveIntegerField()),
+                ('valid_from', models.DateTimeField()),
+                ('valid_to', models.DateTimeField(blank=True, null=True)),
+                ('from_poi', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.poi')),
+                ('to_poi', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.poi')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['edge_id', 'valid_to'], name='edge_version_edge_idx'), models.Index(fields=['valid_from'], name='edge_version_from_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_edge_versions, migrations.RunPython.noop),
+    ]
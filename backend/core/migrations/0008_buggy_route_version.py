@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_assignment_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='buggy',
+            name='route_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
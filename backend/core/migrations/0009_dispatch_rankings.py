@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_buggy_route_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DispatchRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('eta_s', models.PositiveIntegerField()),
+                ('route_version', models.PositiveIntegerField()),
+                ('buggy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.buggy')),
+                ('poi', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.poi')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['poi', 'eta_s'], name='dispatch_ranking_poi_eta_idx')],
+                'constraints': [models.UniqueConstraint(fields=('poi', 'buggy'), name='uniq_dispatch_ranking_poi_buggy')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_dispatch_rankings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='buggy',
+            name='route_changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
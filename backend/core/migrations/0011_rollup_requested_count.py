@@ -0,0 +1,30 @@
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_requested(apps, schema_editor):
+    # Before this migration only assigned rides were counted; that is the
+    # best estimate of requests on days that are not rebuilt.
+    Rollup = apps.get_model("core", "RideMetricsRollup")
+    Rollup.objects.filter(dimension="POI").update(requested_count=F("assigned_count"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_buggy_route_changed_at'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='ridemetricsrollup',
+            old_name='ride_count',
+            new_name='assigned_count',
+        ),
+        migrations.AddField(
+            model_name='ridemetricsrollup',
+            name='requested_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_requested, migrations.RunPython.noop),
+    ]
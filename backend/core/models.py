@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 import secrets
 
 
@@ -45,6 +46,27 @@ class PoiEdge(models.Model):
         return f"{self.from_poi.code} <-> {self.to_poi.code} ({self.travel_time_s}s)"
 
 
+class PoiEdgeVersion(models.Model):
+    """
+    One period during which a PoiEdge had these endpoints and travel time,
+    so the graph can be rebuilt as of any past moment (see graph.graph_as_of).
+    Rows outlive their edge and POIs, hence the unconstrained keys.
+    """
+
+    edge_id = models.BigIntegerField()
+    from_poi = models.ForeignKey(POI, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+")
+    to_poi = models.ForeignKey(POI, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+")
+    travel_time_s = models.PositiveIntegerField()
+    valid_from = models.DateTimeField()
+    valid_to = models.DateTimeField(null=True, blank=True)  # null while current
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["edge_id", "valid_to"], name="edge_version_edge_idx"),
+            models.Index(fields=["valid_from"], name="edge_version_from_idx"),
+        ]
+
+
 class Buggy(models.Model):
     class Status(models.TextChoices):
         ACTIVE = "ACTIVE", "Active"
@@ -57,6 +79,12 @@ class Buggy(models.Model):
 
     current_poi = models.ForeignKey(POI, null=True, blank=True, on_delete=models.SET_NULL)
     current_onboard_guests = models.PositiveIntegerField(default=0)
+    # bumped whenever stops are appended or the buggy moves; assignment scores
+    # without locks and only writes if the version it scored is still current
+    route_version = models.PositiveIntegerField(default=0)
+    # when the buggy was last placed at current_poi (a completed stop, or moved by
+    # a manager); projected stop arrivals count from here
+    route_changed_at = models.DateTimeField(default=timezone.now)
 
     driver = models.OneToOneField(
         "core.User",
@@ -66,6 +94,12 @@ class Buggy(models.Model):
         related_name="assigned_buggy",
     )
 
+    class Meta:
+        indexes = [
+            # routing filters the (small) active fleet out of every registered buggy
+            models.Index(fields=["status"], name="buggy_status_idx"),
+        ]
+
     def __str__(self):
         return self.display_name
 
@@ -97,6 +131,19 @@ class RideRequest(models.Model):
     pickup_completed_at = models.DateTimeField(null=True, blank=True)
     dropoff_completed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "requested_at"], name="ride_status_requested_idx"),
+            # RidesListView: newest rides first
+            models.Index(fields=["-requested_at"], name="ride_requested_desc_idx"),
+            # rides still in flight; stays small while history grows
+            models.Index(
+                fields=["requested_at"],
+                condition=models.Q(status__in=["PENDING", "ASSIGNED", "PICKING_UP", "IN_PROGRESS"]),
+                name="ride_open_requested_idx",
+            ),
+        ]
+
     def assign_public_code(self):
         if not self.public_code:
             self.public_code = secrets.token_hex(3).upper()
@@ -132,6 +179,204 @@ class BuggyRouteStop(models.Model):
     class Meta:
         ordering = ["sequence_index"]
         unique_together = [("buggy", "sequence_index")]
+        indexes = [
+            models.Index(fields=["buggy", "status", "sequence_index"], name="stop_buggy_status_seq_idx"),
+            # a buggy's remaining route: exclude(status=COMPLETED).order_by("sequence_index")
+            models.Index(
+                fields=["buggy", "sequence_index"],
+                condition=~models.Q(status="COMPLETED"),
+                name="stop_open_buggy_seq_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.buggy.display_name} [{self.sequence_index}] {self.stop_type} @ {self.poi.code}"
+
+
+class AssignmentJob(models.Model):
+    """
+    A ride waiting to be assigned by a background worker (async mode of
+    RideCreateAndAssignView; see core.services.assignment_queue).
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "QUEUED", "Queued"
+        RUNNING = "RUNNING", "Running"
+        DONE = "DONE", "Done"
+        FAILED = "FAILED", "Failed"
+
+    ride = models.OneToOneField(RideRequest, on_delete=models.CASCADE, related_name="assignment_job")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField()  # not claimed before this (retry backoff)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)  # lease start while RUNNING
+    error_code = models.CharField(max_length=40, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # workers: oldest claimable jobs first
+            models.Index(
+                fields=["status", "available_at"],
+                condition=models.Q(status__in=["QUEUED", "RUNNING"]),
+                name="assignment_job_claim_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.ride.public_code}: {self.status}"
+
+
+class DispatchRanking(models.Model):
+    """
+    How soon a buggy could be at a POI if a ride were appended to its route
+    now, for every active buggy and POI (see core.services.dispatch_table).
+    """
+
+    poi = models.ForeignKey(POI, on_delete=models.CASCADE, related_name="+")
+    buggy = models.ForeignKey(Buggy, on_delete=models.CASCADE, related_name="+")
+    eta_s = models.PositiveIntegerField()
+    route_version = models.PositiveIntegerField()  # the buggy's route_version the row was computed for
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["poi", "buggy"], name="uniq_dispatch_ranking_poi_buggy"),
+        ]
+        indexes = [
+            # best buggies for a pickup: filter(poi=...).order_by("eta_s")
+            models.Index(fields=["poi", "eta_s"], name="dispatch_ranking_poi_eta_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.poi_id} <- {self.buggy_id}: {self.eta_s}s"
+
+
+class RideMetricsRollup(models.Model):
+    """
+    Pre-aggregated ride counters per hour/day, kept per pickup POI and per buggy.
+
+    Rows are bucketed by ``requested_at`` and incremented when a ride is
+    accepted, and in the same transaction as its assignment and completion
+    (see core.services.metrics).
+    """
+
+    class Granularity(models.TextChoices):
+        HOUR = "HOUR", "Hour"
+        DAY = "DAY", "Day"
+
+    class Dimension(models.TextChoices):
+        POI = "POI", "Pickup POI"
+        BUGGY = "BUGGY", "Buggy"
+
+    granularity = models.CharField(max_length=10, choices=Granularity.choices)
+    bucket_start = models.DateTimeField()
+    dimension = models.CharField(max_length=10, choices=Dimension.choices)
+    dimension_id = models.BigIntegerField()  # POI id or Buggy id, kept after deletions
+
+    requested_count = models.PositiveIntegerField(default=0)  # rides requested, assigned or not (POI rows only)
+    assigned_count = models.PositiveIntegerField(default=0)
+    wait_sum_ms = models.BigIntegerField(default=0)  # assigned_at - requested_at
+    wait_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    ride_duration_sum_ms = models.BigIntegerField(default=0)  # dropoff - pickup completion
+    ride_duration_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "bucket_start", "dimension", "dimension_id"],
+                name="uniq_ride_rollup_bucket",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start:%Y-%m-%d %H:00} {self.dimension}={self.dimension_id}"
+
+
+class RideMetricsSketch(models.Model):
+    """Serialized DDSketch of one ride timing metric for one hour and pickup POI."""
+
+    class Metric(models.TextChoices):
+        ASSIGNMENT_WAIT = "ASSIGNMENT_WAIT", "Assignment wait"  # requested -> assigned
+        PICKUP_WAIT = "PICKUP_WAIT", "Pickup wait"              # requested -> picked up
+        RIDE_DURATION = "RIDE_DURATION", "Ride duration"        # picked up -> dropped off
+
+    metric = models.CharField(max_length=20, choices=Metric.choices)
+    bucket_start = models.DateTimeField()  # hour of requested_at
+    poi_id = models.BigIntegerField()      # pickup POI, kept after deletions
+    count = models.PositiveIntegerField(default=0)
+    sketch = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["metric", "bucket_start", "poi_id"], name="uniq_ride_sketch_bucket")
+        ]
+
+    def __str__(self):
+        return f"{self.metric} {self.bucket_start:%Y-%m-%d %H:00} POI={self.poi_id} (n={self.count})"
+
+
+class RideRequestHistory(models.Model):
+    """
+    Archived copy of a completed RideRequest (see core.services.archive).
+
+    Keeps the original id and the same field names, so the same lookups work
+    on both tables. Foreign keys are unconstrained: archived rows must not
+    block deleting a POI or buggy.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    public_code = models.CharField(max_length=12, db_index=True)
+    pickup_poi = models.ForeignKey(
+        POI, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    dropoff_poi = models.ForeignKey(
+        POI, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    num_guests = models.PositiveIntegerField()
+
+    room_number = models.CharField(max_length=20, blank=True)
+    guest_name = models.CharField(max_length=100, blank=True)
+
+    status = models.CharField(max_length=20, choices=RideRequest.Status.choices)
+    assigned_buggy = models.ForeignKey(
+        Buggy, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+
+    requested_at = models.DateTimeField(db_index=True)
+    assigned_at = models.DateTimeField(null=True, blank=True)
+    pickup_completed_at = models.DateTimeField(null=True, blank=True)
+    dropoff_completed_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.public_code} (archived)"
+
+
+class BuggyRouteStopHistory(models.Model):
+    """Archived copy of a completed BuggyRouteStop; moved together with its ride."""
+
+    id = models.BigIntegerField(primary_key=True)
+    buggy = models.ForeignKey(
+        Buggy, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    ride_request = models.ForeignKey(
+        RideRequestHistory, on_delete=models.CASCADE, related_name="route_stops"
+    )
+    stop_type = models.CharField(max_length=10, choices=BuggyRouteStop.StopType.choices)
+    status = models.CharField(max_length=15, choices=BuggyRouteStop.StopStatus.choices)
+
+    poi = models.ForeignKey(POI, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+")
+    sequence_index = models.PositiveIntegerField()
+    created_at = models.DateTimeField(db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["sequence_index"]
+
+    def __str__(self):
+        return f"[{self.sequence_index}] {self.stop_type} (archived)"
@@ -0,0 +1,145 @@
+"""
+Per-request query accounting.
+
+Every route in core/urls.py declares a query budget in QUERY_BUDGETS, keyed
+by URL name. Tests enforce the budgets with ``query_budget()``; in production
+QueryBudgetMiddleware can be switched on (QUERY_BUDGET_LOGGING) to log
+requests that go over budget together with their repeated query shapes,
+which is what an N+1 looks like.
+"""
+from __future__ import annotations
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# URL name -> maximum queries per request, checked by test_query_budgets.
+# Reads must not grow with the number of rows involved, so a loop that
+# queries per row fails them; batch write endpoints are sized for the
+# batches exercised there.
+QUERY_BUDGETS = {
+    "healthz": 0,
+    "auth-me": 0,
+    "pois-list": 1,
+    "pois-next-available": 1,
+    "buggies-list": 1,
+    "rides-list": 3,  # + buggy route versions, open stops of changed buggies (ETAs)
+    "rides-create-and-assign": 23,
+    "rides-bulk-create-and-assign": 35,
+    "rides-assignment-status": 2,
+    "rides-quote": 3,  # POIs, active fleet, their routes on a cache miss
+    "driver-my-route": 3,  # + route version, open stops when it changed (ETAs)
+    "driver-stop-start": 6,
+    "driver-stop-complete": 13,
+    "driver-sync": 21,
+    "metrics-summary": 1,
+    "metrics-percentiles": 2,
+    "export": 2,  # archived + live table
+    "manager-buggy-list": 4,
+    "manager-buggy-detail": 7,
+    "manager-driver-list": 4,
+    "manager-driver-detail": 8,
+    "manager-poi-list": 4,
+    "manager-poi-detail": 12,
+    "manager-poi-edge-list": 7,
+    "manager-poi-edge-detail": 8,  # + closing and opening a PoiEdgeVersion, clearing dispatch rankings
+}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """Normalize a statement to its shape: literals and IN-lists collapsed."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _PLACEHOLDER_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration_s: float = 0.0
+    fingerprints: Counter = field(default_factory=Counter)
+
+    def repeated(self, min_count: int = 2) -> List[Tuple[str, int]]:
+        """Query shapes executed at least ``min_count`` times, most frequent first."""
+        return [(fp, n) for fp, n in self.fingerprints.most_common() if n >= min_count]
+
+
+@contextmanager
+def record_queries(fingerprints: bool = True):
+    """Count and time queries on every configured database while the block runs."""
+    stats = QueryStats()
+
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats.duration_s += time.perf_counter() - start
+            stats.count += 1
+            if fingerprints:
+                stats.fingerprints[fingerprint(sql)] += 1
+
+    with ExitStack() as stack:
+        for alias in settings.DATABASES:
+            stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        yield stats
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _describe(url_name: str, stats: QueryStats, budget: int) -> str:
+    lines = [f"{url_name}: {stats.count} queries (budget {budget})"]
+    lines += [f"  {n}x {fp}" for fp, n in stats.repeated()]
+    return "\n".join(lines)
+
+
+@contextmanager
+def query_budget(url_name: str, budget: Optional[int] = None):
+    """Test helper: fail when the block runs more queries than the route's budget."""
+    budget = QUERY_BUDGETS[url_name] if budget is None else budget
+    with record_queries() as stats:
+        yield stats
+    if stats.count > budget:
+        raise QueryBudgetExceeded(_describe(url_name, stats, budget))
+
+
+class QueryBudgetMiddleware:
+    """Log over-budget requests. Only installed when QUERY_BUDGET_LOGGING is on."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_BUDGET_LOGGING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with record_queries() as stats:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        budget = QUERY_BUDGETS.get(match.url_name) if match else None
+        if budget is not None and stats.count > budget:
+            logger.warning(
+                "Query budget exceeded: %s %s\n%s",
+                request.method,
+                request.path,
+                _describe(match.url_name, stats, budget),
+            )
+        return response
@@ -0,0 +1,39 @@
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+
+
+def _reject(obj):
+    raise TypeError
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer that uses orjson for payloads made only of plain JSON types.
+
+    Anything orjson would encode differently from DRF's encoder (datetimes,
+    decimals, lazy strings, ...) falls back to the stock renderer, so the
+    output bytes are always the same as ``JSONRenderer``.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=_reject,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match JSONRenderer, which always escapes U+2028 and U+2029.
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
@@ -1,30 +1,22 @@
+from django.db import models
+from django.utils import timezone
 from rest_framework import serializers
 from core.models import POI, PoiEdge, Buggy, BuggyRouteStop, RideRequest, User
+from core.services import dispatch_table, graph, passwords
+from core.tracing import span
 
 PLACEHOLDER_PICKUP_CODE = "N/A-PICKUP"
 PLACEHOLDER_DROPOFF_CODE = "N/A-DROPOFF"
 PLACEHOLDER_TRAVEL_TIME_S = 180
 
 
-def _ensure_edge(a: POI, b: POI) -> None:
-    """Create or update an undirected edge between two POIs with the placeholder travel time."""
-    if a.id == b.id:
-        return
-    low, high = (a, b) if a.id < b.id else (b, a)
-    edge, created = PoiEdge.objects.get_or_create(
-        from_poi=low,
-        to_poi=high,
-        defaults={"travel_time_s": PLACEHOLDER_TRAVEL_TIME_S},
-    )
-    if not created and edge.travel_time_s != PLACEHOLDER_TRAVEL_TIME_S:
-        edge.travel_time_s = PLACEHOLDER_TRAVEL_TIME_S
-        edge.save(update_fields=["travel_time_s"])
-
-
 def ensure_placeholder_pois_and_edges():
     """
     Make sure fallback POIs exist and are connected to every POI with a 180s edge.
     Returns the placeholder pickup and dropoff POI instances.
+
+    Existing edges are read in one query and missing or changed ones written
+    in bulk, so the cost doesn't grow with one query per POI.
     """
     na_pickup, _ = POI.objects.get_or_create(
         code=PLACEHOLDER_PICKUP_CODE, defaults={"name": "N/A Pickup"}
@@ -33,11 +25,39 @@ def ensure_placeholder_pois_and_edges():
         code=PLACEHOLDER_DROPOFF_CODE, defaults={"name": "N/A Dropoff"}
     )
 
-    all_pois = list(POI.objects.all())
-    for poi in all_pois:
-        _ensure_edge(na_pickup, poi)
-        _ensure_edge(na_dropoff, poi)
-    _ensure_edge(na_pickup, na_dropoff)
+    placeholder_ids = (na_pickup.id, na_dropoff.id)
+    wanted = set()
+    for poi_id in POI.objects.values_list("id", flat=True):
+        for placeholder_id in placeholder_ids:
+            if poi_id != placeholder_id:
+                # edges are stored once per undirected pair, lower id first
+                wanted.add((min(poi_id, placeholder_id), max(poi_id, placeholder_id)))
+
+    existing = {
+        (e.from_poi_id, e.to_poi_id): e
+        for e in PoiEdge.objects.filter(
+            models.Q(from_poi_id__in=placeholder_ids) | models.Q(to_poi_id__in=placeholder_ids)
+        )
+    }
+    stale = [
+        e for pair, e in existing.items()
+        if pair in wanted and e.travel_time_s != PLACEHOLDER_TRAVEL_TIME_S
+    ]
+    missing = [
+        PoiEdge(from_poi_id=a, to_poi_id=b, travel_time_s=PLACEHOLDER_TRAVEL_TIME_S)
+        for a, b in wanted - existing.keys()
+    ]
+    if stale or missing:
+        for e in stale:
+            e.travel_time_s = PLACEHOLDER_TRAVEL_TIME_S
+        PoiEdge.objects.bulk_update(stale, ["travel_time_s"])
+        PoiEdge.objects.bulk_create(missing, ignore_conflicts=True)
+        # bulk writes skip the post_save signal
+        graph.invalidate()
+        dispatch_table.clear()
+        graph.sync_edge_versions(PoiEdge.objects.filter(
+            models.Q(from_poi_id__in=placeholder_ids) | models.Q(to_poi_id__in=placeholder_ids)
+        ))
 
     return na_pickup, na_dropoff
 
@@ -106,6 +126,41 @@ class RideRequestSerializer(serializers.ModelSerializer):
         ]
 
 
+def _eta(at):
+    return serializers.DateTimeField().to_representation(at) if at else None
+
+
+class RouteStopWithEtaSerializer(BuggyRouteStopSerializer):
+    """Route stop plus its projected arrival. Pass ``context={"etas": eta.for_buggies(...)}``."""
+    eta = serializers.SerializerMethodField()
+
+    class Meta(BuggyRouteStopSerializer.Meta):
+        fields = BuggyRouteStopSerializer.Meta.fields + ["eta"]
+
+    def get_eta(self, stop):
+        etas = self.context.get("etas", {}).get(stop.buggy_id)
+        return _eta(etas.stops.get(stop.id)) if etas else None
+
+
+class RideWithEtaSerializer(RideRequestSerializer):
+    """Ride plus projected pickup and dropoff arrivals. Pass ``context={"etas": eta.for_buggies(...)}``."""
+    pickup_eta = serializers.SerializerMethodField()
+    dropoff_eta = serializers.SerializerMethodField()
+
+    class Meta(RideRequestSerializer.Meta):
+        fields = RideRequestSerializer.Meta.fields + ["pickup_eta", "dropoff_eta"]
+
+    def _arrivals(self, ride):
+        etas = self.context.get("etas", {}).get(ride.assigned_buggy_id)
+        return etas.rides.get(ride.id, (None, None)) if etas else (None, None)
+
+    def get_pickup_eta(self, ride):
+        return _eta(self._arrivals(ride)[0])
+
+    def get_dropoff_eta(self, ride):
+        return _eta(self._arrivals(ride)[1])
+
+
 class RideRequestCreateSerializer(serializers.ModelSerializer):
     pickup_poi_code = serializers.CharField(write_only=True, required=False, allow_blank=True)
     dropoff_poi_code = serializers.CharField(write_only=True, required=False, allow_blank=True)
@@ -143,7 +198,10 @@ class RideRequestCreateSerializer(serializers.ModelSerializer):
         pickup_code = validated_data.pop("pickup_poi_code", "")
         dropoff_code = validated_data.pop("dropoff_poi_code", "")
 
-        na_pickup, na_dropoff = ensure_placeholder_pois_and_edges()
+        na_pickup = na_dropoff = None
+        if not pickup_code or not dropoff_code:
+            with span("placeholders"):
+                na_pickup, na_dropoff = ensure_placeholder_pois_and_edges()
 
         pickup = self._resolve_poi(pickup_code, fallback=na_pickup, field_name="pickup_poi_code")
         dropoff = self._resolve_poi(dropoff_code, fallback=na_dropoff, field_name="dropoff_poi_code")
@@ -156,11 +214,89 @@ class RideRequestCreateSerializer(serializers.ModelSerializer):
         return ride
 
 
+class RideBulkCreateSerializer(serializers.Serializer):
+    """Validate a batch of rides and resolve all of their POI codes with one query."""
+    MAX_RIDES = 100
+
+    rides = RideRequestCreateSerializer(many=True, allow_empty=False, max_length=MAX_RIDES)
+
+    def validate_rides(self, rides):
+        code_fields = ("pickup_poi_code", "dropoff_poi_code")
+        codes = {attrs[field] for attrs in rides for field in code_fields if attrs[field]}
+        self._pois_by_code = {poi.code: poi for poi in POI.objects.filter(code__in=codes)}
+
+        errors = []
+        for attrs in rides:
+            errors.append({
+                field: [f"POI code '{attrs[field]}' not found"]
+                for field in code_fields
+                if attrs[field] and attrs[field] not in self._pois_by_code
+            })
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return rides
+
+    def create(self, validated_data):
+        rides_data = validated_data["rides"]
+        pois = self._pois_by_code
+
+        na_pickup = na_dropoff = None
+        if any(not attrs["pickup_poi_code"] or not attrs["dropoff_poi_code"] for attrs in rides_data):
+            na_pickup, na_dropoff = ensure_placeholder_pois_and_edges()
+
+        rides = []
+        for attrs in rides_data:
+            attrs = dict(attrs)
+            pickup_code = attrs.pop("pickup_poi_code")
+            dropoff_code = attrs.pop("dropoff_poi_code")
+            ride = RideRequest(
+                pickup_poi=pois[pickup_code] if pickup_code else na_pickup,
+                dropoff_poi=pois[dropoff_code] if dropoff_code else na_dropoff,
+                **attrs,
+            )
+            ride.assign_public_code()
+            rides.append(ride)
+        return RideRequest.objects.bulk_create(rides)
+
+
 class RideWithAssignmentSerializer(serializers.Serializer):
     ride = RideRequestSerializer()
     assigned_buggy = BuggySummarySerializer()
 
 
+class DriverStopActionSerializer(serializers.Serializer):
+    stop_id = serializers.IntegerField()
+    action = serializers.ChoiceField(choices=["start", "complete"])
+    recorded_at = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class DriverSyncSerializer(serializers.Serializer):
+    """Ordered, timestamped stop transitions recorded on a driver's device."""
+    MAX_ACTIONS = 200
+
+    actions = DriverStopActionSerializer(many=True, max_length=MAX_ACTIONS)
+
+
+class RideQuoteSerializer(serializers.Serializer):
+    """Query parameters of a ride quote; resolves both POI codes with one query."""
+    MAX_K = 10
+
+    pickup_poi_code = serializers.CharField()
+    dropoff_poi_code = serializers.CharField()
+    num_guests = serializers.IntegerField(min_value=1)
+    k = serializers.IntegerField(min_value=1, max_value=MAX_K, required=False)
+
+    def validate(self, attrs):
+        codes = {field: attrs[field].strip().upper() for field in ("pickup_poi_code", "dropoff_poi_code")}
+        ids = dict(POI.objects.filter(code__in=set(codes.values())).values_list("code", "id"))
+        missing = {field: f"POI code '{code}' not found" for field, code in codes.items() if code not in ids}
+        if missing:
+            raise serializers.ValidationError(missing)
+        attrs["pickup_poi_id"] = ids[codes["pickup_poi_code"]]
+        attrs["dropoff_poi_id"] = ids[codes["dropoff_poi_code"]]
+        return attrs
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -220,8 +356,9 @@ class BuggyCreateUpdateSerializer(serializers.ModelSerializer):
         
         if driver_id is not None:
             instance.driver_id = driver_id
-        if current_poi_id is not None:
+        if current_poi_id is not None and current_poi_id != instance.current_poi_id:
             instance.current_poi_id = current_poi_id
+            instance.route_changed_at = timezone.now()  # stop ETAs count from the new position
             
         instance.save()
         return instance
@@ -240,13 +377,11 @@ class DriverCreateUpdateSerializer(serializers.ModelSerializer):
         password = validated_data.pop('password', None)
         if not password:
             raise serializers.ValidationError({"password": "This field is required."})
-        user = User.objects.create(
+        return User.objects.create(
             role=User.Role.DRIVER,
+            password=passwords.make_password(password),
             **validated_data
         )
-        user.set_password(password)
-        user.save()
-        return user
     
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
@@ -255,7 +390,7 @@ class DriverCreateUpdateSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         
         if password:
-            instance.set_password(password)
+            instance.password = passwords.make_password(password)
         
         instance.save()
         return instance
@@ -0,0 +1,148 @@
+# core/services/archive.py
+"""
+Hot/cold split of ride history.
+
+Completed rides and their route stops are moved, in small committed batches,
+into RideRequestHistory / BuggyRouteStopHistory, so the live tables that the
+routing and driver endpoints scan only hold current work. A batch either
+moves completely or not at all, so an interrupted run can simply be started
+again.
+
+Analytics read through ``rides()`` / ``stops()``, which apply the same
+filters to the archived and the live table and chain the results.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import BuggyRouteStop, BuggyRouteStopHistory, RideRequest, RideRequestHistory
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 30
+DEFAULT_BATCH_SIZE = 500
+
+RIDE_FIELDS = [
+    "id", "public_code", "pickup_poi_id", "dropoff_poi_id", "num_guests", "room_number", "guest_name",
+    "status", "assigned_buggy_id", "requested_at", "assigned_at", "pickup_completed_at", "dropoff_completed_at",
+]
+STOP_FIELDS = [
+    "id", "buggy_id", "ride_request_id", "stop_type", "status", "poi_id", "sequence_index",
+    "created_at", "completed_at",
+]
+
+
+class HistoryQuery:
+    """
+    Minimal queryset-like view over the archived and the live table.
+
+    Filters, ``only``, ``values_list`` and ``order_by`` are applied to both
+    querysets; iteration yields archived rows first, then live rows.
+    """
+
+    def __init__(self, archived, live):
+        self.archived = archived
+        self.live = live
+
+    def _apply(self, method: str, *args, **kwargs) -> "HistoryQuery":
+        return HistoryQuery(
+            getattr(self.archived, method)(*args, **kwargs),
+            getattr(self.live, method)(*args, **kwargs),
+        )
+
+    def filter(self, *args, **kwargs) -> "HistoryQuery":
+        return self._apply("filter", *args, **kwargs)
+
+    def exclude(self, *args, **kwargs) -> "HistoryQuery":
+        return self._apply("exclude", *args, **kwargs)
+
+    def only(self, *fields) -> "HistoryQuery":
+        return self._apply("only", *fields)
+
+    def order_by(self, *fields) -> "HistoryQuery":
+        return self._apply("order_by", *fields)
+
+    def values_list(self, *fields, **kwargs) -> "HistoryQuery":
+        return self._apply("values_list", *fields, **kwargs)
+
+    def count(self) -> int:
+        return self.archived.count() + self.live.count()
+
+    def exists(self) -> bool:
+        return self.live.exists() or self.archived.exists()
+
+    def iterator(self, chunk_size: int = 2000) -> Iterator:
+        return chain(self.archived.iterator(chunk_size=chunk_size), self.live.iterator(chunk_size=chunk_size))
+
+    def __iter__(self):
+        return chain(self.archived, self.live)
+
+
+def rides() -> HistoryQuery:
+    return HistoryQuery(RideRequestHistory.objects.all(), RideRequest.objects.all())
+
+
+def stops() -> HistoryQuery:
+    return HistoryQuery(BuggyRouteStopHistory.objects.all(), BuggyRouteStop.objects.all())
+
+
+def default_cutoff() -> datetime:
+    days = getattr(settings, "ARCHIVE_AFTER_DAYS", DEFAULT_ARCHIVE_AFTER_DAYS)
+    return timezone.now() - timedelta(days=days)
+
+
+def _archivable(cutoff: datetime):
+    return RideRequest.objects.filter(
+        Q(dropoff_completed_at__lt=cutoff) | Q(dropoff_completed_at__isnull=True, requested_at__lt=cutoff),
+        status=RideRequest.Status.COMPLETED,
+    )
+
+
+def archive_batch(cutoff: datetime, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Move up to ``batch_size`` completed rides (and their stops) older than ``cutoff``. Returns rides moved."""
+    with transaction.atomic():
+        ride_ids = list(
+            _archivable(cutoff).select_for_update().order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not ride_ids:
+            return 0
+
+        ride_rows = RideRequest.objects.filter(id__in=ride_ids).values(*RIDE_FIELDS)
+        stop_rows = BuggyRouteStop.objects.filter(ride_request_id__in=ride_ids).values(*STOP_FIELDS)
+        # ignore_conflicts keeps a batch idempotent if rows were copied by an earlier, aborted run
+        RideRequestHistory.objects.bulk_create(
+            [RideRequestHistory(**row) for row in ride_rows], batch_size=batch_size, ignore_conflicts=True
+        )
+        BuggyRouteStopHistory.objects.bulk_create(
+            [BuggyRouteStopHistory(**row) for row in stop_rows], batch_size=batch_size, ignore_conflicts=True
+        )
+
+        BuggyRouteStop.objects.filter(ride_request_id__in=ride_ids).delete()
+        RideRequest.objects.filter(id__in=ride_ids).delete()
+    return len(ride_ids)
+
+
+def archive_completed(
+    cutoff: Optional[datetime] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+) -> int:
+    """
+    Archive completed rides finished before ``cutoff`` (default: ARCHIVE_AFTER_DAYS ago).
+
+    Each batch commits on its own; stop after ``max_batches`` to bound a run.
+    Returns the number of rides moved.
+    """
+    cutoff = cutoff or default_cutoff()
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+    return moved
@@ -0,0 +1,207 @@
+# core/services/assignment_queue.py
+"""
+Durable work queue for asynchronous ride assignment.
+
+In async mode RideCreateAndAssignView saves the ride as PENDING together
+with an AssignmentJob and answers 202 right away. Workers (manage.py
+assignment_worker, any number of threads and processes) claim jobs from the
+table and run assign_ride_to_best_buggy; clients poll
+rides/<code>/assignment/ for the outcome.
+
+A job is claimed with a conditional UPDATE (QUEUED -> RUNNING), which is
+atomic on every backend. The claim is a lease: a RUNNING job not finished
+within LEASE_S (its worker died, or is just slow) is claimed again. So a
+worker re-reads the ride under a row lock before assigning it, a ride that
+was already assigned is just marked done, and the outcome is written with an
+UPDATE conditional on still holding the lease; a worker that lost its lease
+rolls its assignment back. Failed attempts are retried with exponential
+backoff; after MAX_ATTEMPTS the job fails and the ride is cancelled.
+"""
+from __future__ import annotations
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import AssignmentJob, RideRequest
+from core.services import telemetry
+from core.services.routing import AssignmentConflictError, NoActiveBuggiesError, assign_ride_to_best_buggy
+
+logger = logging.getLogger(__name__)
+
+MODE_SYNC = "sync"
+MODE_ASYNC = "async"
+
+DEFAULT_LEASE_S = 60.0
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_POLL_INTERVAL_S = 0.2
+MAX_BACKOFF_S = 30.0
+
+ERROR_NO_ACTIVE_BUGGIES = "NO_ACTIVE_BUGGIES"
+ERROR_ASSIGNMENT_CONFLICT = "ASSIGNMENT_CONFLICT"
+ERROR_ASSIGNMENT_FAILED = "ASSIGNMENT_FAILED"
+
+Status = AssignmentJob.Status
+
+
+def async_enabled(request) -> bool:
+    """Async when RIDE_ASSIGNMENT_MODE says so, or the client sends ``Prefer: respond-async``."""
+    if getattr(settings, "RIDE_ASSIGNMENT_MODE", MODE_SYNC) == MODE_ASYNC:
+        return True
+    return "respond-async" in request.headers.get("Prefer", "")
+
+
+class LeaseLost(Exception):
+    """The job was claimed by another worker after this worker's lease expired."""
+
+
+def enqueue(ride: RideRequest) -> AssignmentJob:
+    """Queue ``ride`` for assignment. Call in the transaction that saves the ride."""
+    job = AssignmentJob.objects.create(ride=ride, available_at=timezone.now())
+    telemetry.inc(telemetry.ASSIGNMENT_JOBS, "queued")
+    return job
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+
+def claim(worker: str, limit: int = 1) -> List[AssignmentJob]:
+    """Claim up to ``limit`` due jobs (oldest first), including expired leases."""
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, "ASSIGNMENT_LEASE_S", DEFAULT_LEASE_S))
+    candidates = (
+        AssignmentJob.objects
+        .filter(
+            Q(status=Status.QUEUED, available_at__lte=now)
+            | Q(status=Status.RUNNING, locked_at__lt=now - lease)
+        )
+        .order_by("available_at", "id")
+        .values_list("id", "status", "locked_at")[:limit * 4]
+    )
+    claimed = []
+    for job_id, job_status, locked_at in candidates:
+        won = (
+            AssignmentJob.objects
+            .filter(pk=job_id, status=job_status, locked_at=locked_at)
+            .update(status=Status.RUNNING, locked_by=worker, locked_at=now, attempts=F("attempts") + 1)
+        )
+        if won:
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return list(AssignmentJob.objects.filter(pk__in=claimed).select_related("ride").order_by("id"))
+
+
+def _backoff_s(attempts: int) -> float:
+    return min(MAX_BACKOFF_S, 2.0 ** (attempts - 1))
+
+
+def _release(job: AssignmentJob, **fields) -> None:
+    """Write ``fields`` to the job if this worker still holds its lease, else raise LeaseLost."""
+    held = (
+        AssignmentJob.objects
+        .filter(pk=job.pk, status=Status.RUNNING, locked_by=job.locked_by, locked_at=job.locked_at)
+        .update(**fields)
+    )
+    if not held:
+        raise LeaseLost(f"Assignment job {job.pk} was claimed by another worker")
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def _retry_or_fail(job: AssignmentJob, code: str, message: str) -> None:
+    max_attempts = getattr(settings, "ASSIGNMENT_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+    now = timezone.now()
+    with transaction.atomic():
+        if job.attempts >= max_attempts:
+            _release(job, status=Status.FAILED, finished_at=now, error_code=code, error=message,
+                     locked_by="", locked_at=None)
+            RideRequest.objects.filter(pk=job.ride_id, status=RideRequest.Status.PENDING).update(
+                status=RideRequest.Status.CANCELLED
+            )
+            outcome = "failed"
+        else:
+            _release(job, status=Status.QUEUED, available_at=now + timedelta(seconds=_backoff_s(job.attempts)),
+                     error_code=code, error=message, locked_by="", locked_at=None)
+            outcome = "retried"
+    telemetry.inc(telemetry.ASSIGNMENT_JOBS, outcome)
+
+
+def _attempt(job: AssignmentJob) -> None:
+    try:
+        with transaction.atomic():
+            # the row lock serializes this with a worker that claimed the job before us
+            ride = RideRequest.objects.select_for_update().get(pk=job.ride_id)
+            if ride.status == RideRequest.Status.PENDING:
+                assign_ride_to_best_buggy(ride)
+            # else: a previous lease holder got as far as assigning it
+            _release(job, status=Status.DONE, finished_at=timezone.now(), error_code="", error="")
+    except NoActiveBuggiesError as e:
+        _retry_or_fail(job, ERROR_NO_ACTIVE_BUGGIES, str(e))
+    except AssignmentConflictError as e:
+        _retry_or_fail(job, ERROR_ASSIGNMENT_CONFLICT, str(e))
+    except LeaseLost:
+        raise
+    except Exception as e:
+        logger.exception("Assignment job %s for ride %s failed", job.pk, job.ride.public_code)
+        _retry_or_fail(job, ERROR_ASSIGNMENT_FAILED, str(e))
+    else:
+        telemetry.inc(telemetry.ASSIGNMENT_JOBS, "done")
+        telemetry.observe(telemetry.ASSIGNMENT_QUEUE_WAIT, (job.finished_at - job.created_at).total_seconds())
+
+
+def run_job(job: AssignmentJob) -> AssignmentJob:
+    """
+    Assign the job's ride and record the outcome on the job. A worker whose
+    lease was taken over writes nothing: its assignment is rolled back and
+    the job is left to the new lease holder.
+    """
+    try:
+        _attempt(job)
+    except LeaseLost:
+        logger.warning("Assignment job %s: lease lost to another worker", job.pk)
+        telemetry.inc(telemetry.ASSIGNMENT_JOBS, "lost")
+    return job
+
+
+def work(worker: Optional[str] = None, limit: int = 10) -> int:
+    """Claim and run one batch of due jobs; returns how many ran."""
+    jobs = claim(worker or worker_name(), limit)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
+
+
+def run_worker(stop: threading.Event, poll_interval_s: float = DEFAULT_POLL_INTERVAL_S, batch_size: int = 10) -> None:
+    """Process jobs until ``stop`` is set, sleeping ``poll_interval_s`` whenever the queue is empty."""
+    worker = worker_name()
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                ran = work(worker, batch_size)
+            except Exception:
+                logger.exception("Assignment worker %s failed to claim jobs", worker)
+                ran = 0
+            if not ran:
+                stop.wait(poll_interval_s)
+    finally:
+        connection.close()
+
+
+def status_data(job: AssignmentJob) -> dict:
+    return {
+        "code": job.ride.public_code,
+        "status": job.status,
+        "attempts": job.attempts,
+        "error_code": job.error_code or None,
+        "error": job.error or None,
+    }
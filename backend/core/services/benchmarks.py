@@ -0,0 +1,282 @@
+# core/services/benchmarks.py
+"""
+Microbenchmarks for the routing and driver hot paths.
+
+Each benchmark is registered by name and, given a Dataset (a synthetic
+resort from core.services.synthetic, loaded into a scratch database, see
+core.services.scratch), returns a callable to time. The configured database
+is never written, so timings are those of the scratch engine (in-memory
+SQLite). Benchmarks that write run each
+call inside a savepoint that is rolled back, so every call sees the same
+state. Assignment is measured once per fleet size.
+
+Results carry environment metadata and can be compared with a stored
+baseline; a benchmark whose median got slower than the baseline by more
+than the threshold is flagged.
+"""
+from __future__ import annotations
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+import django
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Buggy, BuggyRouteStop, POI, RideRequest
+from core.serializers import RideRequestSerializer
+from core.services import graph, metrics, synthetic
+from core.services.driver_actions import complete_stop, start_stop
+from core.services.loadtest import percentile
+from core.services.routing import assign_ride_to_best_buggy, build_current_routes, simulate_append_for_buggy
+from core.services.scratch import is_throwaway_database, scratch_database
+
+DEFAULT_FLEET_SIZES = (10, 50, 200)
+DEFAULT_THRESHOLD = 0.2  # flag medians more than 20% over the baseline
+PREFIX = "BEN"
+
+Setup = Callable[["Dataset"], Callable[[], object]]
+BENCHMARKS: Dict[str, Setup] = {}
+
+
+class BenchmarkError(ValueError):
+    pass
+
+
+def register(name: str):
+    def decorator(fn: Setup) -> Setup:
+        BENCHMARKS[name] = fn
+        return fn
+    return decorator
+
+
+@dataclass
+class Dataset:
+    pois: int = 500
+    fleet_sizes: Sequence[int] = DEFAULT_FLEET_SIZES
+    list_rides: int = 100
+    seed: int = 0
+    rng: random.Random = field(default_factory=random.Random)
+    poi_ids: List[int] = field(default_factory=list)
+    buggy_ids: List[int] = field(default_factory=list)
+
+    def describe(self) -> dict:
+        return {"pois": self.pois, "fleet_sizes": list(self.fleet_sizes), "list_rides": self.list_rides,
+                "seed": self.seed}
+
+    def load(self) -> None:
+        """Build the resort; only into a throwaway database (``run_benchmarks`` uses a scratch one)."""
+        if not is_throwaway_database():
+            raise BenchmarkError(f"Refusing to load a benchmark resort into {connection.settings_dict['NAME']}")
+        synthetic.generate_resort(synthetic.ResortSpec(
+            pois=self.pois,
+            buggies=max(self.fleet_sizes),
+            drivers=0,
+            active_ratio=1.0,
+            days=1,
+            rides_per_day=self.list_rides,
+            open_rides_per_buggy=2,
+            seed=self.seed,
+            prefix=PREFIX,
+        ))
+        graph.invalidate()
+        self.poi_ids = list(
+            POI.objects.filter(code__startswith=f"{PREFIX}_").order_by("id").values_list("id", flat=True)
+        )
+        self.buggy_ids = list(
+            Buggy.objects.filter(code__startswith=f"{PREFIX}_").order_by("id").values_list("id", flat=True)
+        )
+
+    def activate(self, fleet_size: int) -> None:
+        """Leave exactly the first ``fleet_size`` benchmark buggies active."""
+        Buggy.objects.filter(pk__in=self.buggy_ids[:fleet_size]).update(status=Buggy.Status.ACTIVE)
+        Buggy.objects.filter(pk__in=self.buggy_ids[fleet_size:]).update(status=Buggy.Status.INACTIVE)
+
+    def poi_pair(self):
+        a, b = self.rng.sample(self.poi_ids, 2)
+        return a, b
+
+
+def rolled_back(fn: Callable[[], object]) -> Callable[[], object]:
+    """Run each call of ``fn`` in a savepoint that is rolled back."""
+    def run():
+        with transaction.atomic():
+            fn()
+            transaction.set_rollback(True)
+    return run
+
+
+# ----- benchmarks -----
+
+@register("graph.from_db")
+def bench_graph_from_db(ds: Dataset):
+    return graph.PoiGraph.from_db
+
+
+@register("graph.shortest_path")
+def bench_shortest_path(ds: Dataset):
+    g = graph.get_graph(force_reload=True)
+    pairs = [ds.poi_pair() for _ in range(64)]
+    turn = itertools.count()
+    return lambda: g.shortest_path(*pairs[next(turn) % len(pairs)])
+
+
+@register("routing.simulate_append")
+def bench_simulate_append(ds: Dataset):
+    graph.get_graph(force_reload=True)
+    buggy = Buggy.objects.select_related("current_poi").get(pk=ds.buggy_ids[0])
+    route = build_current_routes([buggy])[buggy.id]
+    pickup, dropoff = POI.objects.in_bulk(ds.poi_pair()).values()
+    ride = RideRequest(pickup_poi=pickup, dropoff_poi=dropoff, num_guests=2)
+    return lambda: simulate_append_for_buggy(buggy=buggy, current_route=route, new_ride=ride)
+
+
+def _bench_assign(ds: Dataset):
+    graph.get_graph(force_reload=True)
+    pairs = [ds.poi_pair() for _ in range(16)]
+    turn = itertools.count()
+
+    def assign():
+        a, b = pairs[next(turn) % len(pairs)]
+        ride = RideRequest.objects.create(pickup_poi_id=a, dropoff_poi_id=b, num_guests=2)
+        assign_ride_to_best_buggy(ride)
+    return rolled_back(assign)
+
+
+@register("serializers.ride_list")
+def bench_ride_list(ds: Dataset):
+    qs = (
+        RideRequest.objects
+        .select_related("pickup_poi", "dropoff_poi", "assigned_buggy", "assigned_buggy__current_poi")
+        .order_by("-requested_at")[:ds.list_rides]
+    )
+    return lambda: JSONRenderer().render(RideRequestSerializer(qs.all(), many=True).data)
+
+
+@register("driver.start_and_complete_stop")
+def bench_stop_transitions(ds: Dataset):
+    def transition():
+        stop = (
+            BuggyRouteStop.objects
+            .filter(buggy_id=ds.buggy_ids[0])
+            .exclude(status=BuggyRouteStop.StopStatus.COMPLETED)
+            .select_related("ride_request", "poi", "buggy")
+            .order_by("sequence_index")
+            .first()
+        )
+        start_stop(stop)
+        complete_stop(stop.buggy, stop)
+    return rolled_back(transition)
+
+
+def benchmark_names(fleet_sizes: Sequence[int]) -> List[str]:
+    names = list(BENCHMARKS)
+    names += [f"routing.assign[fleet={n}]" for n in fleet_sizes]
+    return names
+
+
+# ----- runner -----
+
+def measure(fn: Callable[[], object], iterations: int, warmup: int = 2) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "min_ms": round(samples[0] * 1000, 4),
+        "median_ms": round(percentile(samples, 0.5) * 1000, 4),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 4),
+        "p90_ms": round(percentile(samples, 0.9) * 1000, 4),
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def run_benchmarks(dataset: Dataset, iterations: int = 50, only: Optional[str] = None) -> dict:
+    """Load ``dataset`` and time each benchmark (names containing ``only``), all in a scratch database."""
+    names = [n for n in benchmark_names(dataset.fleet_sizes) if not only or only in n]
+    if not names:
+        raise BenchmarkError(f"No benchmark matches {only!r}")
+    dataset.rng = random.Random(dataset.seed)
+
+    results = {}
+    with scratch_database(), metrics.paused():
+        dataset.load()
+        for name in names:
+            if name.startswith("routing.assign["):
+                dataset.activate(int(name.split("=")[1].rstrip("]")))
+                fn = _bench_assign(dataset)
+            else:
+                dataset.activate(max(dataset.fleet_sizes))
+                fn = BENCHMARKS[name](dataset)
+            results[name] = measure(fn, iterations)
+        env = environment()
+    return {"environment": env, "dataset": dataset.describe(), "results": results}
+
+
+def compare(report: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """Median of each benchmark against the baseline's; ``status`` is slower, faster, ok or new."""
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, current in report["results"].items():
+        base = base_results.get(name)
+        if base is None or not base.get("median_ms"):
+            rows.append({"benchmark": name, "status": "new", "median_ms": current["median_ms"]})
+            continue
+        ratio = current["median_ms"] / base["median_ms"]
+        if ratio > 1 + threshold:
+            status = "slower"
+        elif ratio < 1 / (1 + threshold):
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({
+            "benchmark": name,
+            "status": status,
+            "median_ms": current["median_ms"],
+            "baseline_median_ms": base["median_ms"],
+            "ratio": round(ratio, 3),
+        })
+    return rows
+
+
+def load_report(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_report(report: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,86 @@
+# core/services/dispatch_table.py
+"""
+Per-POI dispatch ranking.
+
+DispatchRanking holds, for every POI, how soon each active buggy could be
+there if a ride were appended to its route now: its committed route time
+plus the trip from its last stop. That is the pickup time
+assign_ride_to_best_buggy computes, so with the default score the best
+buggy for a pickup is read from the table instead of planned.
+
+A buggy's rows are rewritten whenever its route or position changes
+(routing.refresh_dispatch_rankings after appending stops, completing one,
+or a manager moving the buggy or changing its status). Each row carries the route_version it was computed for; rows of a
+buggy that has moved on since, or is not active, are ignored. Edge changes
+clear the table, which fills up again buggy by buggy, or at once with
+``manage.py rebuild_dispatch_table``. Where a pickup's rows don't cover the
+whole active fleet, assignment plans as before.
+"""
+from __future__ import annotations
+from typing import List, Optional, Sequence, Tuple
+
+from django.db.models import F, OuterRef, QuerySet, Subquery
+
+from core.models import Buggy, DispatchRanking, POI
+from core.services.graph import PoiGraph
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def _current(rankings: QuerySet) -> QuerySet:
+    return rankings.filter(buggy__status=Buggy.Status.ACTIVE, route_version=F("buggy__route_version"))
+
+
+def store(g: PoiGraph, buggy: Buggy, committed: Optional[Tuple[int, int]]) -> int:
+    """
+    Write ``buggy``'s rows: ``committed`` is (remaining route time, POI the
+    route ends at), from routing.committed_route_s. Returns rows written.
+    """
+    if committed is None:
+        return 0  # no known position: its ETA depends on the pickup
+    route_s, last_poi = committed
+    rows = [
+        DispatchRanking(poi_id=poi_id, buggy_id=buggy.id, eta_s=route_s + travel_s, route_version=buggy.route_version)
+        for poi_id, travel_s in g.distances_from(last_poi).items()
+    ]
+    DispatchRanking.objects.bulk_create(
+        rows,
+        batch_size=DEFAULT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["poi", "buggy"],
+        update_fields=["eta_s", "route_version"],
+    )
+    return len(rows)
+
+
+def clear() -> None:
+    DispatchRanking.objects.all().delete()
+
+
+def best_buggy(pickup_poi_id: int, active_buggies: Sequence[Buggy]) -> Optional[Buggy]:
+    """
+    The buggy in ``active_buggies`` that reaches the pickup first (ties go
+    to the earlier one), or None when the table doesn't have a current row
+    for every one of them at that POI.
+    """
+    etas = dict(
+        _current(DispatchRanking.objects.filter(poi_id=pickup_poi_id)).values_list("buggy_id", "eta_s")
+    )
+    if any(b.id not in etas for b in active_buggies):
+        return None
+    return min(active_buggies, key=lambda b: etas[b.id], default=None)
+
+
+def next_available() -> List[dict]:
+    """Every POI with the buggy that could be there first and how soon, from the table (one query)."""
+    best = _current(DispatchRanking.objects.filter(poi=OuterRef("pk"))).order_by("eta_s", "buggy_id")
+    return list(
+        POI.objects
+        .annotate(
+            buggy_code=Subquery(best.values("buggy__code")[:1]),
+            buggy_display_name=Subquery(best.values("buggy__display_name")[:1]),
+            eta_s=Subquery(best.values("eta_s")[:1]),
+        )
+        .order_by("code")
+        .values("code", "name", "buggy_code", "buggy_display_name", "eta_s")
+    )
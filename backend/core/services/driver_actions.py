@@ -0,0 +1,162 @@
+# core/services/driver_actions.py
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import Buggy, BuggyRouteStop, RideRequest
+from core.services import metrics
+
+ACTION_START = "start"
+ACTION_COMPLETE = "complete"
+
+RESULT_APPLIED = "applied"
+RESULT_DUPLICATE = "duplicate"
+RESULT_REJECTED = "rejected"
+RESULT_SKIPPED = "skipped"
+
+
+@dataclass
+class StopAction:
+    stop_id: int
+    action: str  # ACTION_START or ACTION_COMPLETE
+    recorded_at: Optional[datetime] = None
+
+
+@dataclass
+class StopActionResult:
+    stop_id: int
+    action: str
+    result: str
+    detail: str = ""
+
+
+def start_stop(stop: BuggyRouteStop) -> None:
+    stop.status = BuggyRouteStop.StopStatus.ON_ROUTE
+    stop.save(update_fields=["status"])
+
+    ride = stop.ride_request
+    if stop.stop_type == BuggyRouteStop.StopType.PICKUP:
+        ride.status = RideRequest.Status.PICKING_UP
+        ride.save(update_fields=["status"])
+
+
+@transaction.atomic
+def complete_stop(
+    buggy: Buggy,
+    stop: BuggyRouteStop,
+    completed_at: Optional[datetime] = None,
+    ride_finished: Optional[bool] = None,
+) -> None:
+    """
+    Mark an ON_ROUTE stop completed and move the buggy there.
+
+    ``ride_finished`` lets callers that already know the ride's remaining
+    stops skip the lookup; by default it is queried.
+    """
+    completed_at = completed_at or timezone.now()
+    ride = stop.ride_request
+
+    buggy.current_poi = stop.poi
+
+    if stop.stop_type == BuggyRouteStop.StopType.PICKUP:
+        buggy.current_onboard_guests += ride.num_guests
+        ride.status = RideRequest.Status.IN_PROGRESS
+        ride.pickup_completed_at = completed_at
+        ride.save(update_fields=["status", "pickup_completed_at"])
+        metrics.record_pickup(ride)
+    else:
+        buggy.current_onboard_guests -= ride.num_guests
+
+    # an increment in SQL, so plans scored against the old position are rejected
+    buggy.route_version = F("route_version") + 1
+    buggy.route_changed_at = completed_at
+    buggy.save(update_fields=["current_poi", "current_onboard_guests", "route_version", "route_changed_at"])
+
+    stop.status = BuggyRouteStop.StopStatus.COMPLETED
+    stop.completed_at = completed_at
+    stop.save(update_fields=["status", "completed_at"])
+
+    if stop.stop_type == BuggyRouteStop.StopType.DROPOFF:
+        if ride_finished is None:
+            ride_finished = not ride.route_stops.exclude(status=BuggyRouteStop.StopStatus.COMPLETED).exists()
+        if ride_finished:
+            ride.status = RideRequest.Status.COMPLETED
+            ride.dropoff_completed_at = completed_at
+            ride.save(update_fields=["status", "dropoff_completed_at"])
+            metrics.record_completion(ride)
+
+
+def sync_stop_actions(buggy_id: int, actions: Sequence[StopAction]) -> List[StopActionResult]:
+    """
+    Apply an ordered batch of stop transitions recorded offline on a driver's device.
+
+    The route is loaded once and the batch is checked against it in memory.
+    Transitions that were already applied (a replayed sync) are reported as
+    duplicates, so sending the same batch twice is harmless. Processing stops
+    at the first transition that does not fit the route; later ones are
+    reported as skipped and can be resent after the driver refreshes.
+    """
+    results: List[StopActionResult] = []
+
+    with transaction.atomic():
+        # Lock the buggy so two syncs from the same device can't interleave.
+        buggy = Buggy.objects.select_for_update().get(pk=buggy_id)
+
+        requested_ids = {a.stop_id for a in actions}
+        stops = list(
+            BuggyRouteStop.objects
+            .filter(buggy=buggy)
+            .filter(Q(id__in=requested_ids) | ~Q(status=BuggyRouteStop.StopStatus.COMPLETED))
+            .select_related("ride_request", "poi")
+            .order_by("sequence_index")
+        )
+        rides: Dict[int, RideRequest] = {}
+        for s in stops:
+            s.ride_request = rides.setdefault(s.ride_request_id, s.ride_request)
+        stops_by_id = {s.id: s for s in stops}
+        open_stops = [s for s in stops if s.status != BuggyRouteStop.StopStatus.COMPLETED]
+
+        rejected = False
+        for action in actions:
+            if rejected:
+                results.append(StopActionResult(action.stop_id, action.action, RESULT_SKIPPED))
+                continue
+
+            stop = stops_by_id.get(action.stop_id)
+            if stop is None:
+                outcome, detail = RESULT_REJECTED, "Stop not found"
+            elif action.action == ACTION_START:
+                outcome, detail = _apply_start(stop, open_stops)
+            else:
+                outcome, detail = _apply_complete(buggy, stop, open_stops, action.recorded_at)
+
+            rejected = outcome == RESULT_REJECTED
+            results.append(StopActionResult(action.stop_id, action.action, outcome, detail))
+
+    return results
+
+
+def _apply_start(stop: BuggyRouteStop, open_stops: List[BuggyRouteStop]):
+    if stop.status != BuggyRouteStop.StopStatus.PLANNED:
+        return RESULT_DUPLICATE, ""
+    if open_stops[0] is not stop:
+        return RESULT_REJECTED, "Can only start the next stop in sequence"
+    start_stop(stop)
+    return RESULT_APPLIED, ""
+
+
+def _apply_complete(buggy: Buggy, stop: BuggyRouteStop, open_stops: List[BuggyRouteStop], recorded_at):
+    if stop.status == BuggyRouteStop.StopStatus.COMPLETED:
+        return RESULT_DUPLICATE, ""
+    if stop.status != BuggyRouteStop.StopStatus.ON_ROUTE:
+        return RESULT_REJECTED, "Stop is not ON_ROUTE"
+
+    open_stops.remove(stop)
+    ride_finished = not any(s.ride_request_id == stop.ride_request_id for s in open_stops)
+    complete_stop(buggy, stop, completed_at=recorded_at, ride_finished=ride_finished)
+    return RESULT_APPLIED, ""
@@ -0,0 +1,101 @@
+# core/services/eta.py
+"""
+Projected arrival times for open route stops.
+
+A buggy works through its open stops in sequence order, so the arrival at
+stop i is when it was last placed at its current POI (Buggy.route_changed_at,
+normally its last completed stop) plus the running sum of every leg's travel
+time and the service time of every stop before i. Appending stops doesn't
+move that clock. The travel and service times of a route are collected into two
+arrays and summed in one pass with itertools.accumulate.
+
+Results are cached per process and keyed by (route_version,
+route_changed_at, graph token): a list request only checks the buggies'
+versions, and recomputes, with a single stop query, only the buggies whose
+route or position changed since. A buggy with no known position, or a stop
+off the graph, gets no ETAs.
+"""
+from __future__ import annotations
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from core.models import Buggy, BuggyRouteStop, RideRequest
+from core.services.graph import get_graph
+from core.services.routing import DROPOFF_SERVICE_S, PICKUP_SERVICE_S
+
+# rides that still have open stops on their buggy's route
+OPEN_RIDE_STATUSES = {RideRequest.Status.ASSIGNED, RideRequest.Status.PICKING_UP, RideRequest.Status.IN_PROGRESS}
+
+
+class BuggyEtas(NamedTuple):
+    key: Tuple  # (route_version, route_changed_at, graph token) the ETAs were computed for
+    stops: Dict[int, datetime]  # open stop id -> projected arrival
+    rides: Dict[int, Tuple[Optional[datetime], Optional[datetime]]]  # ride id -> (pickup, dropoff) arrival
+
+
+_cache: Dict[int, BuggyEtas] = {}
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def _compute(g, key: Tuple, changed_at: datetime, current_poi: Optional[int], stops: List[Tuple]) -> BuggyEtas:
+    etas = BuggyEtas(key, {}, {})
+    if current_poi is None or not stops:
+        return etas
+    pois = [current_poi] + [poi for _, _, _, poi in stops]
+    try:
+        travel = [g.shortest_path(a, b).travel_time_s for a, b in zip(pois, pois[1:])]
+    except (KeyError, ValueError):
+        return etas  # a stop off the graph
+    service = [PICKUP_SERVICE_S if is_pickup else DROPOFF_SERVICE_S for _, _, is_pickup, _ in stops]
+
+    # arrival at stop i = travel[0..i] + service[0..i-1]
+    done = accumulate(t + s for t, s in zip(travel, service))
+    arrivals = [done_s - s for done_s, s in zip(done, service)]
+
+    for (stop_id, ride_id, is_pickup, _), arrival_s in zip(stops, arrivals):
+        at = changed_at + timedelta(seconds=arrival_s)
+        etas.stops[stop_id] = at
+        pickup, dropoff = etas.rides.get(ride_id, (None, None))
+        etas.rides[ride_id] = (at, dropoff) if is_pickup else (pickup, at)
+    return etas
+
+
+def for_buggies(buggy_ids: Optional[Iterable[int]] = None) -> Dict[int, BuggyEtas]:
+    """ETAs for the open stops of ``buggy_ids`` (every buggy when None), recomputing only changed buggies."""
+    buggies = Buggy.objects.all()
+    if buggy_ids is not None:
+        buggies = buggies.filter(pk__in=list(buggy_ids))
+    g = get_graph()
+    result: Dict[int, BuggyEtas] = {}
+    stale: Dict[int, Tuple] = {}
+    for buggy_id, version, changed_at, current_poi in buggies.values_list(
+        "id", "route_version", "route_changed_at", "current_poi_id"
+    ):
+        key = (version, changed_at, g.token)
+        cached = _cache.get(buggy_id)
+        if cached is not None and cached.key == key:
+            result[buggy_id] = cached
+        else:
+            stale[buggy_id] = (key, changed_at, current_poi)
+    if not stale:
+        return result
+
+    routes: Dict[int, List[Tuple]] = defaultdict(list)
+    open_stops = (
+        BuggyRouteStop.objects
+        .filter(buggy_id__in=list(stale))
+        .exclude(status=BuggyRouteStop.StopStatus.COMPLETED)
+        .order_by("buggy_id", "sequence_index")
+        .values_list("buggy_id", "id", "ride_request_id", "stop_type", "poi_id")
+    )
+    for buggy_id, stop_id, ride_id, stop_type, poi_id in open_stops:
+        routes[buggy_id].append((stop_id, ride_id, stop_type == BuggyRouteStop.StopType.PICKUP, poi_id))
+
+    for buggy_id, (key, changed_at, current_poi) in stale.items():
+        result[buggy_id] = _cache[buggy_id] = _compute(g, key, changed_at, current_poi, routes[buggy_id])
+    return result
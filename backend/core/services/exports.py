@@ -0,0 +1,205 @@
+# core/services/exports.py
+"""
+Streaming exports of ride and route-stop history.
+
+Rows are read with ``iterator(chunk_size=...)`` (a server-side cursor on
+Postgres) and encoded a chunk at a time, so memory stays flat no matter how
+long the requested date range is. Archived history is included.
+
+Archived rows keep POI and buggy ids without a constraint, so related codes
+are read with a correlated subquery rather than a join: a row whose POI or
+buggy was deleted since still exports, with an empty code.
+"""
+from __future__ import annotations
+import csv
+import zlib
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from core.models import Buggy, POI
+from core.services import archive
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+    import json
+
+DEFAULT_CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+FORMATS = (FORMAT_CSV, FORMAT_NDJSON)
+
+CONTENT_TYPES = {
+    FORMAT_CSV: "text/csv; charset=utf-8",
+    FORMAT_NDJSON: "application/x-ndjson",
+}
+
+
+def _code_of(model, fk: str) -> Subquery:
+    """The ``code`` of the ``model`` row ``fk`` points at, or NULL when it is gone."""
+    return Subquery(model.objects.filter(pk=OuterRef(fk)).values("code")[:1])
+
+
+# Export column name -> ORM lookup or expression, in default column order.
+DATASETS = {
+    "rides": {
+        "query": archive.rides,
+        "date_field": "requested_at",
+        "columns": {
+            "id": "id",
+            "public_code": "public_code",
+            "status": "status",
+            "pickup_poi": _code_of(POI, "pickup_poi_id"),
+            "dropoff_poi": _code_of(POI, "dropoff_poi_id"),
+            "num_guests": "num_guests",
+            "room_number": "room_number",
+            "guest_name": "guest_name",
+            "assigned_buggy": _code_of(Buggy, "assigned_buggy_id"),
+            "requested_at": "requested_at",
+            "assigned_at": "assigned_at",
+            "pickup_completed_at": "pickup_completed_at",
+            "dropoff_completed_at": "dropoff_completed_at",
+        },
+    },
+    "stops": {
+        "query": archive.stops,
+        "date_field": "created_at",
+        "columns": {
+            "id": "id",
+            "buggy": _code_of(Buggy, "buggy_id"),
+            "ride": "ride_request__public_code",
+            "stop_type": "stop_type",
+            "status": "status",
+            "poi": _code_of(POI, "poi_id"),
+            "sequence_index": "sequence_index",
+            "created_at": "created_at",
+            "completed_at": "completed_at",
+        },
+    },
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _chunk_size() -> int:
+    return getattr(settings, "EXPORT_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+
+
+def resolve_columns(dataset: str, columns: Optional[Sequence[str]] = None) -> List[str]:
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset: {dataset}")
+    available = DATASETS[dataset]["columns"]
+    if not columns:
+        return list(available)
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ExportError(f"Unknown columns: {', '.join(unknown)}")
+    return list(columns)
+
+
+def export_rows(
+    dataset: str,
+    columns: Sequence[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Iterator[tuple]:
+    """Yield value tuples for ``columns``, with the date column in [start, end), archived rows first."""
+    spec = DATASETS[dataset]
+    queryset = spec["query"]()
+    if start:
+        queryset = queryset.filter(**{f"{spec['date_field']}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{spec['date_field']}__lt": end})
+    lookups = [spec["columns"][c] for c in columns]
+    return queryset.order_by("id").values_list(*lookups).iterator(chunk_size=_chunk_size())
+
+
+def _cell(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class _Buffer:
+    """File-like sink for csv.writer that just collects what was written."""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.size = 0
+
+    def write(self, value: str) -> None:
+        self.parts.append(value)
+        self.size += len(value)
+
+    def drain(self) -> bytes:
+        data = "".join(self.parts).encode("utf-8")
+        self.parts.clear()
+        self.size = 0
+        return data
+
+
+def iter_csv(columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_cell(v) for v in row])
+        if buffer.size >= FLUSH_BYTES:
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def _dumps(record: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def iter_ndjson(columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    parts: List[bytes] = []
+    size = 0
+    for row in rows:
+        line = _dumps({c: _cell(v) for c, v in zip(columns, row)})
+        parts.append(line)
+        parts.append(b"\n")
+        size += len(line) + 1
+        if size >= FLUSH_BYTES:
+            yield b"".join(parts)
+            parts.clear()
+            size = 0
+    yield b"".join(parts)
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally (wbits=31 writes the gzip header and trailer)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(
+    dataset: str,
+    fmt: str = FORMAT_CSV,
+    columns: Optional[Sequence[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    gzip: bool = False,
+) -> Iterator[bytes]:
+    """Validate the request eagerly, then return a lazy byte stream of the export."""
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format: {fmt}")
+    columns = resolve_columns(dataset, columns)
+    encode = iter_csv if fmt == FORMAT_CSV else iter_ndjson
+    chunks = encode(columns, export_rows(dataset, columns, start, end))
+    return gzip_chunks(chunks) if gzip else chunks
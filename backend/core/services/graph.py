@@ -2,10 +2,17 @@
 from __future__ import annotations
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple, Optional
 import heapq
+import uuid
 
-from core.models import POI, PoiEdge
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import POI, PoiEdge, PoiEdgeVersion
+from core.services import telemetry
+from core.tracing import span
 
 
 @dataclass
@@ -15,16 +22,19 @@ class PathResult:
 
 
 class PoiGraph:
-    def __init__(self, adjacency: Dict[int, List[Tuple[int, int]]]):
+    def __init__(self, adjacency: Dict[int, List[Tuple[int, int]]], token: Optional[str] = None):
         self.adjacency = adjacency
+        # identifies this snapshot to the planning processes that hold a copy (routing_pool)
+        self.token = token or uuid.uuid4().hex
 
     @classmethod
     def from_db(cls) -> "PoiGraph":
-        from collections import defaultdict
+        return cls.from_edges(PoiEdge.objects.values_list("from_poi_id", "to_poi_id", "travel_time_s"))
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[Tuple[int, int, int]]) -> "PoiGraph":
         adj = defaultdict(list)
-        edges = PoiEdge.objects.all().select_related("from_poi", "to_poi")
-        for e in edges:
-            a, b, t = e.from_poi_id, e.to_poi_id, e.travel_time_s
+        for a, b, t in edges:
             adj[a].append((b, t))
             adj[b].append((a, t))  # undirected
         return cls(dict(adj))
@@ -70,18 +80,108 @@ class PoiGraph:
 
         return PathResult(travel_time_s=dist[end_id], poi_ids=path_ids)
 
+    def distances_from(self, start_id: int) -> Dict[int, int]:
+        """Travel time from ``start_id`` to every POI reachable from it (and back: edges are undirected)."""
+        dist = {start_id: 0}
+        heap: List[Tuple[int, int]] = [(0, start_id)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            for neighbor, w in self.adjacency.get(node, []):
+                nd = d + w
+                if nd < dist.get(neighbor, nd + 1):
+                    dist[neighbor] = nd
+                    heapq.heappush(heap, (nd, neighbor))
+        return dist
+
 
 # simple module-level cache for graph
 _graph_cache: Optional[PoiGraph] = None
 
 
+def invalidate() -> None:
+    global _graph_cache
+    _graph_cache = None
+
+
 def get_graph(force_reload: bool = False) -> PoiGraph:
     global _graph_cache
     if _graph_cache is None or force_reload:
-        _graph_cache = PoiGraph.from_db()
+        with span("graph_load"):
+            _graph_cache = PoiGraph.from_db()
+        telemetry.inc(telemetry.GRAPH_CACHE_REBUILDS)
+    else:
+        telemetry.inc(telemetry.GRAPH_CACHE_HITS)
     return _graph_cache
 
 
+def use_graph(graph: PoiGraph) -> None:
+    """
+    Make ``graph`` the cached graph until the next invalidate(), e.g. a past
+    graph from graph_as_of() for a replay. Callers must invalidate() after.
+    """
+    global _graph_cache
+    _graph_cache = graph
+
+
+# ----- edge history -----
+
+def sync_edge_versions(edges: Iterable[PoiEdge], at: Optional[datetime] = None, created: bool = False) -> None:
+    """
+    Start a new PoiEdgeVersion for every edge whose open version is missing
+    or no longer matches it (``created``: the edges are new, so none has one).
+    Called on save and after bulk edge writes.
+    """
+    at = at or timezone.now()
+    edges = {e.id: e for e in edges}
+    if not edges:
+        return
+    open_versions = {} if created else {
+        v.edge_id: v for v in PoiEdgeVersion.objects.filter(edge_id__in=list(edges), valid_to__isnull=True)
+    }
+    closed, opened = [], []
+    for edge_id, e in edges.items():
+        v = open_versions.get(edge_id)
+        if v is not None:
+            if (v.from_poi_id, v.to_poi_id, v.travel_time_s) == (e.from_poi_id, e.to_poi_id, e.travel_time_s):
+                continue
+            closed.append(v.id)
+        opened.append(PoiEdgeVersion(
+            edge_id=edge_id, from_poi_id=e.from_poi_id, to_poi_id=e.to_poi_id,
+            travel_time_s=e.travel_time_s, valid_from=at,
+        ))
+    if closed:
+        PoiEdgeVersion.objects.filter(pk__in=closed).update(valid_to=at)
+    PoiEdgeVersion.objects.bulk_create(opened)
+
+
+def close_edge_versions(edge_ids: Iterable[int], at: Optional[datetime] = None) -> None:
+    PoiEdgeVersion.objects.filter(edge_id__in=list(edge_ids), valid_to__isnull=True).update(
+        valid_to=at or timezone.now()
+    )
+
+
+def graph_as_of(moment: datetime) -> PoiGraph:
+    """The graph as it was at ``moment``, rebuilt from PoiEdgeVersion rows."""
+    versions = PoiEdgeVersion.objects.filter(
+        Q(valid_to__isnull=True) | Q(valid_to__gt=moment), valid_from__lte=moment
+    )
+    return PoiGraph.from_edges(versions.values_list("from_poi_id", "to_poi_id", "travel_time_s"))
+
+
+def graph_changes(start: datetime, end: datetime) -> List[datetime]:
+    """Sorted moments in (start, end) at which some edge changed."""
+    changes = set()
+    for field in ("valid_from", "valid_to"):
+        changes.update(
+            PoiEdgeVersion.objects
+            .filter(**{f"{field}__gt": start, f"{field}__lt": end})
+            .values_list(field, flat=True)
+        )
+    return sorted(changes)
+
+
 def get_travel_time_and_route(a: POI, b: POI) -> PathResult:
     graph = get_graph()
     return graph.shortest_path(a.id, b.id)
@@ -90,3 +190,8 @@ def get_travel_time_and_route(a: POI, b: POI) -> PathResult:
 def get_travel_time_s(a: POI, b: POI) -> int:
     return get_travel_time_and_route(a, b).travel_time_s
 
+
+def travel_time_s(a_id: int, b_id: int) -> int:
+    """get_travel_time_s by POI id."""
+    return get_graph().shortest_path(a_id, b_id).travel_time_s
+
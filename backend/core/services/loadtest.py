@@ -0,0 +1,404 @@
+# core/services/loadtest.py
+"""
+Concurrent load generator for the dispatcher and driver workflows.
+
+Three kinds of actor run on their own threads for a fixed duration:
+
+- dispatchers create rides with Poisson arrivals (``ride_rate`` per second
+  each), a ``bulk_fraction`` of them as bulk batches. Their latency is
+  measured from the scheduled arrival time, so when the server falls
+  behind the queueing delay is counted instead of hidden;
+- drivers poll their route and start or complete the next stop;
+- dashboards poll the rides list.
+
+Requests go over HTTP to a running server or through Django's in-process
+WSGI handler. Lock contention is reported as database errors caused by
+locks (and the time spent in those statements) in-process, and, on
+Postgres, as sampled counts of ungranted entries in pg_locks.
+
+The run creates its own users (with a random password) and buggies, and
+deactivates them when it ends. Outside a throwaway database it refuses to
+start unless ``allow_writes`` is given.
+"""
+from __future__ import annotations
+import json
+import random
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from django.db import OperationalError, connection, connections
+from django.utils import timezone
+
+from core.models import Buggy, POI, PoiEdge, User
+from core.services.scratch import is_throwaway_database
+
+LOCK_ERROR_MARKERS = ("locked", "deadlock", "lock timeout", "could not obtain lock", "could not serialize")
+PG_LOCK_SAMPLE_INTERVAL_S = 0.2
+
+
+class LoadTestError(Exception):
+    pass
+
+
+@dataclass
+class LoadConfig:
+    duration_s: float = 30.0
+    dispatchers: int = 10
+    ride_rate: float = 0.2  # rides per second per dispatcher
+    bulk_fraction: float = 0.0
+    bulk_size: int = 5
+    drivers: int = 40
+    driver_interval_s: float = 2.0
+    dashboards: int = 2
+    dashboard_interval_s: float = 2.0
+    seed: int = 0
+
+
+def percentile(ordered: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+# ----- transports -----
+
+class HttpTransport:
+    name = "http"
+
+    def __init__(self, base_url: str, timeout_s: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout_s = timeout_s
+
+    def request(self, method: str, path: str, token: Optional[str] = None, data=None) -> Tuple[int, object]:
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        body = json.dumps(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout_s) as resp:
+                return resp.status, _decode(resp.read())
+        except urllib.error.HTTPError as exc:
+            return exc.code, _decode(exc.read())
+
+    def token_for(self, user: User, password: str) -> str:
+        status, body = self.request("POST", "/auth/login/", data={"username": user.username, "password": password})
+        if status != 200:
+            raise LoadTestError(f"Login failed for {user.username}: HTTP {status}")
+        return body["access"]
+
+
+class WsgiTransport:
+    """Drive the app in this process through Django's test client (one per thread)."""
+    name = "wsgi"
+    prefix = "/api"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, token: Optional[str] = None, data=None) -> Tuple[int, object]:
+        from django.test import Client
+
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = Client(raise_request_exception=False)
+        extra = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        body = json.dumps(data) if data is not None else ""
+        response = client.generic(method, self.prefix + path, body, content_type="application/json", **extra)
+        return response.status_code, _decode(response.content)
+
+    def token_for(self, user: User, password: str) -> str:
+        from core.authentication import ClaimsTokenObtainPairSerializer
+
+        return str(ClaimsTokenObtainPairSerializer.get_token(user).access_token)
+
+
+def _decode(raw: bytes):
+    try:
+        return json.loads(raw) if raw else None
+    except ValueError:
+        return None
+
+
+# ----- results -----
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.lock_errors = 0
+        self.lock_wait_s = 0.0
+
+    def record(self, endpoint: str, latency_s: float, status: int) -> None:
+        with self.lock:
+            self.latencies[endpoint].append(latency_s)
+            self.statuses[endpoint][status] += 1
+
+    def record_lock_error(self, duration_s: float) -> None:
+        with self.lock:
+            self.lock_errors += 1
+            self.lock_wait_s += duration_s
+
+    def lock_wrapper(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook: count statements that failed on a lock."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as exc:
+            if any(marker in str(exc).lower() for marker in LOCK_ERROR_MARKERS):
+                self.record_lock_error(time.perf_counter() - start)
+            raise
+
+
+class PgLockSampler(threading.Thread):
+    """Sample the number of waiting lock requests on Postgres."""
+
+    def __init__(self, stop: threading.Event):
+        super().__init__(name="loadtest-pg-locks", daemon=True)
+        self.stop = stop
+        self.samples: List[int] = []
+
+    def run(self):
+        try:
+            while not self.stop.is_set():
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT count(*) FROM pg_locks WHERE NOT granted")
+                    self.samples.append(cursor.fetchone()[0])
+                self.stop.wait(PG_LOCK_SAMPLE_INTERVAL_S)
+        finally:
+            connection.close()
+
+
+def is_error(status: int) -> bool:
+    return status == 0 or status >= 400
+
+
+def summarize(recorder: Recorder, elapsed_s: float) -> dict:
+    endpoints = {}
+    total = errors = 0
+    for endpoint in sorted(recorder.latencies):
+        ordered = sorted(recorder.latencies[endpoint])
+        statuses = recorder.statuses[endpoint]
+        count = len(ordered)
+        failed = sum(n for code, n in statuses.items() if is_error(code))
+        total += count
+        errors += failed
+        endpoints[endpoint] = {
+            "requests": count,
+            "errors": failed,
+            "error_rate": round(failed / count, 4) if count else 0.0,
+            "statuses": {str(code): n for code, n in sorted(statuses.items())},
+            "throughput_rps": round(count / elapsed_s, 2) if elapsed_s else 0.0,
+            **{
+                f"{name}_ms": round(percentile(ordered, q) * 1000, 2)
+                for name, q in (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+            },
+        }
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput_rps": round(total / elapsed_s, 2) if elapsed_s else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+# ----- fleet -----
+
+def prepare_fleet(dispatchers: int, drivers: int, password: str) -> Tuple[List[User], List[User], List[str]]:
+    """
+    Create (or reactivate) load-test users with ``password`` and one active
+    buggy per driver; return POI codes to ride between.
+    """
+    poi_codes = list(
+        POI.objects.filter(pk__in=PoiEdge.objects.values("from_poi")).values_list("code", flat=True)
+    )
+    if len(poi_codes) < 2:
+        raise LoadTestError("Need at least two connected POIs; run seed_pois_and_edges first.")
+
+    def ensure_users(prefix: str, count: int, role: str) -> List[User]:
+        usernames = [f"{prefix}_{i}" for i in range(count)]
+        existing = {u.username: u for u in User.objects.filter(username__in=usernames)}
+        users = []
+        for name in usernames:
+            user = existing.get(name)
+            if user is None:
+                user = User.objects.create_user(username=name, password=password, role=role)
+            else:
+                user.set_password(password)
+                user.is_active = True
+                user.save(update_fields=["password", "is_active"])
+            users.append(user)
+        return users
+
+    dispatcher_users = ensure_users("load_dispatcher", dispatchers, User.Role.DISPATCHER)
+    driver_users = ensure_users("load_driver", drivers, User.Role.DRIVER)
+
+    start_poi = POI.objects.get(code=poi_codes[0])
+    for i, driver in enumerate(driver_users):
+        Buggy.objects.update_or_create(
+            code=f"LOAD_{i:03d}",
+            defaults={
+                "display_name": f"Load Buggy #{i}",
+                "status": Buggy.Status.ACTIVE,
+                "driver": driver,
+                "current_poi": start_poi,
+            },
+        )
+    return dispatcher_users, driver_users, poi_codes
+
+
+def retire_fleet(users: List[User]) -> None:
+    """Take the load-test buggies out of service and lock the load-test accounts."""
+    Buggy.objects.filter(code__startswith="LOAD_").update(status=Buggy.Status.INACTIVE)
+    for user in users:
+        user.set_unusable_password()
+        user.is_active = False
+        user.save(update_fields=["password", "is_active"])
+
+
+# ----- actors -----
+
+class LoadTest:
+    def __init__(self, config: LoadConfig, transport, password: Optional[str] = None, allow_writes: bool = False):
+        self.config = config
+        self.transport = transport
+        self.password = password or secrets.token_urlsafe(16)
+        self.allow_writes = allow_writes
+        self.recorder = Recorder()
+
+    def _rng(self, actor: str, index: int) -> random.Random:
+        return random.Random(f"{self.config.seed}:{actor}:{index}")
+
+    def _call(self, endpoint: str, method: str, path: str, token: str, data=None, started: Optional[float] = None):
+        started = time.perf_counter() if started is None else started
+        try:
+            status, body = self.transport.request(method, path, token, data)
+        except (OSError, urllib.error.URLError):
+            status, body = 0, None
+        self.recorder.record(endpoint, time.perf_counter() - started, status)
+        return status, body
+
+    def _dispatcher(self, index: int, token: str, poi_codes: List[str], deadline: float) -> None:
+        cfg = self.config
+        rng = self._rng("dispatcher", index)
+        scheduled = time.perf_counter()
+        while True:
+            scheduled += rng.expovariate(cfg.ride_rate)
+            if scheduled >= deadline:
+                return
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            def ride():
+                pickup, dropoff = rng.sample(poi_codes, 2)
+                return {"pickup_poi_code": pickup, "dropoff_poi_code": dropoff, "num_guests": rng.randint(1, 4)}
+
+            if rng.random() < cfg.bulk_fraction:
+                payload = [ride() for _ in range(cfg.bulk_size)]
+                self._call("rides-bulk-create-and-assign", "POST", "/rides/bulk-create-and-assign/", token,
+                           payload, started=scheduled)
+            else:
+                self._call("rides-create-and-assign", "POST", "/rides/create-and-assign/", token,
+                           ride(), started=scheduled)
+
+    def _driver(self, index: int, token: str, deadline: float) -> None:
+        rng = self._rng("driver", index)
+        while time.perf_counter() < deadline:
+            status, stops = self._call("driver-my-route", "GET", "/driver/my-route/", token)
+            if status == 200 and stops:
+                stop = stops[0]
+                action = "start" if stop["status"] == "PLANNED" else "complete"
+                self._call(f"driver-stop-{action}", "POST", f"/driver/stops/{stop['id']}/{action}/", token)
+            time.sleep(self.config.driver_interval_s * rng.uniform(0.5, 1.5))
+
+    def _dashboard(self, index: int, token: str, deadline: float) -> None:
+        rng = self._rng("dashboard", index)
+        while time.perf_counter() < deadline:
+            self._call("rides-list", "GET", "/rides/", token)
+            time.sleep(self.config.dashboard_interval_s * rng.uniform(0.5, 1.5))
+
+    def _run_actor(self, target, *args) -> None:
+        try:
+            if self.transport.name == "wsgi":
+                with connection.execute_wrapper(self.recorder.lock_wrapper):
+                    target(*args)
+            else:
+                target(*args)
+        finally:
+            connections.close_all()
+
+    def run(self) -> dict:
+        if not self.allow_writes and not is_throwaway_database():
+            raise LoadTestError(
+                f"Refusing to create load-test buggies and users in {connection.settings_dict['NAME']}; "
+                "pass allow_writes (--allow-writes) to run against this database."
+            )
+        cfg = self.config
+        users, drivers, poi_codes = prepare_fleet(
+            max(cfg.dispatchers, 1 if cfg.dashboards else 0), cfg.drivers, self.password
+        )
+        try:
+            return self._run(users, drivers, poi_codes)
+        finally:
+            retire_fleet(users + drivers)
+
+    def _run(self, users: List[User], drivers: List[User], poi_codes: List[str]) -> dict:
+        cfg = self.config
+        dispatchers = users[:cfg.dispatchers]
+        dashboards = users[:1] * cfg.dashboards  # dashboards share a dispatcher login
+
+        tokens = {u.pk: self.transport.token_for(u, self.password) for u in users + drivers}
+
+        stop_sampling = threading.Event()
+        sampler = PgLockSampler(stop_sampling) if connection.vendor == "postgresql" else None
+
+        started_at = timezone.now()
+        start = time.perf_counter()
+        deadline = start + cfg.duration_s
+        threads = (
+            [threading.Thread(target=self._run_actor, args=(self._dispatcher, i, tokens[u.pk], poi_codes, deadline))
+             for i, u in enumerate(dispatchers)]
+            + [threading.Thread(target=self._run_actor, args=(self._driver, i, tokens[u.pk], deadline))
+               for i, u in enumerate(drivers)]
+            + [threading.Thread(target=self._run_actor, args=(self._dashboard, i, tokens[u.pk], deadline))
+               for i, u in enumerate(dashboards)]
+        )
+        if sampler:
+            sampler.start()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        stop_sampling.set()
+        if sampler:
+            sampler.join()
+
+        db = {"vendor": connection.vendor}
+        if self.transport.name == "wsgi":
+            db.update(lock_errors=self.recorder.lock_errors, lock_error_wait_s=round(self.recorder.lock_wait_s, 3))
+        if sampler and sampler.samples:
+            db.update(
+                waiting_locks_max=max(sampler.samples),
+                waiting_locks_mean=round(sum(sampler.samples) / len(sampler.samples), 2),
+                lock_wait_sample_ratio=round(sum(1 for n in sampler.samples if n) / len(sampler.samples), 3),
+            )
+
+        return {
+            "started_at": started_at.isoformat(),
+            "transport": self.transport.name,
+            "config": asdict(cfg),
+            "elapsed_s": round(elapsed, 3),
+            **summarize(self.recorder, elapsed),
+            "db": db,
+        }
@@ -0,0 +1,290 @@
+# core/services/metrics.py
+from __future__ import annotations
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from core.models import RideMetricsRollup, RideMetricsSketch, RideRequest
+from core.services import archive
+from core.services.sketches import DDSketch
+
+Rollup = RideMetricsRollup
+Sketch = RideMetricsSketch
+BucketKey = Tuple[str, datetime, str, int]
+SketchKey = Tuple[str, datetime, int]
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99)
+
+_paused: ContextVar[bool] = ContextVar("metrics_paused", default=False)
+
+COUNTER_FIELDS = (
+    "requested_count",
+    "assigned_count",
+    "wait_sum_ms",
+    "wait_count",
+    "completed_count",
+    "ride_duration_sum_ms",
+    "ride_duration_count",
+)
+
+
+def _ms(delta: timedelta) -> int:
+    return int(delta.total_seconds() * 1000)
+
+
+def hour_bucket(value: datetime) -> datetime:
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(value) -> datetime:
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date()
+    return timezone.make_aware(datetime.combine(value, time.min))
+
+
+def _bucket_keys(ride: RideRequest, buggy_id: Optional[int]) -> Iterable[BucketKey]:
+    """Per-POI buckets always; per-buggy buckets too when ``buggy_id`` is given."""
+    buckets = [
+        (Rollup.Granularity.HOUR, hour_bucket(ride.requested_at)),
+        (Rollup.Granularity.DAY, day_bucket(ride.requested_at)),
+    ]
+    for granularity, start in buckets:
+        yield granularity, start, Rollup.Dimension.POI, ride.pickup_poi_id
+        if buggy_id is not None:
+            yield granularity, start, Rollup.Dimension.BUGGY, buggy_id
+
+
+def _request_deltas(ride: RideRequest) -> Dict[str, int]:
+    return {"requested_count": 1}
+
+
+def _assignment_deltas(ride: RideRequest) -> Dict[str, int]:
+    deltas = {"assigned_count": 1}
+    if ride.assigned_at:
+        deltas["wait_sum_ms"] = _ms(ride.assigned_at - ride.requested_at)
+        deltas["wait_count"] = 1
+    return deltas
+
+
+def _completion_deltas(ride: RideRequest) -> Dict[str, int]:
+    deltas = {"completed_count": 1}
+    if ride.pickup_completed_at and ride.dropoff_completed_at:
+        deltas["ride_duration_sum_ms"] = _ms(ride.dropoff_completed_at - ride.pickup_completed_at)
+        deltas["ride_duration_count"] = 1
+    return deltas
+
+
+def _add(
+    totals: Dict[BucketKey, Dict[str, int]], ride: RideRequest, deltas: Dict[str, int], per_buggy: bool = True
+) -> None:
+    for key in _bucket_keys(ride, ride.assigned_buggy_id if per_buggy else None):
+        row = totals[key]
+        for field, value in deltas.items():
+            row[field] = row.get(field, 0) + value
+
+
+def _apply(totals: Dict[BucketKey, Dict[str, int]]) -> None:
+    for (granularity, start, dimension, dimension_id), deltas in totals.items():
+        key = dict(granularity=granularity, bucket_start=start, dimension=dimension, dimension_id=dimension_id)
+        increments = {field: F(field) + value for field, value in deltas.items()}
+        if Rollup.objects.filter(**key).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                Rollup.objects.create(**key, **deltas)
+        except IntegrityError:
+            # Another transaction created the bucket first.
+            Rollup.objects.filter(**key).update(**increments)
+
+
+def _sample(samples: Dict[SketchKey, List[float]], metric: str, ride: RideRequest, start, end) -> None:
+    if start and end:
+        key = (metric, hour_bucket(ride.requested_at), ride.pickup_poi_id)
+        samples[key].append(max((end - start).total_seconds(), 0.0))
+
+
+def _apply_samples(samples: Dict[SketchKey, List[float]]) -> None:
+    for (metric, start, poi_id), values in samples.items():
+        key = dict(metric=metric, bucket_start=start, poi_id=poi_id)
+        row = Sketch.objects.select_for_update().filter(**key).first()
+        if row is None:
+            sketch = DDSketch()
+            sketch.extend(values)
+            try:
+                with transaction.atomic():
+                    Sketch.objects.create(**key, count=sketch.count, sketch=sketch.to_bytes())
+                continue
+            except IntegrityError:
+                row = Sketch.objects.select_for_update().get(**key)
+        sketch = DDSketch.from_bytes(bytes(row.sketch))
+        sketch.extend(values)
+        row.count = sketch.count
+        row.sketch = sketch.to_bytes()
+        row.save(update_fields=["count", "sketch"])
+
+
+@contextmanager
+def paused():
+    """Record nothing inside the block (simulations whose writes are rolled back anyway)."""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+
+
+def record_requests(rides: Iterable[RideRequest]) -> None:
+    """
+    Count accepted ride requests, whether they were assigned right away or
+    queued. Call once the ride is known to be kept (it is deleted again when
+    synchronous assignment fails).
+    """
+    if _paused.get():
+        return
+    totals: Dict[BucketKey, Dict[str, int]] = defaultdict(dict)
+    for ride in rides:
+        _add(totals, ride, _request_deltas(ride), per_buggy=False)
+    _apply(totals)
+
+
+def record_assignments(rides: Iterable[RideRequest]) -> None:
+    """Count newly assigned rides and their assignment wait. Call inside the assignment transaction."""
+    if _paused.get():
+        return
+    totals: Dict[BucketKey, Dict[str, int]] = defaultdict(dict)
+    samples: Dict[SketchKey, List[float]] = defaultdict(list)
+    for ride in rides:
+        _add(totals, ride, _assignment_deltas(ride))
+        _sample(samples, Sketch.Metric.ASSIGNMENT_WAIT, ride, ride.requested_at, ride.assigned_at)
+    _apply(totals)
+    _apply_samples(samples)
+
+
+def record_pickup(ride: RideRequest) -> None:
+    """Record the guest's pickup wait. Call inside the stop-completion transaction."""
+    if _paused.get():
+        return
+    samples: Dict[SketchKey, List[float]] = defaultdict(list)
+    _sample(samples, Sketch.Metric.PICKUP_WAIT, ride, ride.requested_at, ride.pickup_completed_at)
+    _apply_samples(samples)
+
+
+def record_completion(ride: RideRequest) -> None:
+    """Count a finished ride and its duration. Call inside the stop-completion transaction."""
+    if _paused.get():
+        return
+    totals: Dict[BucketKey, Dict[str, int]] = defaultdict(dict)
+    samples: Dict[SketchKey, List[float]] = defaultdict(list)
+    _add(totals, ride, _completion_deltas(ride))
+    _sample(samples, Sketch.Metric.RIDE_DURATION, ride, ride.pickup_completed_at, ride.dropoff_completed_at)
+    _apply(totals)
+    _apply_samples(samples)
+
+
+def summarize(day: date) -> Dict[str, Optional[int]]:
+    """Totals for one day, read from the daily per-POI rollups."""
+    totals = (
+        Rollup.objects
+        .filter(
+            granularity=Rollup.Granularity.DAY,
+            bucket_start=day_bucket(day),
+            dimension=Rollup.Dimension.POI,
+        )
+        .aggregate(rides=Sum("requested_count"), wait_sum=Sum("wait_sum_ms"), wait_count=Sum("wait_count"))
+    )
+    wait_count = totals["wait_count"] or 0
+    return {
+        "total_rides": totals["rides"] or 0,
+        "avg_wait_time_s": int(totals["wait_sum"] / wait_count / 1000) if wait_count else None,
+    }
+
+
+def percentiles(
+    start: datetime,
+    end: datetime,
+    poi_id: Optional[int] = None,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+) -> Dict[str, dict]:
+    """
+    Quantiles of each timing metric for rides requested in [start, end).
+
+    Merges one stored sketch per hour (and POI), so the cost depends on the
+    window length, not on how many rides it contains.
+    """
+    rows = Sketch.objects.filter(bucket_start__gte=hour_bucket(start), bucket_start__lt=end)
+    if poi_id is not None:
+        rows = rows.filter(poi_id=poi_id)
+
+    merged = {metric: DDSketch() for metric in Sketch.Metric.values}
+    for metric, payload in rows.values_list("metric", "sketch"):
+        merged[metric].merge(DDSketch.from_bytes(bytes(payload)))
+
+    out = {}
+    for metric, sketch in merged.items():
+        stats = {"count": sketch.count}
+        for q in quantiles:
+            value = sketch.quantile(q)
+            stats[f"p{q * 100:g}"] = round(value, 1) if value is not None else None
+        out[metric.lower()] = stats
+    return out
+
+
+def rebuild_rollups(start: Optional[date] = None, end: Optional[date] = None, chunk_size: int = 2000) -> int:
+    """
+    Recompute rollups from ride history (live and archived) for days in [start, end].
+
+    Only whole days are rebuilt, so the hourly and daily rows stay consistent.
+    Quantile sketches for the same days are rebuilt alongside. Returns the
+    number of rows written.
+    """
+    rides = archive.rides()
+    buckets = Rollup.objects.all()
+    sketch_rows = Sketch.objects.all()
+    if start:
+        rides = rides.filter(requested_at__gte=day_bucket(start))
+        buckets = buckets.filter(bucket_start__gte=day_bucket(start))
+        sketch_rows = sketch_rows.filter(bucket_start__gte=day_bucket(start))
+    if end:
+        rides = rides.filter(requested_at__lt=day_bucket(end + timedelta(days=1)))
+        buckets = buckets.filter(bucket_start__lt=day_bucket(end + timedelta(days=1)))
+        sketch_rows = sketch_rows.filter(bucket_start__lt=day_bucket(end + timedelta(days=1)))
+
+    totals: Dict[BucketKey, Dict[str, int]] = defaultdict(dict)
+    samples: Dict[SketchKey, List[float]] = defaultdict(list)
+    fields = [
+        "requested_at", "assigned_at", "pickup_completed_at", "dropoff_completed_at",
+        "pickup_poi_id", "assigned_buggy_id", "status",
+    ]
+    for ride in rides.only(*fields).iterator(chunk_size=chunk_size):
+        _add(totals, ride, _request_deltas(ride), per_buggy=False)
+        if ride.assigned_at is None:
+            continue
+        _add(totals, ride, _assignment_deltas(ride))
+        _sample(samples, Sketch.Metric.ASSIGNMENT_WAIT, ride, ride.requested_at, ride.assigned_at)
+        _sample(samples, Sketch.Metric.PICKUP_WAIT, ride, ride.requested_at, ride.pickup_completed_at)
+        if ride.status == RideRequest.Status.COMPLETED:
+            _add(totals, ride, _completion_deltas(ride))
+            _sample(samples, Sketch.Metric.RIDE_DURATION, ride, ride.pickup_completed_at, ride.dropoff_completed_at)
+
+    rows = [
+        Rollup(granularity=g, bucket_start=s, dimension=d, dimension_id=i, **deltas)
+        for (g, s, d, i), deltas in totals.items()
+    ]
+    sketches = []
+    for (metric, bucket, poi_id), values in samples.items():
+        sketch = DDSketch()
+        sketch.extend(values)
+        sketches.append(Sketch(metric=metric, bucket_start=bucket, poi_id=poi_id, count=sketch.count,
+                               sketch=sketch.to_bytes()))
+    with transaction.atomic():
+        buckets.delete()
+        sketch_rows.delete()
+        Rollup.objects.bulk_create(rows, batch_size=chunk_size)
+        Sketch.objects.bulk_create(sketches, batch_size=chunk_size)
+    return len(rows) + len(sketches)
@@ -0,0 +1,150 @@
+# core/services/passwords.py
+"""
+Password hashing off the request threads.
+
+PBKDF2 holds the GIL for the whole hash, so inside gthread workers a single
+login stalls every other request on that worker. Hashing and verification
+run in a small per-process pool of hashing processes instead, and concurrent
+logins are capped so a shift-change burst queues instead of piling up.
+"""
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_TIMEOUT_S = 10.0
+DEFAULT_MAX_CONCURRENT_LOGINS = 4
+DEFAULT_ADMISSION_TIMEOUT_S = 5.0
+
+
+class LoginCapacityExceeded(Exception):
+    pass
+
+
+class HashTimeout(Exception):
+    """A hash did not finish within PASSWORD_HASH_TIMEOUT_S, or its pool was recycled under it."""
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_login_slots: Optional[threading.BoundedSemaphore] = None
+_login_slots_lock = threading.Lock()
+
+
+def _init_worker(settings_module: str) -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+
+
+def _make_password(raw_password: str) -> str:
+    return hashers.make_password(raw_password)
+
+
+def _check_password(raw_password: str, encoded: str) -> bool:
+    return hashers.check_password(raw_password, encoded)
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    size = getattr(settings, "PASSWORD_HASH_POOL_SIZE", DEFAULT_POOL_SIZE)
+    if size <= 0:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn, not fork: forking a threaded gunicorn worker is unsafe.
+                _executor = ProcessPoolExecutor(
+                    max_workers=size,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "buggy_project.settings"),),
+                )
+    return _executor
+
+
+def _reset_executor(executor: Optional[ProcessPoolExecutor] = None) -> None:
+    """
+    Drop the pool so the next call starts a fresh one; with ``executor``, only
+    if that is still the current pool, so a call that gave up on an old pool
+    doesn't throw away the one another call already replaced it with. Hashes
+    queued on the old pool belong to other logins and are left to finish.
+    """
+    global _executor
+    with _executor_lock:
+        if executor is not None and _executor is not executor:
+            return
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=False)
+        _executor = None
+
+
+def shutdown() -> None:
+    _reset_executor()
+
+
+def _run(fn, *args):
+    executor = _get_executor()
+    if executor is None:
+        return fn(*args)
+    timeout = getattr(settings, "PASSWORD_HASH_TIMEOUT_S", DEFAULT_TIMEOUT_S)
+    try:
+        future = executor.submit(fn, *args)
+        return future.result(timeout=timeout)
+    except BrokenProcessPool:
+        # A hashing process died; start a fresh pool next time and hash inline now.
+        _reset_executor(executor)
+        return fn(*args)
+    except FutureTimeoutError:
+        # The pool is saturated or stuck: don't queue behind it, and don't
+        # hash inline either (that is the GIL stall the pool exists to avoid).
+        future.cancel()
+        _reset_executor(executor)
+        raise HashTimeout(f"password hash took longer than {timeout}s")
+    except (CancelledError, RuntimeError):
+        # Another call recycled the pool between _get_executor and submit
+        # (a shut-down pool refuses new work); the retry gets a fresh one.
+        raise HashTimeout("password hash pool was recycled")
+
+
+def make_password(raw_password: str) -> str:
+    return _run(_make_password, raw_password)
+
+
+def check_password(raw_password: str, encoded: str) -> bool:
+    return _run(_check_password, raw_password, encoded)
+
+
+def must_update(encoded: str) -> bool:
+    """True when the stored hash uses outdated parameters and should be re-hashed."""
+    try:
+        return hashers.identify_hasher(encoded).must_update(encoded)
+    except ValueError:
+        return False
+
+
+@contextmanager
+def login_slot():
+    """Admission control for logins: raise LoginCapacityExceeded when all slots stay busy."""
+    global _login_slots
+    if _login_slots is None:
+        with _login_slots_lock:
+            if _login_slots is None:
+                _login_slots = threading.BoundedSemaphore(
+                    getattr(settings, "LOGIN_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT_LOGINS)
+                )
+    timeout = getattr(settings, "LOGIN_ADMISSION_TIMEOUT_S", DEFAULT_ADMISSION_TIMEOUT_S)
+    if not _login_slots.acquire(timeout=timeout):
+        raise LoginCapacityExceeded("Too many concurrent logins")
+    try:
+        yield
+    finally:
+        _login_slots.release()
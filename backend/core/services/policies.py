@@ -0,0 +1,49 @@
+# core/services/policies.py
+"""
+Named assignment policies.
+
+A policy takes a saved, unassigned ride, assigns it (appends its stops to a
+buggy's route and marks it ASSIGNED) and returns the chosen buggy. The API
+always uses DEFAULT_POLICY; the simulator and replay tools take a policy
+name so alternatives can be compared on the same demand.
+"""
+from __future__ import annotations
+from typing import Callable, Dict
+
+from core.models import Buggy, RideRequest
+from core.services import routing
+
+Policy = Callable[[RideRequest], Buggy]
+
+POLICIES: Dict[str, Policy] = {}
+DEFAULT_POLICY = "earliest_pickup"
+
+
+class UnknownPolicyError(ValueError):
+    pass
+
+
+def register(name: str):
+    def decorator(fn: Policy) -> Policy:
+        POLICIES[name] = fn
+        return fn
+    return decorator
+
+
+def get_policy(name: str) -> Policy:
+    try:
+        return POLICIES[name]
+    except KeyError:
+        raise UnknownPolicyError(f"Unknown policy {name!r}; choose from {', '.join(sorted(POLICIES))}")
+
+
+@register("earliest_pickup")
+def earliest_pickup(ride: RideRequest) -> Buggy:
+    """The production rule: the buggy that reaches the guest soonest."""
+    return routing.assign_ride_to_best_buggy(ride)
+
+
+@register("earliest_dropoff")
+def earliest_dropoff(ride: RideRequest) -> Buggy:
+    """The buggy that delivers the guest soonest, even if it picks them up later."""
+    return routing.assign_ride_to_best_buggy(ride, score=routing.total_time_score)
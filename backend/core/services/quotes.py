@@ -0,0 +1,80 @@
+# core/services/quotes.py
+"""
+Read-only ride quotes.
+
+quote() scores a prospective ride the way assign_ride_to_best_buggy does by
+default, appending it to every active buggy's route and ranking by pickup
+time. It returns the best few buggies with their pickup and dropoff ETAs,
+and never writes.
+
+Quotes are cached per process, keyed by (pickup, dropoff, guests, fleet
+state). The fleet state is the graph token plus the (id, route_version) of
+every active buggy. Any appended stop, completed stop, status change or edge
+edit therefore yields a new key, and a burst of identical quotes costs one
+fleet query each.
+"""
+from __future__ import annotations
+from typing import Dict, List, NamedTuple, Tuple
+
+from core.models import Buggy
+from core.services import telemetry
+from core.services.graph import get_graph
+from core.services.routing import (
+    DROPOFF_SERVICE_S,
+    NoActiveBuggiesError,
+    build_current_routes,
+    pickup_time_score,
+    route_state,
+    simulate_append,
+    travel_memo,
+)
+
+DEFAULT_TOP_K = 3
+QUOTE_CACHE_SIZE = 1000
+
+
+class Quote(NamedTuple):
+    buggy_id: int
+    buggy_code: str
+    buggy_display_name: str
+    pickup_eta_s: int  # from now until the buggy arrives at the pickup
+    dropoff_eta_s: int  # from now until it arrives at the dropoff
+
+
+# (pickup, dropoff, guests, fleet state) -> every active buggy's quote, best first
+_cache: Dict[Tuple, List[Quote]] = {}
+
+
+def clear() -> None:
+    _cache.clear()
+
+
+def quote(pickup_poi_id: int, dropoff_poi_id: int, guests: int, k: int = DEFAULT_TOP_K) -> List[Quote]:
+    """The ``k`` buggies that would pick the ride up first, best first (ties go to the lower id)."""
+    active = list(Buggy.objects.filter(status=Buggy.Status.ACTIVE).order_by("id"))
+    if not active:
+        raise NoActiveBuggiesError("No active buggies available")
+
+    g = get_graph()
+    key = (pickup_poi_id, dropoff_poi_id, guests, g.token, tuple((b.id, b.route_version) for b in active))
+    ranked = _cache.get(key)
+    if ranked is not None:
+        telemetry.inc(telemetry.QUOTES, "hit")
+        return ranked[:k]
+    telemetry.inc(telemetry.QUOTES, "miss")
+
+    travel_s = travel_memo(g)
+    routes = build_current_routes(active)
+    ride = (pickup_poi_id, dropoff_poi_id, guests)
+    scored = []
+    for index, buggy in enumerate(active):
+        sim = simulate_append(travel_s, route_state(buggy, routes[buggy.id]), ride)
+        dropoff_s = sim.total_time_s - DROPOFF_SERVICE_S
+        option = Quote(buggy.id, buggy.code, buggy.display_name, sim.pickup_time_s, dropoff_s)
+        scored.append((pickup_time_score(sim), index, option))
+    ranked = [q for _, _, q in sorted(scored)]
+
+    if len(_cache) >= QUOTE_CACHE_SIZE:
+        _cache.clear()
+    _cache[key] = ranked
+    return ranked[:k]
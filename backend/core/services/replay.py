@@ -0,0 +1,230 @@
+# core/services/replay.py
+"""
+Replay recorded days through assignment policies.
+
+Rides requested in a date range (live and archived) are fed to the
+simulator (core.services.simulation) at their original ``requested_at``
+offsets, against the graph as it stood at each moment (rebuilt from
+PoiEdgeVersion rows and swapped in whenever an edge changed). The fleet is
+as large as the set of buggies that served those rides, each starting at
+its first pickup of the range. Each policy runs in its own scratch
+database (core.services.scratch), never in the live one.
+
+The result compares each policy with what actually happened, using the
+recorded pickup and dropoff completion times: distributions of wait and
+ride time, and per ride the buggy chosen and the difference in wait.
+"""
+from __future__ import annotations
+import functools
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from core.models import Buggy, POI, RideRequest
+from core.services import archive, dispatch_table, graph, policies
+from core.services.simulation import (
+    Arrival, SimulationError, SimulationResult, Simulator, distribution, run_simulation, summarize,
+)
+
+
+REPLAY_PREFIX = "REPLAY_"
+
+
+class ReplayError(SimulationError):
+    pass
+
+
+@dataclass
+class RecordedRide:
+    code: str
+    pickup_poi_id: int
+    dropoff_poi_id: int
+    num_guests: int
+    buggy_id: Optional[int]
+    requested_at: datetime
+    pickup_completed_at: Optional[datetime]
+    dropoff_completed_at: Optional[datetime]
+
+    @property
+    def wait_s(self) -> Optional[float]:
+        if self.pickup_completed_at is None:
+            return None
+        return (self.pickup_completed_at - self.requested_at).total_seconds()
+
+    @property
+    def ride_s(self) -> Optional[float]:
+        if self.pickup_completed_at is None or self.dropoff_completed_at is None:
+            return None
+        return (self.dropoff_completed_at - self.pickup_completed_at).total_seconds()
+
+
+@dataclass
+class Replay:
+    start: datetime
+    end: datetime
+    rides: List[RecordedRide]
+    skipped: Dict[str, int]
+    results: Dict[str, SimulationResult]
+
+
+def load_rides(start: datetime, end: datetime) -> List[RecordedRide]:
+    """Rides requested in [start, end), live and archived, oldest first. Cancelled rides are left out."""
+    rows = (
+        archive.rides()
+        .filter(requested_at__gte=start, requested_at__lt=end)
+        .exclude(status=RideRequest.Status.CANCELLED)
+        .values_list(
+            "public_code", "pickup_poi_id", "dropoff_poi_id", "num_guests", "assigned_buggy_id",
+            "requested_at", "pickup_completed_at", "dropoff_completed_at",
+        )
+    )
+    return sorted((RecordedRide(*row) for row in rows), key=lambda r: r.requested_at)
+
+
+class ReplaySimulator(Simulator):
+    """
+    A Simulator that keeps the routing graph in step with the simulated
+    clock: at each moment in ``changes`` the graph as of that moment is
+    rebuilt and made the cached graph that routing reads. Buggies are named
+    after the recorded ones in ``fleet_codes``.
+    """
+
+    def __init__(self, *args, changes: Sequence[datetime] = (), fleet_codes: Sequence[str] = (), **kwargs):
+        graph.use_graph(graph.graph_as_of(kwargs["start"]))
+        super().__init__(*args, **kwargs)
+        self.changes = list(changes)
+        self.fleet_codes = list(fleet_codes)
+
+    def _buggy_code(self, i: int) -> str:
+        if i < len(self.fleet_codes):
+            return f"{REPLAY_PREFIX}{self.fleet_codes[i]}"[:50]
+        return super()._buggy_code(i)
+
+    def _sync_graph(self) -> None:
+        now = self.start + timedelta(seconds=self.now_s)
+        if not self.changes or self.changes[0] > now:
+            return
+        while self.changes and self.changes[0] <= now:
+            self.changes.pop(0)
+        self.graph = graph.graph_as_of(now)
+        graph.use_graph(self.graph)
+        dispatch_table.clear()
+
+    def _on_arrival(self, arrival: Arrival) -> None:
+        self._sync_graph()
+        if not {arrival.pickup_poi_id, arrival.dropoff_poi_id} <= self.graph.adjacency.keys():
+            return
+        try:
+            super()._on_arrival(arrival)
+        except ValueError:  # no route between these POIs at that time
+            pass
+
+    def _on_stop_done(self, buggy_id, stop) -> None:
+        self._sync_graph()
+        super()._on_stop_done(buggy_id, stop)
+
+
+def replay(start: datetime, end: datetime, policy_names: Optional[Sequence[str]] = None,
+           fleet_size: Optional[int] = None) -> Replay:
+    """Replay rides requested in [start, end) through each of ``policy_names`` (default: all policies)."""
+    policy_names = list(policy_names or sorted(policies.POLICIES))
+    for name in policy_names:
+        policies.get_policy(name)
+
+    recorded = load_rides(start, end)
+    known_pois = set(POI.objects.values_list("id", flat=True))
+    rides = [r for r in recorded if {r.pickup_poi_id, r.dropoff_poi_id} <= known_pois]
+    skipped = {"deleted_poi": len(recorded) - len(rides), "unroutable": 0}
+    if not rides:
+        raise ReplayError(f"No rides to replay between {start.isoformat()} and {end.isoformat()}")
+
+    arrivals = [
+        Arrival(
+            t_s=(r.requested_at - start).total_seconds(),
+            pickup_poi_id=r.pickup_poi_id,
+            dropoff_poi_id=r.dropoff_poi_id,
+            num_guests=r.num_guests,
+            ref=r.code,
+        )
+        for r in rides
+    ]
+    first_pickups: Dict[int, int] = {}
+    for r in rides:
+        if r.buggy_id is not None:
+            first_pickups.setdefault(r.buggy_id, r.pickup_poi_id)
+    fleet = sorted(first_pickups)
+    codes = dict(Buggy.objects.filter(pk__in=fleet).values_list("id", "code"))
+    start_poi_ids = [first_pickups[pk] for pk in fleet]
+    simulator = functools.partial(
+        ReplaySimulator,
+        changes=graph.graph_changes(start, end),
+        fleet_codes=[codes.get(pk, f"#{pk}") for pk in fleet],
+    )
+
+    results = {}
+    try:
+        for name in policy_names:
+            result = run_simulation(
+                arrivals, policy=name, start=start, simulator=simulator,
+                fleet_size=fleet_size or len(start_poi_ids) or None,
+                start_poi_ids=start_poi_ids or None,
+            )
+            skipped["unroutable"] = len(arrivals) - len(result.outcomes)
+            results[name] = result
+    finally:
+        graph.invalidate()
+    return Replay(start=start, end=end, rides=rides, skipped=skipped, results=results)
+
+
+def _delta(replayed: Optional[float], original: Optional[float]) -> Optional[float]:
+    if replayed is None or original is None:
+        return None
+    return round(replayed - original, 2)
+
+
+def report(result: Replay, per_ride: bool = True) -> dict:
+    """KPIs of the recorded day next to each policy's, plus per-ride differences."""
+    originals = {r.code: r for r in result.rides}
+    buggy_codes = dict(Buggy.objects.filter(pk__in={r.buggy_id for r in result.rides}).values_list("id", "code"))
+
+    out = {
+        "start": result.start.isoformat(),
+        "end": result.end.isoformat(),
+        "rides": len(result.rides),
+        "skipped": result.skipped,
+        "recorded": {
+            "wait_s": distribution([r.wait_s for r in result.rides if r.wait_s is not None]),
+            "ride_time_s": distribution([r.ride_s for r in result.rides if r.ride_s is not None]),
+        },
+        "policies": {},
+    }
+    rows = {
+        r.code: {
+            "ride": r.code,
+            "requested_at": r.requested_at.isoformat(),
+            "recorded": {"buggy": buggy_codes.get(r.buggy_id, ""), "wait_s": r.wait_s, "ride_s": r.ride_s},
+        }
+        for r in result.rides
+    }
+    for name, sim in result.results.items():
+        summary = summarize(sim)
+        simulated_s = sim.end_s - sim.first_arrival_s
+        summary["speedup"] = round(simulated_s / sim.wall_s, 1) if sim.wall_s else None
+        deltas = []
+        for o in sim.outcomes:
+            delta = _delta(o.wait_s, originals[o.arrival.ref].wait_s)
+            if delta is not None:
+                deltas.append(delta)
+            rows[o.arrival.ref][name] = {
+                "buggy": o.buggy_code.removeprefix(REPLAY_PREFIX),
+                "wait_s": o.wait_s,
+                "ride_s": o.ride_s,
+                "wait_delta_s": delta,
+            }
+        summary["wait_delta_s"] = distribution(deltas)
+        summary["rides_waiting_less"] = sum(1 for d in deltas if d < 0)
+        summary["rides_waiting_more"] = sum(1 for d in deltas if d > 0)
+        out["policies"][name] = summary
+    if per_ride:
+        out["per_ride"] = list(rows.values())
+    return out
@@ -1,15 +1,29 @@
 # core/services/routing.py
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
 from django.utils import timezone
 
 from core.models import Buggy, BuggyRouteStop, RideRequest, POI
-from core.services.graph import get_travel_time_s
+from core.services import dispatch_table, metrics, routing_pool, telemetry
+from core.services.graph import PoiGraph, get_graph, travel_time_s
+from core.tracing import span
 
 PICKUP_SERVICE_S = 25
 DROPOFF_SERVICE_S = 25
+DEFAULT_CONFLICT_RETRIES = 3
+
+# Compact, picklable planning inputs (routing_pool ships them to other processes):
+# (buggy id, current POI id or None, guests on board, remaining stops as (POI id, is pickup, guests))
+RouteState = Tuple[int, Optional[int], int, Tuple[Tuple[int, bool, int], ...]]
+# (pickup POI id, dropoff POI id, guests)
+RideSpec = Tuple[int, int, int]
+TravelTime = Callable[[int, int], int]
 
 
 @dataclass
@@ -30,6 +44,34 @@ class NoActiveBuggiesError(Exception):
     pass
 
 
+class AssignmentConflictError(Exception):
+    """The chosen buggies kept changing between scoring and locking; nothing was written."""
+
+
+def _to_simulated_stop(stop: BuggyRouteStop) -> SimulatedStop:
+    return SimulatedStop(
+        ride_request=stop.ride_request,
+        stop_type=stop.stop_type,
+        poi=stop.poi,
+        num_guests=stop.ride_request.num_guests,
+    )
+
+
+def build_current_routes(buggies: Sequence[Buggy]) -> Dict[int, List[SimulatedStop]]:
+    """Like build_current_route_for_buggy, but for many buggies in a single query."""
+    routes: Dict[int, List[SimulatedStop]] = {b.id: [] for b in buggies}
+    stops = (
+        BuggyRouteStop.objects
+        .filter(buggy__in=list(routes))
+        .exclude(status=BuggyRouteStop.StopStatus.COMPLETED)
+        .order_by("buggy_id", "sequence_index")
+        .select_related("ride_request", "poi")
+    )
+    for s in stops:
+        routes[s.buggy_id].append(_to_simulated_stop(s))
+    return routes
+
+
 def build_current_route_for_buggy(buggy: Buggy) -> List[SimulatedStop]:
     stops = (
         BuggyRouteStop.objects
@@ -38,51 +80,227 @@ def build_current_route_for_buggy(buggy: Buggy) -> List[SimulatedStop]:
         .order_by("sequence_index")
         .select_related("ride_request", "poi")
     )
-    sim_stops: List[SimulatedStop] = []
-    for s in stops:
-        sim_stops.append(
-            SimulatedStop(
-                ride_request=s.ride_request,
-                stop_type=s.stop_type,
-                poi=s.poi,
-                num_guests=s.ride_request.num_guests,
-            )
-        )
-    return sim_stops
+    return [_to_simulated_stop(s) for s in stops]
 
 
-def simulate_append_for_buggy(*, buggy: Buggy, current_route: List[SimulatedStop], new_ride: RideRequest) -> SimResult:
+def route_state(buggy: Buggy, route: Sequence[SimulatedStop]) -> RouteState:
+    return (
+        buggy.id,
+        buggy.current_poi_id,
+        buggy.current_onboard_guests,
+        tuple((s.poi.id, s.stop_type == BuggyRouteStop.StopType.PICKUP, s.num_guests) for s in route),
+    )
+
+
+def ride_spec(ride: RideRequest) -> RideSpec:
+    return (ride.pickup_poi_id, ride.dropoff_poi_id, ride.num_guests)
+
+
+def simulate_append(travel_s: TravelTime, state: RouteState, ride: RideSpec) -> SimResult:
+    _, current_poi, onboard, stops = state
+    pickup_poi, dropoff_poi, guests = ride
     time_s = 0
-    current_poi = buggy.current_poi or new_ride.pickup_poi
-    onboard = buggy.current_onboard_guests
+    if current_poi is None:
+        current_poi = pickup_poi
 
     # existing route
-    for stop in current_route:
-        time_s += get_travel_time_s(current_poi, stop.poi)
-        current_poi = stop.poi
+    for poi, is_pickup, num_guests in stops:
+        time_s += travel_s(current_poi, poi)
+        current_poi = poi
 
-        if stop.stop_type == BuggyRouteStop.StopType.PICKUP:
+        if is_pickup:
             time_s += PICKUP_SERVICE_S
-            onboard += stop.num_guests
+            onboard += num_guests
         else:
             time_s += DROPOFF_SERVICE_S
-            onboard -= stop.num_guests
+            onboard -= num_guests
 
     # new pickup
-    time_s += get_travel_time_s(current_poi, new_ride.pickup_poi)
+    time_s += travel_s(current_poi, pickup_poi)
     pickup_time_s = time_s
     time_s += PICKUP_SERVICE_S
-    onboard += new_ride.num_guests
+    onboard += guests
 
     # new dropoff
-    time_s += get_travel_time_s(new_ride.pickup_poi, new_ride.dropoff_poi)
+    time_s += travel_s(pickup_poi, dropoff_poi)
     time_s += DROPOFF_SERVICE_S
-    onboard -= new_ride.num_guests
+    onboard -= guests
 
     return SimResult(pickup_time_s=pickup_time_s, total_time_s=time_s)
 
 
+def simulate_append_for_buggy(*, buggy: Buggy, current_route: List[SimulatedStop], new_ride: RideRequest) -> SimResult:
+    return simulate_append(travel_time_s, route_state(buggy, current_route), ride_spec(new_ride))
+
+
+@dataclass
+class Plan:
+    choices: List[int]    # index into the states of the buggy chosen for each ride
+    evaluated: List[int]  # candidates fully simulated for each ride
+
+
+def travel_memo(g: PoiGraph) -> TravelTime:
+    travel: Dict[Tuple[int, int], int] = {}
+
+    def travel_s(a: int, b: int) -> int:
+        if (a, b) not in travel:
+            travel[a, b] = g.shortest_path(a, b).travel_time_s
+        return travel[a, b]
+    return travel_s
+
+
+# (graph token, start POI, stops) -> time to work through the stops; see _committed_route_s
+_committed_route_cache: Dict[Tuple, int] = {}
+COMMITTED_ROUTE_CACHE_SIZE = 20000
+
+
+def _committed_route_s(g: PoiGraph, state: RouteState, travel_s: TravelTime) -> Optional[Tuple[int, int]]:
+    """
+    (time to finish the buggy's remaining stops, POI it ends at), or None for
+    a buggy with no known position. Routes change far less often than rides
+    are assigned, so the result is cached per graph snapshot and route.
+    """
+    _, current_poi, _, stops = state
+    if current_poi is None:
+        return None
+    if not stops:
+        return 0, current_poi
+    key = (g.token, current_poi, stops)
+    route_s = _committed_route_cache.get(key)
+    if route_s is None:
+        route_s, here = 0, current_poi
+        for poi, is_pickup, _ in stops:
+            route_s += travel_s(here, poi) + (PICKUP_SERVICE_S if is_pickup else DROPOFF_SERVICE_S)
+            here = poi
+        if len(_committed_route_cache) >= COMMITTED_ROUTE_CACHE_SIZE:
+            _committed_route_cache.clear()
+        _committed_route_cache[key] = route_s
+    return route_s, stops[-1][0]
+
+
+def _pickup_lower_bound(g: PoiGraph, state: RouteState, to_pickup: Dict[int, int], travel_s: TravelTime) -> int:
+    """
+    No buggy reaches the pickup before finishing its committed route and
+    then driving from its last stop. A buggy with no position or whose last
+    stop is cut off from the pickup gets 0, so it is always simulated.
+    """
+    committed = _committed_route_s(g, state, travel_s)
+    if committed is None:
+        return 0
+    route_s, last_poi = committed
+    if last_poi not in to_pickup:
+        return 0
+    return route_s + to_pickup[last_poi]
+
+
+def plan_greedy(
+    g: PoiGraph, states: Sequence[RouteState], rides: Sequence[RideSpec], score: Callable[[SimResult], int]
+) -> Plan:
+    """
+    Place ``rides`` in order, each on the buggy with the lowest ``score``
+    (ties go to the earlier state); a placed ride counts in its buggy's
+    route for later ones.
+
+    For scores in SCORE_BOUNDS candidates are simulated in order of a lower
+    bound on their score (committed route time, cached, plus the trip from
+    the route's end, from one search out of the pickup), and the rest are
+    skipped once the bound passes the best score found. The choice is the
+    same as simulating every candidate.
+    """
+    travel_s = travel_memo(g)
+    states = list(states)
+    bound = SCORE_BOUNDS.get(score)
+    plan = Plan(choices=[], evaluated=[])
+    for ride in rides:
+        pickup_poi, dropoff_poi, guests = ride
+        to_pickup = g.distances_from(pickup_poi) if bound is not None else {}
+        if dropoff_poi in to_pickup:
+            ride_s = to_pickup[dropoff_poi]
+            order = sorted(
+                (bound(_pickup_lower_bound(g, state, to_pickup, travel_s), ride_s), i)
+                for i, state in enumerate(states)
+            )
+        else:
+            order = [(0, i) for i in range(len(states))]
+
+        best, best_value, evaluated = None, None, 0
+        for lower_bound, i in order:
+            if best_value is not None and lower_bound > best_value:
+                break
+            value = score(simulate_append(travel_s, states[i], ride))
+            evaluated += 1
+            if best_value is None or value < best_value or (value == best_value and i < best):
+                best, best_value = i, value
+
+        buggy_id, current_poi, onboard, stops = states[best]
+        stops += ((pickup_poi, True, guests), (dropoff_poi, False, guests))
+        states[best] = (buggy_id, current_poi, onboard, stops)
+        plan.choices.append(best)
+        plan.evaluated.append(evaluated)
+    return plan
+
+
+def _plan(states: Sequence[RouteState], rides: Sequence[RideSpec], score: Callable[[SimResult], int]) -> List[int]:
+    """plan_greedy, in the routing pool when the plan is big enough to be worth it."""
+    plan = None
+    if routing_pool.should_offload(len(states) * len(rides), score):
+        with span("plan_offloaded"):
+            plan = routing_pool.plan(states, rides, score)
+    if plan is None:
+        plan = plan_greedy(get_graph(), states, rides, score)
+    for evaluated in plan.evaluated:
+        telemetry.observe(telemetry.ASSIGNMENT_CANDIDATES, evaluated)
+    return plan.choices
+
+
+def refresh_dispatch_rankings(buggies: Sequence[Buggy]) -> None:
+    """
+    Rewrite the dispatch table rows of ``buggies`` from their current routes.
+    Their route_version and position must be current (reload them after
+    complete_stop, which bumps the version in SQL).
+    """
+    g = get_graph()
+    travel_s = travel_memo(g)
+    routes = build_current_routes(buggies)
+    with span("refresh_rankings"):
+        for buggy in buggies:
+            if buggy.status != Buggy.Status.ACTIVE:
+                continue
+            try:
+                committed = _committed_route_s(g, route_state(buggy, routes[buggy.id]), travel_s)
+            except (KeyError, ValueError):
+                continue  # a stop off the graph: its rows go stale and assignment plans instead
+            dispatch_table.store(g, buggy, committed)
+
+
+def bump_route_versions(buggy_ids: Sequence[int]) -> None:
+    # The buggy hasn't moved, so route_changed_at (the clock its stop ETAs run from) stays as it is.
+    Buggy.objects.filter(pk__in=buggy_ids).update(route_version=F("route_version") + 1)
+
+
+def lock_if_unchanged(buggies: Sequence[Buggy]) -> bool:
+    """
+    Lock the given buggies' rows and check that each is still ACTIVE at the
+    route_version it was scored with. Call inside a transaction; rows are
+    locked in id order so concurrent callers can't deadlock.
+    """
+    seen = {b.id: b.route_version for b in buggies}
+    current = dict(
+        Buggy.objects
+        .select_for_update()
+        .filter(pk__in=sorted(seen), status=Buggy.Status.ACTIVE)
+        .order_by("pk")
+        .values_list("id", "route_version")
+    )
+    return current == seen
+
+
+def _conflict_retries() -> int:
+    return getattr(settings, "ASSIGNMENT_CONFLICT_RETRIES", DEFAULT_CONFLICT_RETRIES)
+
+
 def append_stops_for_buggy(buggy: Buggy, new_ride: RideRequest) -> None:
+    """Append the ride's pickup and dropoff to the buggy's route. The caller must hold the buggy's row lock."""
     last_stop = (
         BuggyRouteStop.objects.filter(buggy=buggy)
         .order_by("-sequence_index")
@@ -107,29 +325,161 @@ def append_stops_for_buggy(buggy: Buggy, new_ride: RideRequest) -> None:
         sequence_index=start_index + 1,
         status=BuggyRouteStop.StopStatus.PLANNED,
     )
+    bump_route_versions([buggy.id])
+    buggy.route_version += 1
+    refresh_dispatch_rankings([buggy])
+
+
+def pickup_time_score(sim: SimResult) -> int:
+    return sim.pickup_time_s
+
+
+def total_time_score(sim: SimResult) -> int:
+    return sim.total_time_s
+
 
+# Scores plan_greedy can prune for: each maps a lower bound on the pickup
+# time and the ride's own travel time to a lower bound on the score.
+SCORE_BOUNDS: Dict[Callable[[SimResult], int], Callable[[int, int], int]] = {
+    pickup_time_score: lambda pickup_s, ride_s: pickup_s,
+    total_time_score: lambda pickup_s, ride_s: pickup_s + PICKUP_SERVICE_S + ride_s + DROPOFF_SERVICE_S,
+}
 
-def assign_ride_to_best_buggy(new_ride: RideRequest) -> Buggy:
-    active_buggies = Buggy.objects.filter(status=Buggy.Status.ACTIVE)
 
-    if not active_buggies.exists():
-        raise NoActiveBuggiesError("No active buggies available")
+def assign_ride_to_best_buggy(
+    new_ride: RideRequest, score: Callable[[SimResult], int] = pickup_time_score
+) -> Buggy:
+    """
+    Append the ride to the buggy with the lowest ``score`` for it (by
+    default the earliest pickup) and mark it ASSIGNED.
 
-    best_buggy = None
-    best_sim = None
+    With the default score the buggy is read from the dispatch table when
+    it covers the whole fleet at the pickup (see dispatch_table); otherwise
+    candidates are planned. Either way no locks are taken until the write,
+    and then only the chosen buggy's row is locked. If its route changed in
+    the meantime (another dispatcher assigned to it, or it moved) the ride
+    is planned again, up to ASSIGNMENT_CONFLICT_RETRIES times, then
+    AssignmentConflictError is raised.
+    """
+    with telemetry.timed(telemetry.ASSIGNMENT_DURATION, "single"):
+        return _assign_ride_to_best_buggy(new_ride, score)
 
-    for buggy in active_buggies:
-        current_route = build_current_route_for_buggy(buggy)
-        sim = simulate_append_for_buggy(buggy=buggy, current_route=current_route, new_ride=new_ride)
 
-        if best_sim is None or sim.pickup_time_s < best_sim.pickup_time_s:
-            best_sim = sim
-            best_buggy = buggy
+def _assign_ride_to_best_buggy(new_ride: RideRequest, score: Callable[[SimResult], int]) -> Buggy:
+    for _ in range(_conflict_retries() + 1):
+        with span("load_fleet"):
+            active_buggies = list(Buggy.objects.filter(status=Buggy.Status.ACTIVE).select_related("current_poi"))
+
+        if not active_buggies:
+            raise NoActiveBuggiesError("No active buggies available")
+
+        best_buggy = None
+        if score is pickup_time_score:
+            with span("ranking_lookup"):
+                best_buggy = dispatch_table.best_buggy(new_ride.pickup_poi_id, active_buggies)
+        if best_buggy is not None:
+            telemetry.observe(telemetry.ASSIGNMENT_CANDIDATES, 0)
+        else:
+            with span("load_routes"):
+                routes = build_current_routes(active_buggies)
+            with span("score"):
+                states = [route_state(b, routes[b.id]) for b in active_buggies]
+                [best] = _plan(states, [ride_spec(new_ride)], score)
+                best_buggy = active_buggies[best]
+
+        with span("write"), transaction.atomic():
+            if lock_if_unchanged([best_buggy]):
+                append_stops_for_buggy(best_buggy, new_ride)
+                new_ride.assigned_buggy = best_buggy
+                new_ride.status = RideRequest.Status.ASSIGNED
+                new_ride.assigned_at = timezone.now()
+                new_ride.save(update_fields=["assigned_buggy", "status", "assigned_at"])
+                metrics.record_assignments([new_ride])
+                return best_buggy
+        telemetry.inc(telemetry.ASSIGNMENT_CONFLICTS, "single")
+
+    raise AssignmentConflictError(f"Buggy routes kept changing while assigning ride {new_ride.public_code}")
+
+
+def assign_rides_to_best_buggies(new_rides: Sequence[RideRequest]) -> List[Buggy]:
+    """
+    Assign several rides in one planning pass.
+
+    Rides are placed in order with the same greedy rule as
+    assign_ride_to_best_buggy, so the outcome matches assigning them one call
+    at a time, but the fleet and its routes are loaded once and all stops
+    and ride updates are written in bulk. Callers should wrap this in a
+    transaction.
+
+    As with single assignment, only the chosen buggies are locked, and the
+    whole batch is planned again if any of them changed since scoring.
+    """
+    with telemetry.timed(telemetry.ASSIGNMENT_DURATION, "bulk"):
+        return _assign_rides_to_best_buggies(new_rides)
+
+
+def _assign_rides_to_best_buggies(new_rides: Sequence[RideRequest]) -> List[Buggy]:
+    for _ in range(_conflict_retries() + 1):
+        active_buggies = list(Buggy.objects.filter(status=Buggy.Status.ACTIVE).select_related("current_poi"))
+        if not active_buggies:
+            raise NoActiveBuggiesError("No active buggies available")
+
+        routes = build_current_routes(active_buggies)
+        states = [route_state(b, routes[b.id]) for b in active_buggies]
+        choices = _plan(states, [ride_spec(r) for r in new_rides], pickup_time_score)
+        assigned = [active_buggies[i] for i in choices]
+
+        with transaction.atomic():
+            chosen = list({b.id: b for b in assigned}.values())
+            if lock_if_unchanged(chosen):
+                _write_assignments(new_rides, assigned)
+                return assigned
+        telemetry.inc(telemetry.ASSIGNMENT_CONFLICTS, "bulk")
+
+    raise AssignmentConflictError(f"Buggy routes kept changing while assigning {len(new_rides)} rides")
+
+
+def _write_assignments(new_rides: Sequence[RideRequest], assigned: Sequence[Buggy]) -> None:
+    """Write the planned stops and ride updates; the buggies' row locks must be held."""
+    buggies = {b.id: b for b in assigned}
+    next_index = defaultdict(int)
+    last_indexes = (
+        BuggyRouteStop.objects
+        .filter(buggy__in=list(buggies))
+        .values("buggy_id")
+        .annotate(last=Max("sequence_index"))
+    )
+    for row in last_indexes:
+        next_index[row["buggy_id"]] = row["last"] + 1
+
+    new_stops: List[BuggyRouteStop] = []
+    now = timezone.now()
+    for ride, buggy in zip(new_rides, assigned):
+        start_index = next_index[buggy.id]
+        next_index[buggy.id] = start_index + 2
+        for offset, (stop_type, poi) in enumerate([
+            (BuggyRouteStop.StopType.PICKUP, ride.pickup_poi),
+            (BuggyRouteStop.StopType.DROPOFF, ride.dropoff_poi),
+        ]):
+            new_stops.append(
+                BuggyRouteStop(
+                    buggy=buggy,
+                    ride_request=ride,
+                    stop_type=stop_type,
+                    poi=poi,
+                    sequence_index=start_index + offset,
+                    status=BuggyRouteStop.StopStatus.PLANNED,
+                )
+            )
 
-    append_stops_for_buggy(best_buggy, new_ride)
-    new_ride.assigned_buggy = best_buggy
-    new_ride.status = RideRequest.Status.ASSIGNED
-    new_ride.assigned_at = timezone.now()
-    new_ride.save(update_fields=["assigned_buggy", "status", "assigned_at"])
-    return best_buggy
+        ride.assigned_buggy = buggy
+        ride.status = RideRequest.Status.ASSIGNED
+        ride.assigned_at = now
 
+    BuggyRouteStop.objects.bulk_create(new_stops)
+    RideRequest.objects.bulk_update(new_rides, ["assigned_buggy", "status", "assigned_at"])
+    bump_route_versions(list(buggies))
+    for buggy in buggies.values():
+        buggy.route_version += 1
+    refresh_dispatch_rankings(list(buggies.values()))
+    metrics.record_assignments(new_rides)
@@ -0,0 +1,164 @@
+# core/services/routing_pool.py
+"""
+Routing plans off the request threads.
+
+Scoring candidates is pure Python, so inside gthread workers a large plan
+(a bulk batch over a big fleet) holds the GIL and stalls every other request
+on that worker. Plans of at least ROUTING_POOL_MIN_WORK candidate
+simulations run in a small per-process pool of planning processes instead;
+smaller ones stay inline, where the round trip would cost more than it saves.
+
+Work is sent as RouteState and RideSpec tuples (see routing), never ORM
+objects, and the score must be a module-level function so it pickles. Each
+planning process keeps its own copy of the routing graph: tasks name the
+graph by its token, a process that doesn't hold that graph yet answers
+StaleGraph, and the task is sent again with the adjacency attached.
+
+A plan that doesn't come back within ROUTING_POOL_TIMEOUT_S, or a pool
+whose process died, is given up on: the pool is replaced and the caller
+plans inline. Plans other callers already queued on the old pool are left
+to finish there.
+"""
+from __future__ import annotations
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MIN_WORK = 2000
+DEFAULT_TIMEOUT_S = 30.0
+
+
+class StaleGraph(Exception):
+    """Raised in a planning process that doesn't hold the graph a task was planned against."""
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# in planning processes: the graph last shipped to this process
+_worker_graph = None
+
+
+# Planning processes unpickle this module before django.setup() has run, so
+# anything that imports models is imported inside the functions below.
+
+def _init_worker(settings_module: str) -> None:
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _plan(token: str, adjacency: Optional[Dict[int, List[Tuple[int, int]]]], states, rides, score):
+    global _worker_graph
+    from core.services.graph import PoiGraph
+    from core.services.routing import plan_greedy
+
+    if adjacency is not None:
+        _worker_graph = PoiGraph(adjacency, token=token)
+    elif _worker_graph is None or _worker_graph.token != token:
+        raise StaleGraph(token)
+
+    return plan_greedy(_worker_graph, states, rides, score)
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    size = getattr(settings, "ROUTING_POOL_SIZE", DEFAULT_POOL_SIZE)
+    if size <= 0:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn, not fork: forking a threaded gunicorn worker is unsafe.
+                _executor = ProcessPoolExecutor(
+                    max_workers=size,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "buggy_project.settings"),),
+                )
+    return _executor
+
+
+def _reset_executor(executor: Optional[ProcessPoolExecutor] = None) -> None:
+    """Drop the pool; with ``executor``, only if that is still the current one (not already replaced)."""
+    global _executor
+    with _executor_lock:
+        if executor is not None and _executor is not executor:
+            return
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=False)
+        _executor = None
+
+
+def shutdown() -> None:
+    _reset_executor()
+
+
+def warm() -> None:
+    """Start the planning processes now rather than on the first large plan (no-op when the pool is off)."""
+    executor = _get_executor()
+    if executor is not None:
+        for _ in range(getattr(settings, "ROUTING_POOL_SIZE", DEFAULT_POOL_SIZE)):
+            executor.submit(_ping)
+
+
+def should_offload(work: int, score: Callable) -> bool:
+    """True when a plan of ``work`` candidate simulations scored by ``score`` should go to the pool."""
+    if getattr(settings, "ROUTING_POOL_SIZE", DEFAULT_POOL_SIZE) <= 0:
+        return False
+    if work < getattr(settings, "ROUTING_POOL_MIN_WORK", DEFAULT_MIN_WORK):
+        return False
+    qualname = getattr(score, "__qualname__", "<unknown>")
+    return "<" not in qualname and "." not in qualname  # lambdas, closures and methods don't pickle
+
+
+def plan(states: Sequence, rides: Sequence, score: Callable):
+    """
+    routing.plan_greedy in a planning process, against the current graph.
+    Returns its Plan, or None when the pool is unavailable; the caller then plans inline.
+    """
+    from core.services.graph import get_graph
+
+    executor = _get_executor()
+    if executor is None:
+        return None
+    g = get_graph()
+    timeout = getattr(settings, "ROUTING_POOL_TIMEOUT_S", DEFAULT_TIMEOUT_S)
+    states, rides = list(states), list(rides)
+
+    def run(adjacency):
+        future = executor.submit(_plan, g.token, adjacency, states, rides, score)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    try:
+        try:
+            return run(None)
+        except StaleGraph:
+            return run(g.adjacency)
+    except BrokenProcessPool:
+        # A planning process died; start a fresh pool next time.
+        _reset_executor(executor)
+        return None
+    except FutureTimeoutError:
+        # The pool is saturated or stuck on this plan; leave the busy process
+        # behind so later plans don't queue after it.
+        _reset_executor(executor)
+        return None
+    except (CancelledError, RuntimeError):
+        # Another call recycled this pool under us (a shut-down pool refuses
+        # new work); the next plan gets a fresh one.
+        return None
@@ -0,0 +1,66 @@
+# core/services/scratch.py
+"""
+Throwaway databases for tools that write throwaway data.
+
+The load test, the dispatch simulator, the replay and the benchmarks create
+buggies, rides and users of their own. They must never do that in the
+database the resort runs on: the simulator, the replay and the benchmarks
+run inside ``scratch_database()``, and the load test, which has to share
+its database with the server it drives, only runs on a throwaway database
+unless the operator explicitly allows it.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.base.creation import TEST_DATABASE_PREFIX
+from django.db.models import Model
+from django.db.utils import load_backend
+
+from core.services import eta, graph, quotes, user_cache
+
+SCRATCH_ENGINE = "django.db.backends.sqlite3"
+
+
+def is_throwaway_database(alias: str = DEFAULT_DB_ALIAS) -> bool:
+    """True for an in-memory SQLite database or one created by the test runner."""
+    conn = connections[alias]
+    if conn.vendor == "sqlite" and conn.is_in_memory_db():
+        return True
+    return str(conn.settings_dict["NAME"]).startswith(TEST_DATABASE_PREFIX)
+
+
+def _clear_caches() -> None:
+    # process caches keyed by ids that mean different rows in the two databases
+    graph.invalidate()
+    eta.clear()
+    quotes.clear()
+    user_cache.clear()
+
+
+@contextmanager
+def scratch_database(*models: type[Model]) -> Iterator[None]:
+    """
+    Point this thread's default connection at a new in-memory SQLite database
+    with the schema migrated and every row of ``models`` copied from the live
+    one (in the order given, so parents first), and restore the live
+    connection on exit. Nothing done inside reaches the live database, which
+    is neither locked nor kept in a transaction meanwhile.
+    """
+    copies = [(model, list(model.objects.order_by("pk"))) for model in models]
+    live = connections[DEFAULT_DB_ALIAS]
+    settings_dict = connections.configure_settings(
+        {DEFAULT_DB_ALIAS: {"ENGINE": SCRATCH_ENGINE, "NAME": ":memory:"}}
+    )[DEFAULT_DB_ALIAS]
+    connections[DEFAULT_DB_ALIAS] = load_backend(SCRATCH_ENGINE).DatabaseWrapper(settings_dict, DEFAULT_DB_ALIAS)
+    _clear_caches()
+    try:
+        call_command("migrate", database=DEFAULT_DB_ALIAS, interactive=False, verbosity=0)
+        for model, rows in copies:
+            model.objects.bulk_create(rows)
+        yield
+    finally:
+        connections[DEFAULT_DB_ALIAS] = live  # the in-memory database goes with its connection
+        _clear_caches()
@@ -0,0 +1,320 @@
+# core/services/simulation.py
+"""
+Discrete-event dispatch simulator.
+
+Rides arrive on a simulated clock and go through a real assignment policy
+(core.services.policies) against the routing graph and the database; buggies
+then drive their routes, each stop taking the graph's travel time plus
+PICKUP_SERVICE_S / DROPOFF_SERVICE_S, and stops are started and completed
+with the same driver_actions the driver app uses. Everything is written to
+a scratch database (core.services.scratch) holding a copy of the POIs and
+edges, so the real fleet is never touched and nothing persists (metrics
+recording is paused).
+
+There is no waiting in real time, so a full resort day takes seconds; the
+cost is dominated by the assignment code under test, whose wall time per
+call is reported alongside guest wait and ride times and fleet utilization.
+"""
+from __future__ import annotations
+import heapq
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Mapping, Optional, Sequence
+
+from django.utils import timezone
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, PoiEdgeVersion, RideRequest
+from core.serializers import PLACEHOLDER_DROPOFF_CODE, PLACEHOLDER_PICKUP_CODE
+from core.services import metrics, policies
+from core.services.driver_actions import complete_stop, start_stop
+from core.services.graph import get_graph
+from core.services.loadtest import percentile
+from core.services.routing import DROPOFF_SERVICE_S, PICKUP_SERVICE_S
+from core.services.scratch import scratch_database
+
+DEFAULT_HOURS = range(7, 23)
+GUEST_COUNT_WEIGHTS = {1: 0.35, 2: 0.4, 3: 0.15, 4: 0.1}
+
+_ARRIVAL = 0
+_STOP_DONE = 1
+
+
+class SimulationError(ValueError):
+    pass
+
+
+@dataclass
+class Arrival:
+    t_s: float  # seconds after the simulation's start
+    pickup_poi_id: int
+    dropoff_poi_id: int
+    num_guests: int
+    ref: str = ""  # source ride code when replaying history
+
+
+@dataclass
+class RideOutcome:
+    arrival: Arrival
+    buggy_code: str = ""
+    compute_s: float = 0.0
+    pickup_done_s: Optional[float] = None
+    dropoff_done_s: Optional[float] = None
+
+    @property
+    def wait_s(self) -> Optional[float]:
+        return None if self.pickup_done_s is None else self.pickup_done_s - self.arrival.t_s
+
+    @property
+    def ride_s(self) -> Optional[float]:
+        if self.pickup_done_s is None or self.dropoff_done_s is None:
+            return None
+        return self.dropoff_done_s - self.pickup_done_s
+
+
+@dataclass
+class SimulationResult:
+    policy: str
+    start: datetime
+    outcomes: List[RideOutcome]
+    busy_s: Dict[str, float]
+    end_s: float
+    wall_s: float = 0.0
+    first_arrival_s: float = 0.0
+
+
+def distribution(values: Sequence[float], scale: float = 1.0) -> dict:
+    ordered = sorted(v * scale for v in values)
+    if not ordered:
+        return {"count": 0, "mean": None, "p50": None, "p90": None, "p99": None, "max": None}
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        **{name: round(percentile(ordered, q), 2) for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))},
+        "max": round(ordered[-1], 2),
+    }
+
+
+def summarize(result: SimulationResult) -> dict:
+    outcomes = result.outcomes
+    span_s = max(result.end_s - result.first_arrival_s, 1.0)
+    utilization = {code: round(busy / span_s, 4) for code, busy in sorted(result.busy_s.items())}
+    return {
+        "policy": result.policy,
+        "start": result.start.isoformat(),
+        "rides": len(outcomes),
+        "completed": sum(1 for o in outcomes if o.dropoff_done_s is not None),
+        "simulated_hours": round(span_s / 3600, 2),
+        "wall_time_s": round(result.wall_s, 3),
+        "wait_s": distribution([o.wait_s for o in outcomes if o.wait_s is not None]),
+        "ride_time_s": distribution([o.ride_s for o in outcomes if o.ride_s is not None]),
+        "assignment_compute_ms": distribution([o.compute_s for o in outcomes], scale=1000),
+        "utilization": {
+            "fleet": round(sum(utilization.values()) / len(utilization), 4) if utilization else 0.0,
+            "per_buggy": utilization,
+        },
+    }
+
+
+# ----- demand -----
+
+def routable_pois() -> Dict[str, int]:
+    """Code -> id of POIs the graph can route between (placeholders excluded)."""
+    graph_ids = set(get_graph().adjacency)
+    return {
+        code: pk
+        for code, pk in POI.objects.filter(pk__in=graph_ids)
+        .exclude(code__in=[PLACEHOLDER_PICKUP_CODE, PLACEHOLDER_DROPOFF_CODE])
+        .values_list("code", "id")
+    }
+
+
+def uniform_profile(poi_codes: Sequence[str], rides_per_hour: float, hours=DEFAULT_HOURS) -> Dict[str, List[float]]:
+    """Spread ``rides_per_hour`` evenly over the POIs during ``hours``."""
+    per_poi = rides_per_hour / len(poi_codes) if poi_codes else 0.0
+    hours = set(hours)
+    return {code: [per_poi if h in hours else 0.0 for h in range(24)] for code in poi_codes}
+
+
+def generate_arrivals(profile: Mapping[str, Sequence[float]], pois: Mapping[str, int], rng: random.Random) -> List[Arrival]:
+    """
+    Poisson arrivals from ``profile`` (POI code -> 24 hourly ride rates for
+    pickups there). Dropoffs are uniform over the other POIs.
+    """
+    unknown = set(profile) - set(pois)
+    if unknown:
+        raise SimulationError(f"Profile names POIs the graph can't route to: {', '.join(sorted(unknown))}")
+    if len(pois) < 2:
+        raise SimulationError("Need at least two connected POIs to simulate")
+
+    codes = sorted(pois)
+    guests, weights = zip(*GUEST_COUNT_WEIGHTS.items())
+    arrivals = []
+    for code in sorted(profile):
+        for hour, rate in enumerate(profile[code]):
+            if rate <= 0:
+                continue
+            t = hour * 3600.0
+            while True:
+                t += rng.expovariate(rate / 3600.0)
+                if t >= (hour + 1) * 3600:
+                    break
+                dropoff = rng.choice([c for c in codes if c != code])
+                arrivals.append(Arrival(
+                    t_s=t,
+                    pickup_poi_id=pois[code],
+                    dropoff_poi_id=pois[dropoff],
+                    num_guests=rng.choices(guests, weights)[0],
+                ))
+    arrivals.sort(key=lambda a: a.t_s)
+    return arrivals
+
+
+# ----- engine -----
+
+class Simulator:
+    """
+    Run ``arrivals`` through ``policy`` with ``fleet_size`` fresh buggies.
+
+    Must run against a scratch database holding only the POIs and edges
+    (``run_simulation`` does this).
+    """
+
+    def __init__(self, arrivals: Sequence[Arrival], policy: str, start: datetime,
+                 fleet_size: int, start_poi_ids: Sequence[int]):
+        if fleet_size < 1:
+            raise SimulationError("Need at least one buggy")
+        self.arrivals = arrivals
+        self.policy_name = policy
+        self.policy = policies.get_policy(policy)
+        self.start = start
+        self.fleet_size = fleet_size
+        self.start_poi_ids = list(start_poi_ids)
+
+        self.graph = get_graph()
+        self.events: list = []
+        self.seq = itertools.count()
+        self.buggies: Dict[int, Buggy] = {}
+        self.busy: Dict[int, bool] = {}
+        self.busy_s: Dict[int, float] = {}
+        self.outcomes: Dict[int, RideOutcome] = {}  # by ride id
+        self.now_s = 0.0
+
+    def _push(self, t_s: float, kind: int, payload) -> None:
+        heapq.heappush(self.events, (t_s, next(self.seq), kind, payload))
+
+    def _buggy_code(self, i: int) -> str:
+        return f"SIM_{i:03d}"
+
+    def _setup_fleet(self) -> None:
+        created = Buggy.objects.bulk_create([
+            Buggy(
+                code=self._buggy_code(i),
+                display_name=f"Sim Buggy #{i}",
+                status=Buggy.Status.ACTIVE,
+                current_poi_id=self.start_poi_ids[i % len(self.start_poi_ids)],
+            )
+            for i in range(self.fleet_size)
+        ])
+        for buggy in Buggy.objects.filter(pk__in=[b.pk for b in created]).select_related("current_poi"):
+            self.buggies[buggy.id] = buggy
+            self.busy[buggy.id] = False
+            self.busy_s[buggy.id] = 0.0
+
+    def run(self) -> SimulationResult:
+        wall_start = time.perf_counter()
+        self._setup_fleet()
+        for arrival in self.arrivals:
+            self._push(arrival.t_s, _ARRIVAL, arrival)
+
+        while self.events:
+            self.now_s, _, kind, payload = heapq.heappop(self.events)
+            if kind == _ARRIVAL:
+                self._on_arrival(payload)
+            else:
+                self._on_stop_done(*payload)
+
+        return SimulationResult(
+            policy=self.policy_name,
+            start=self.start,
+            outcomes=list(self.outcomes.values()),
+            busy_s={self.buggies[pk].code: s for pk, s in self.busy_s.items()},
+            end_s=self.now_s,
+            wall_s=time.perf_counter() - wall_start,
+            first_arrival_s=self.arrivals[0].t_s if self.arrivals else 0.0,
+        )
+
+    def _on_arrival(self, arrival: Arrival) -> None:
+        ride = RideRequest.objects.create(
+            pickup_poi_id=arrival.pickup_poi_id,
+            dropoff_poi_id=arrival.dropoff_poi_id,
+            num_guests=arrival.num_guests,
+        )
+        t0 = time.perf_counter()
+        buggy = self.policy(ride)
+        outcome = RideOutcome(arrival=arrival, buggy_code=buggy.code, compute_s=time.perf_counter() - t0)
+        self.outcomes[ride.id] = outcome
+        if not self.busy[buggy.id]:
+            self._dispatch(buggy.id)
+
+    def _dispatch(self, buggy_id: int) -> None:
+        stop = (
+            BuggyRouteStop.objects
+            .filter(buggy_id=buggy_id)
+            .exclude(status=BuggyRouteStop.StopStatus.COMPLETED)
+            .select_related("ride_request", "poi")
+            .order_by("sequence_index")
+            .first()
+        )
+        if stop is None:
+            self.busy[buggy_id] = False
+            return
+
+        buggy = self.buggies[buggy_id]
+        start_stop(stop)
+        travel_s = self.graph.shortest_path(buggy.current_poi_id, stop.poi_id).travel_time_s
+        service_s = PICKUP_SERVICE_S if stop.stop_type == BuggyRouteStop.StopType.PICKUP else DROPOFF_SERVICE_S
+        self.busy[buggy_id] = True
+        self.busy_s[buggy_id] += travel_s + service_s
+        self._push(self.now_s + travel_s + service_s, _STOP_DONE, (buggy_id, stop))
+
+    def _on_stop_done(self, buggy_id: int, stop: BuggyRouteStop) -> None:
+        complete_stop(self.buggies[buggy_id], stop, completed_at=self.start + timedelta(seconds=self.now_s))
+        outcome = self.outcomes[stop.ride_request_id]
+        if stop.stop_type == BuggyRouteStop.StopType.PICKUP:
+            outcome.pickup_done_s = self.now_s
+        else:
+            outcome.dropoff_done_s = self.now_s
+        self._dispatch(buggy_id)
+
+
+def run_simulation(arrivals: Sequence[Arrival], *, policy: str = policies.DEFAULT_POLICY,
+                   start: Optional[datetime] = None, fleet_size: Optional[int] = None,
+                   start_poi_ids: Optional[Sequence[int]] = None,
+                   simulator: Callable[..., Simulator] = Simulator) -> SimulationResult:
+    """
+    Simulate ``arrivals`` in a scratch database. The fleet defaults to as
+    many buggies as are active now, spread over ``start_poi_ids`` (by default
+    the routable POIs). ``simulator`` builds the engine, for subclasses such
+    as the replay's.
+    """
+    start = start or timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    if fleet_size is None:
+        fleet_size = max(Buggy.objects.filter(status=Buggy.Status.ACTIVE).count(), 1)
+    if not start_poi_ids:
+        start_poi_ids = sorted(routable_pois().values())
+    if not start_poi_ids:
+        raise SimulationError("Need at least one connected POI to simulate")
+    with scratch_database(POI, PoiEdge, PoiEdgeVersion), metrics.paused():
+        return simulator(arrivals, policy, start=start, fleet_size=fleet_size, start_poi_ids=start_poi_ids).run()
+
+
+def simulate_day(profile: Optional[Mapping[str, Sequence[float]]] = None, *, rides_per_hour: float = 40.0,
+                 hours=DEFAULT_HOURS, seed: int = 0, **kwargs) -> SimulationResult:
+    """Generate a day of demand (``profile``, or ``rides_per_hour`` spread over every POI) and simulate it."""
+    pois = routable_pois()
+    profile = profile if profile is not None else uniform_profile(sorted(pois), rides_per_hour, hours)
+    arrivals = generate_arrivals(profile, pois, random.Random(seed))
+    return run_simulation(arrivals, **kwargs)
@@ -0,0 +1,150 @@
+# core/services/sketches.py
+"""
+DDSketch-style mergeable quantile sketch.
+
+Values are mapped to logarithmic bins whose width guarantees a relative
+error of at most ``relative_accuracy`` on every quantile, so two sketches
+can be merged by adding bin counts. Serialized sketches are a few hundred
+bytes for a day's worth of wait times.
+"""
+from __future__ import annotations
+import math
+import struct
+from typing import Dict, Iterable, Optional
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+MIN_INDEXABLE_VALUE = 1e-3  # values below this (in seconds) count as zero
+
+_HEADER = struct.Struct("<BdQQddd")  # version, accuracy, count, zero_count, min, max, sum
+_VERSION = 1
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data: bytes, pos: int):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value: int) -> int:
+    return (value >> 1) ^ -(value & 1)
+
+
+class DDSketch:
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value < 0:
+            raise ValueError("DDSketch only accepts non-negative values")
+        if value < MIN_INDEXABLE_VALUE:
+            self.zero_count += count
+        else:
+            key = self._key(value)
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def extend(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.count == 0:
+            return
+        if not math.isclose(other.gamma, self.gamma):
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                return min(max(self._value(key), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def to_bytes(self) -> bytes:
+        out = bytearray(_HEADER.pack(
+            _VERSION, self.relative_accuracy, self.count, self.zero_count,
+            self.min if self.count else 0.0, self.max if self.count else 0.0, self.sum,
+        ))
+        _write_varint(out, len(self.bins))
+        previous = 0
+        for key in sorted(self.bins):
+            _write_varint(out, _zigzag(key - previous))
+            _write_varint(out, self.bins[key])
+            previous = key
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DDSketch":
+        version, accuracy, count, zero_count, lo, hi, total = _HEADER.unpack_from(data)
+        if version != _VERSION:
+            raise ValueError(f"Unsupported sketch version {version}")
+        sketch = cls(accuracy)
+        sketch.count, sketch.zero_count, sketch.sum = count, zero_count, total
+        if count:
+            sketch.min, sketch.max = lo, hi
+        pos = _HEADER.size
+        n_bins, pos = _read_varint(data, pos)
+        key = 0
+        for _ in range(n_bins):
+            delta, pos = _read_varint(data, pos)
+            key += _unzigzag(delta)
+            sketch.bins[key], pos = _read_varint(data, pos)
+        return sketch
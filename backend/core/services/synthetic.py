@@ -0,0 +1,261 @@
+# core/services/synthetic.py
+"""
+Synthetic large-resort datasets for benchmarks and scaling tests.
+
+``generate_resort`` builds a resort from a ResortSpec and a seed: POIs
+jittered over a grid with road-like sparse edges (grid neighbours plus some
+diagonals, travel time from distance), a fleet of buggies with drivers, days
+of completed ride and stop history, and a few open rides on each active
+buggy's route. Every row is written with ``bulk_create`` in chunks, so the
+number of queries grows with the dataset size divided by ``chunk_size``,
+not with the number of rows.
+
+All generated rows are tagged with ``spec.prefix`` (POI and buggy codes,
+driver usernames, ride codes), so ``clear_resort`` can remove them again.
+The same spec and seed always produce the same data.
+"""
+from __future__ import annotations
+import math
+import random
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, RideRequest, User
+from core.services import graph
+from core.services.metrics import day_bucket
+from core.services.routing import DROPOFF_SERVICE_S, PICKUP_SERVICE_S
+
+DEFAULT_CHUNK_SIZE = 2000
+CELL_M = 150.0       # grid spacing between neighbouring POIs
+SPEED_M_S = 4.0      # buggy speed along paths
+DETOUR = 1.3         # path length over straight-line distance
+MIN_EDGE_S = 15
+DIAGONAL_P = 0.25    # chance of a diagonal shortcut in each grid cell
+SKIP_P = 0.15        # chance of a missing grid edge (kept if needed for connectivity)
+
+
+class SyntheticDataError(ValueError):
+    pass
+
+
+@dataclass
+class ResortSpec:
+    pois: int = 2000
+    buggies: int = 200
+    drivers: int = 200
+    active_ratio: float = 0.8
+    days: int = 90
+    rides_per_day: int = 800
+    open_rides_per_buggy: int = 1
+    seed: int = 0
+    prefix: str = "SYN"
+    driver_password: str = "synthetic"
+
+
+@dataclass
+class GeneratedResort:
+    pois: int = 0
+    edges: int = 0
+    drivers: int = 0
+    buggies: int = 0
+    rides: int = 0
+    stops: int = 0
+    first_day: Optional[datetime] = None
+
+
+@contextmanager
+def _explicit_timestamps(*fields) -> Iterator[None]:
+    """Let bulk_create keep the given auto_now_add fields' values (history needs past dates)."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _layout(spec: ResortSpec, rng: random.Random) -> Tuple[List[Tuple[float, float]], List[Tuple[int, int]]]:
+    """Point positions (metres) and index pairs to connect."""
+    cols = max(1, math.ceil(math.sqrt(spec.pois)))
+    positions = [
+        ((i % cols + rng.uniform(-0.3, 0.3)) * CELL_M, (i // cols + rng.uniform(-0.3, 0.3)) * CELL_M)
+        for i in range(spec.pois)
+    ]
+    pairs = []
+    for i in range(spec.pois):
+        row, col = divmod(i, cols)
+        right, down = i + 1, i + cols
+        if col + 1 < cols and right < spec.pois and (row == 0 or rng.random() >= SKIP_P):
+            pairs.append((i, right))  # the first row always connects, so every column hangs off it
+        if down < spec.pois:
+            pairs.append((i, down))
+        if col + 1 < cols and down + 1 < spec.pois and rng.random() < DIAGONAL_P:
+            pairs.append((i, down + 1))
+    return positions, pairs
+
+
+def _travel_s(a: Tuple[float, float], b: Tuple[float, float]) -> int:
+    return max(MIN_EDGE_S, round(math.dist(a, b) * DETOUR / SPEED_M_S))
+
+
+def _day_of_rides(spec: ResortSpec, rng: random.Random, day: datetime,
+                  n_pois: int) -> Iterator[Tuple[datetime, int, int, int]]:
+    """(requested_at, pickup index, dropoff index, guests) for one day, in time order."""
+    times = sorted(rng.uniform(7 * 3600, 23 * 3600) for _ in range(spec.rides_per_day))
+    for t in times:
+        pickup = rng.randrange(n_pois)
+        dropoff = (pickup + rng.randrange(1, n_pois)) % n_pois
+        yield day + timedelta(seconds=t), pickup, dropoff, rng.choice((1, 1, 2, 2, 2, 3, 4))
+
+
+def clear_resort(prefix: str) -> None:
+    """Delete everything generate_resort created under ``prefix``, with any ride to or from its POIs."""
+    with transaction.atomic():
+        pois = POI.objects.filter(code__startswith=f"{prefix}_")
+        RideRequest.objects.filter(Q(pickup_poi__in=pois) | Q(dropoff_poi__in=pois)).delete()
+        Buggy.objects.filter(code__startswith=f"{prefix}_").delete()
+        User.objects.filter(username__startswith=f"{prefix.lower()}_driver_").delete()
+        PoiEdge.objects.filter(from_poi__code__startswith=f"{prefix}_").delete()
+        pois.delete()
+    graph.invalidate()
+
+
+def generate_resort(spec: ResortSpec, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    now: Optional[datetime] = None) -> GeneratedResort:
+    """
+    Build the resort described by ``spec``; history covers the ``spec.days``
+    days before ``now``'s date. Refuses to run if ``spec.prefix`` is in use.
+    """
+    if spec.pois < 2:
+        raise SyntheticDataError("Need at least two POIs")
+    if not spec.prefix or len(spec.prefix) > 3 or not spec.prefix.isalnum():
+        raise SyntheticDataError("Prefix must be 1-3 letters or digits (it leads every ride code)")
+    if POI.objects.filter(code__startswith=f"{spec.prefix}_").exists():
+        raise SyntheticDataError(f"POIs with prefix {spec.prefix}_ already exist; clear them first")
+
+    rng = random.Random(spec.seed)
+    now = now or timezone.now()
+    today = day_bucket(now)
+    out = GeneratedResort()
+    positions, pairs = _layout(spec, rng)
+
+    with transaction.atomic():
+        pois = POI.objects.bulk_create(
+            [POI(code=f"{spec.prefix}_{i:05d}", name=f"{spec.prefix} Point {i}") for i in range(spec.pois)],
+            batch_size=chunk_size,
+        )
+        edges = PoiEdge.objects.bulk_create(
+            [
+                PoiEdge(from_poi=pois[a], to_poi=pois[b], travel_time_s=_travel_s(positions[a], positions[b]))
+                for a, b in pairs
+            ],
+            batch_size=chunk_size,
+        )
+        # bulk writes skip the post_save signal
+        graph.invalidate()
+        graph.sync_edge_versions(edges, at=today - timedelta(days=spec.days), created=True)
+        out.pois, out.edges = len(pois), len(edges)
+
+        password = make_password(spec.driver_password)  # hashed once, shared by every driver
+        drivers = User.objects.bulk_create(
+            [
+                User(username=f"{spec.prefix.lower()}_driver_{i}", password=password, role=User.Role.DRIVER)
+                for i in range(spec.drivers)
+            ],
+            batch_size=chunk_size,
+        )
+        active = round(spec.buggies * spec.active_ratio)
+        buggies = Buggy.objects.bulk_create(
+            [
+                Buggy(
+                    code=f"{spec.prefix}_BUGGY_{i:04d}",
+                    display_name=f"{spec.prefix} Buggy #{i}",
+                    capacity=rng.choice((4, 4, 6)),
+                    status=Buggy.Status.ACTIVE if i < active else Buggy.Status.INACTIVE,
+                    current_poi=pois[rng.randrange(len(pois))],
+                    driver=drivers[i] if i < len(drivers) else None,
+                )
+                for i in range(spec.buggies)
+            ],
+            batch_size=chunk_size,
+        )
+        out.drivers, out.buggies = len(drivers), len(buggies)
+
+        if buggies:
+            serving = buggies[:active] or buggies
+            next_index: Dict[int, int] = {b.id: 0 for b in buggies}
+            serial = 0
+
+            def ride_code() -> str:
+                nonlocal serial
+                serial += 1
+                return f"{spec.prefix}{serial:08X}"[:12]
+
+            timestamps = (
+                RideRequest._meta.get_field("requested_at"),
+                BuggyRouteStop._meta.get_field("created_at"),
+            )
+            with _explicit_timestamps(*timestamps):
+                for d in range(spec.days, 0, -1):
+                    day = today - timedelta(days=d)
+                    out.first_day = out.first_day or day
+                    rides, legs = [], []
+                    for requested, p, q, guests in _day_of_rides(spec, rng, day, len(pois)):
+                        buggy = rng.choice(serving)
+                        assigned = requested + timedelta(seconds=rng.uniform(0.05, 2))
+                        picked_up = requested + timedelta(seconds=rng.uniform(60, 900))
+                        dropped_off = picked_up + timedelta(
+                            seconds=_travel_s(positions[p], positions[q]) + PICKUP_SERVICE_S + DROPOFF_SERVICE_S
+                        )
+                        rides.append(RideRequest(
+                            public_code=ride_code(), pickup_poi=pois[p], dropoff_poi=pois[q], num_guests=guests,
+                            status=RideRequest.Status.COMPLETED, assigned_buggy=buggy, requested_at=requested,
+                            assigned_at=assigned, pickup_completed_at=picked_up, dropoff_completed_at=dropped_off,
+                        ))
+                        legs.append((buggy, pois[p], pois[q], assigned, picked_up, dropped_off))
+                    out.rides += len(RideRequest.objects.bulk_create(rides, batch_size=chunk_size))
+                    stops = []
+                    for ride, (buggy, pickup, dropoff, assigned, picked_up, dropped_off) in zip(rides, legs):
+                        for stop_type, poi, done in (
+                            (BuggyRouteStop.StopType.PICKUP, pickup, picked_up),
+                            (BuggyRouteStop.StopType.DROPOFF, dropoff, dropped_off),
+                        ):
+                            stops.append(BuggyRouteStop(
+                                buggy=buggy, ride_request=ride, stop_type=stop_type, poi=poi,
+                                status=BuggyRouteStop.StopStatus.COMPLETED, sequence_index=next_index[buggy.id],
+                                created_at=assigned, completed_at=done,
+                            ))
+                            next_index[buggy.id] += 1
+                    out.stops += len(BuggyRouteStop.objects.bulk_create(stops, batch_size=chunk_size))
+
+            # current work: a few assigned rides queued on each active buggy
+            rides, stops = [], []
+            for buggy in buggies[:active]:
+                for _ in range(spec.open_rides_per_buggy):
+                    p = rng.randrange(len(pois))
+                    q = (p + rng.randrange(1, len(pois))) % len(pois)
+                    ride = RideRequest(
+                        public_code=ride_code(), pickup_poi=pois[p], dropoff_poi=pois[q],
+                        num_guests=rng.choice((1, 2, 3)), status=RideRequest.Status.ASSIGNED,
+                        assigned_buggy=buggy, assigned_at=now,
+                    )
+                    rides.append(ride)
+                    for stop_type, poi in ((BuggyRouteStop.StopType.PICKUP, pois[p]),
+                                           (BuggyRouteStop.StopType.DROPOFF, pois[q])):
+                        stops.append(BuggyRouteStop(
+                            buggy=buggy, ride_request=ride, stop_type=stop_type, poi=poi,
+                            sequence_index=next_index[buggy.id],
+                        ))
+                        next_index[buggy.id] += 1
+            out.rides += len(RideRequest.objects.bulk_create(rides, batch_size=chunk_size))
+            out.stops += len(BuggyRouteStop.objects.bulk_create(stops, batch_size=chunk_size))
+
+    return out
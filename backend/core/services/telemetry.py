@@ -0,0 +1,335 @@
+# core/services/telemetry.py
+"""
+Prometheus-format counters and histograms.
+
+Each process records into an in-memory registry. When PROMETHEUS_METRICS_DIR
+is set (the gunicorn deployment), a background thread writes the registry to
+``<dir>/metrics_<pid>.json`` about once a second, and the /metrics view sums
+every process's file, so a scrape that lands on any worker reports the whole
+server. When a worker exits, gunicorn's child_exit hook (gunicorn.conf.py)
+folds its file into ``metrics_dead.json``, so counters never go backwards
+when a worker is recycled and a reused pid never overwrites an old worker's
+values. Without the setting only the current process is reported (tests,
+runserver).
+"""
+from __future__ import annotations
+import fcntl
+import glob
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+CANDIDATE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+DEFAULT_FLUSH_INTERVAL_S = 1.0
+DEAD_FILE = "metrics_dead.json"  # summed values of every exited worker
+
+Labels = Tuple[str, ...]
+
+
+class Metric:
+    def __init__(self, name: str, kind: str, help_text: str, labels: Sequence[str] = (), buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets) if buckets else None
+
+
+class Registry:
+    """Per-process metric values. Histogram state is [bucket counts..., +Inf count, sum]."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.values: Dict[str, Dict[Labels, object]] = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        self.values.setdefault(metric.name, {})
+        return metric
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1.0) -> None:
+        with self.lock:
+            series = self.values[name]
+            series[labels] = series.get(labels, 0.0) + amount
+            self.dirty = True
+        _ensure_flusher()
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        buckets = self.metrics[name].buckets
+        with self.lock:
+            series = self.values[name]
+            state = series.get(labels)
+            if state is None:
+                state = series[labels] = [0.0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(buckets)] += 1
+            state[-1] += value
+            self.dirty = True
+        _ensure_flusher()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            self.dirty = False
+            return {
+                name: [
+                    [list(labels), value[:] if isinstance(value, list) else value]
+                    for labels, value in series.items()
+                ]
+                for name, series in self.values.items()
+            }
+
+    def clear(self) -> None:
+        with self.lock:
+            for series in self.values.values():
+                series.clear()
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Metric(
+    "buggy_http_request_duration_seconds", HISTOGRAM, "Request latency by view.",
+    labels=("view", "method"), buckets=LATENCY_BUCKETS,
+))
+REQUESTS = registry.register(Metric(
+    "buggy_http_requests_total", COUNTER, "Requests by view and status code.",
+    labels=("view", "method", "status"),
+))
+REQUEST_QUERIES = registry.register(Metric(
+    "buggy_db_queries_per_request", HISTOGRAM, "Database queries per request by view.",
+    labels=("view",), buckets=QUERY_COUNT_BUCKETS,
+))
+REQUEST_DB_TIME = registry.register(Metric(
+    "buggy_db_time_per_request_seconds", HISTOGRAM, "Time spent in database calls per request by view.",
+    labels=("view",), buckets=LATENCY_BUCKETS,
+))
+GRAPH_CACHE_HITS = registry.register(Metric(
+    "buggy_graph_cache_hits_total", COUNTER, "Routing graph lookups served from the process cache.",
+))
+GRAPH_CACHE_REBUILDS = registry.register(Metric(
+    "buggy_graph_cache_rebuilds_total", COUNTER, "Routing graph loads from the database.",
+))
+ASSIGNMENT_DURATION = registry.register(Metric(
+    "buggy_assignment_duration_seconds", HISTOGRAM,
+    "Time to choose buggies and write the assignment, per call (single ride or bulk batch).",
+    labels=("mode",), buckets=LATENCY_BUCKETS,
+))
+ASSIGNMENT_CANDIDATES = registry.register(Metric(
+    "buggy_assignment_candidates", HISTOGRAM, "Candidate buggies simulated per assigned ride (after pruning).",
+    buckets=CANDIDATE_BUCKETS,
+))
+ASSIGNMENT_CONFLICTS = registry.register(Metric(
+    "buggy_assignment_conflicts_total", COUNTER,
+    "Assignments planned again because a chosen buggy's route changed before it was locked.",
+    labels=("mode",),
+))
+QUOTES = registry.register(Metric(
+    "buggy_ride_quotes_total", COUNTER, "Ride quotes by whether they were served from the quote cache (hit, miss).",
+    labels=("cache",),
+))
+ASSIGNMENT_JOBS = registry.register(Metric(
+    "buggy_assignment_jobs_total", COUNTER, "Async assignment jobs by outcome (queued, done, retried, failed, lost).",
+    labels=("outcome",),
+))
+ASSIGNMENT_QUEUE_WAIT = registry.register(Metric(
+    "buggy_assignment_job_latency_seconds", HISTOGRAM, "Time from queueing an async assignment to its completion.",
+    buckets=LATENCY_BUCKETS,
+))
+
+
+def inc(metric: Metric, *labels: str, amount: float = 1.0) -> None:
+    registry.inc(metric.name, tuple(labels), amount)
+
+
+def observe(metric: Metric, value: float, *labels: str) -> None:
+    registry.observe(metric.name, value, tuple(labels))
+
+
+@contextmanager
+def timed(metric: Metric, *labels: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(metric, time.perf_counter() - start, *labels)
+
+
+# ----- multiprocess files -----
+
+_flusher: Optional[threading.Thread] = None
+_flusher_pid: Optional[int] = None
+_flusher_lock = threading.Lock()
+_file_pid: Optional[int] = None  # the process that owns the current metrics_<pid>.json
+_file_lock = threading.Lock()
+
+
+def _metrics_dir() -> Optional[str]:
+    return getattr(settings, "PROMETHEUS_METRICS_DIR", None) or None
+
+
+def _path_for(pid: int) -> str:
+    return os.path.join(_metrics_dir(), f"metrics_{pid}.json")
+
+
+def _write(path: str, snapshot: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def flush() -> None:
+    """Write this process's values to its file (atomically, via rename)."""
+    global _file_pid
+    if not _metrics_dir():
+        return
+    if _file_pid != os.getpid():
+        with _file_lock:
+            if _file_pid != os.getpid():
+                os.makedirs(_metrics_dir(), exist_ok=True)
+                # a file left under this pid belongs to an exited worker whose exit was not seen
+                mark_process_dead(os.getpid())
+                _file_pid = os.getpid()
+    _write(_path_for(os.getpid()), registry.snapshot())
+
+
+def mark_process_dead(pid: int) -> None:
+    """Fold an exited process's file into metrics_dead.json and remove it (gunicorn child_exit)."""
+    if not _metrics_dir():
+        return
+    path = _path_for(pid)
+    if not os.path.exists(path):
+        return
+    dead_path = os.path.join(_metrics_dir(), DEAD_FILE)
+    with open(os.path.join(_metrics_dir(), ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # the arbiter and a new worker reusing the pid may both get here
+        if not os.path.exists(path):
+            return
+        total: Dict[str, Dict[Labels, object]] = {}
+        for source in (dead_path, path):
+            try:
+                with open(source) as f:
+                    _merge(total, json.load(f))
+            except (OSError, ValueError):
+                continue  # no dead file yet, or a torn file whose values are lost either way
+        _write(dead_path, {name: [[list(k), v] for k, v in series.items()] for name, series in total.items()})
+        os.remove(path)
+
+
+def clear_dir() -> None:
+    """Remove every metrics file (gunicorn on_starting: a new server starts from zero)."""
+    if not _metrics_dir():
+        return
+    for path in glob.glob(os.path.join(_metrics_dir(), "metrics_*.json*")):
+        os.remove(path)
+
+
+def _flush_loop() -> None:
+    interval = getattr(settings, "PROMETHEUS_FLUSH_INTERVAL_S", DEFAULT_FLUSH_INTERVAL_S)
+    while True:
+        time.sleep(interval)
+        if registry.dirty:
+            try:
+                flush()
+            except OSError:
+                pass  # try again next round; never take the worker down over metrics
+
+
+def _ensure_flusher() -> None:
+    global _flusher, _flusher_pid
+    if _flusher_pid == os.getpid() or not _metrics_dir():
+        return
+    with _flusher_lock:
+        if _flusher_pid != os.getpid():
+            os.makedirs(_metrics_dir(), exist_ok=True)
+            # a forked worker starts its own thread (threads don't survive fork)
+            _flusher = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+            _flusher.start()
+            _flusher_pid = os.getpid()
+
+
+def _merge(total: Dict[str, Dict[Labels, object]], snapshot: dict) -> None:
+    for name, samples in snapshot.items():
+        if name not in registry.metrics:
+            continue
+        series = total.setdefault(name, {})
+        for labels, value in samples:
+            key = tuple(labels)
+            if isinstance(value, list):
+                current = series.get(key)
+                series[key] = value[:] if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                series[key] = series.get(key, 0.0) + value
+
+
+def collect() -> Dict[str, Dict[Labels, object]]:
+    """Values summed over every process that has written a file (or just this one)."""
+    total: Dict[str, Dict[Labels, object]] = {}
+    if not _metrics_dir():
+        _merge(total, registry.snapshot())
+        return total
+    flush()
+    for path in glob.glob(os.path.join(_metrics_dir(), "metrics_*.json")):
+        try:
+            with open(path) as f:
+                _merge(total, json.load(f))
+        except (OSError, ValueError):
+            continue  # a worker replacing its file mid-read; it is picked up next scrape
+    return total
+
+
+# ----- text exposition -----
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+def render(values: Optional[Dict[str, Dict[Labels, object]]] = None) -> str:
+    values = collect() if values is None else values
+    lines: List[str] = []
+    for name, metric in registry.metrics.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(values.get(name, {}).items()):
+            if metric.kind == COUNTER:
+                lines.append(f"{name}{_label_str(metric.label_names, labels)} {_format_value(value)}")
+                continue
+            cumulative = 0.0
+            for bound, count in zip(list(metric.buckets) + [math.inf], value):
+                cumulative += count
+                le = _label_str(metric.label_names, labels, [("le", _format_value(bound))])
+                lines.append(f"{name}_bucket{le} {_format_value(cumulative)}")
+            label_str = _label_str(metric.label_names, labels)
+            lines.append(f"{name}_sum{label_str} {_format_value(value[-1])}")
+            lines.append(f"{name}_count{label_str} {_format_value(cumulative)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,62 @@
+# core/services/user_cache.py
+from __future__ import annotations
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+
+from core.models import User
+
+DEFAULT_TTL_S = 30
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The parts of a user that authorization needs: role and assigned buggy."""
+    user_id: int
+    username: str
+    role: str
+    buggy_id: Optional[int]
+
+
+# simple per-process cache: user_id -> (expires_at, principal or None)
+_cache: Dict[int, Tuple[float, Optional[Principal]]] = {}
+_lock = threading.Lock()
+
+
+def _ttl_s() -> float:
+    return getattr(settings, "USER_CACHE_TTL_S", DEFAULT_TTL_S)
+
+
+def get_principal(user_id) -> Optional[Principal]:
+    """Return the active user's principal, loading it with one query at most once per TTL."""
+    user_id = int(user_id)  # token claims carry the id as a string
+    now = time.monotonic()
+    entry = _cache.get(user_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    row = (
+        User.objects
+        .filter(pk=user_id, is_active=True)
+        .values_list("username", "role", "assigned_buggy__id")
+        .first()
+    )
+    principal = Principal(user_id, *row) if row else None
+    with _lock:
+        _cache[user_id] = (now + _ttl_s(), principal)
+    return principal
+
+
+def invalidate(user_id: Optional[int]) -> None:
+    if user_id is None:
+        return
+    with _lock:
+        _cache.pop(int(user_id), None)
+
+
+def clear() -> None:
+    with _lock:
+        _cache.clear()
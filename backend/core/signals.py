@@ -1,7 +1,7 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from core.models import POI, PoiEdge
-from core.services import graph
+from core.models import POI, PoiEdge, Buggy, User
+from core.services import dispatch_table, graph, user_cache
 
 
 @receiver(post_save, sender=POI)
@@ -9,5 +9,39 @@ from core.services import graph
 @receiver(post_save, sender=PoiEdge)
 @receiver(post_delete, sender=PoiEdge)
 def invalidate_poi_graph_cache(**kwargs):
-    graph._graph_cache = None
+    graph.invalidate()
 
+
+@receiver(post_save, sender=PoiEdge)
+def record_edge_version(instance, created=False, raw=False, **kwargs):
+    if not raw:
+        graph.sync_edge_versions([instance], created=created)
+
+
+@receiver(post_delete, sender=PoiEdge)
+def close_edge_version(instance, **kwargs):
+    graph.close_edge_versions([instance.pk])
+
+
+@receiver(post_save, sender=PoiEdge)
+@receiver(post_delete, sender=PoiEdge)
+def clear_dispatch_rankings(raw=False, **kwargs):
+    # travel times changed under every ranked ETA; rows are rebuilt as buggies move
+    if not raw:
+        dispatch_table.clear()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Buggy)
+@receiver(post_delete, sender=Buggy)
+def invalidate_cached_buggy_drivers(update_fields=None, **kwargs):
+    # Position/load updates don't touch the driver; anything else may have moved
+    # a driver between buggies, and the previous driver isn't known here.
+    if update_fields is not None and "driver" not in update_fields:
+        return
+    user_cache.clear()
@@ -0,0 +1,118 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.models import (
+    Buggy,
+    BuggyRouteStop,
+    BuggyRouteStopHistory,
+    POI,
+    RideMetricsRollup,
+    RideRequest,
+    RideRequestHistory,
+)
+from core.services import archive, exports, metrics
+
+
+class RideArchiveTests(APITestCase):
+    def setUp(self):
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        self.buggy = Buggy.objects.create(code="BUGGY_1", display_name="Buggy #1", current_poi=self.reception)
+        self.now = timezone.now()
+        self.sequence = 0
+
+    def _ride(self, days_ago, status=RideRequest.Status.COMPLETED):
+        finished = self.now - timedelta(days=days_ago)
+        completed = status == RideRequest.Status.COMPLETED
+        ride = RideRequest.objects.create(
+            pickup_poi=self.reception,
+            dropoff_poi=self.beach_bar,
+            num_guests=2,
+            status=status,
+            assigned_buggy=self.buggy,
+            assigned_at=finished - timedelta(minutes=10),
+            pickup_completed_at=finished - timedelta(minutes=5) if completed else None,
+            dropoff_completed_at=finished if completed else None,
+        )
+        RideRequest.objects.filter(pk=ride.pk).update(requested_at=finished - timedelta(minutes=11))
+        for stop_type, poi in ((BuggyRouteStop.StopType.PICKUP, self.reception),
+                               (BuggyRouteStop.StopType.DROPOFF, self.beach_bar)):
+            BuggyRouteStop.objects.create(
+                buggy=self.buggy,
+                ride_request=ride,
+                stop_type=stop_type,
+                poi=poi,
+                sequence_index=self.sequence,
+                status=BuggyRouteStop.StopStatus.COMPLETED if completed else BuggyRouteStop.StopStatus.PLANNED,
+            )
+            self.sequence += 1
+        return ride
+
+    def test_moves_old_completed_rides_with_their_stops(self):
+        old = self._ride(days_ago=40)
+        recent = self._ride(days_ago=2)
+        open_ride = self._ride(days_ago=60, status=RideRequest.Status.ASSIGNED)
+
+        self.assertEqual(archive.archive_completed(), 1)
+
+        self.assertEqual(set(RideRequest.objects.values_list("id", flat=True)), {recent.id, open_ride.id})
+        archived = RideRequestHistory.objects.get()
+        self.assertEqual((archived.id, archived.public_code), (old.id, old.public_code))
+        self.assertEqual(archived.pickup_poi.code, "RECEPTION")
+        self.assertEqual(archived.route_stops.count(), 2)
+        self.assertFalse(BuggyRouteStop.objects.filter(ride_request_id=old.id).exists())
+
+    def test_batches_are_resumable(self):
+        for days_ago in (31, 32, 33, 34, 35):
+            self._ride(days_ago)
+        self.assertEqual(archive.archive_completed(batch_size=2, max_batches=1), 2)
+        self.assertEqual(RideRequest.objects.count(), 3)
+
+        out = StringIO()
+        call_command("archive_rides", "--batch-size", "2", stdout=out)
+        self.assertIn("Archived 3 rides", out.getvalue())
+        self.assertFalse(RideRequest.objects.exists())
+        self.assertEqual(BuggyRouteStopHistory.objects.count(), 10)
+        self.assertEqual(archive.archive_completed(), 0)
+
+    def test_history_query_spans_both_tables(self):
+        old = self._ride(days_ago=40)
+        recent = self._ride(days_ago=1)
+        archive.archive_completed()
+
+        codes = list(archive.rides().order_by("id").values_list("public_code", flat=True))
+        self.assertEqual(codes, [old.public_code, recent.public_code])
+        self.assertEqual(archive.stops().filter(stop_type=BuggyRouteStop.StopType.PICKUP).count(), 2)
+        self.assertEqual(
+            list(archive.stops().filter(ride_request__public_code=old.public_code).values_list("poi__code", flat=True)),
+            ["RECEPTION", "BEACH_BAR"],
+        )
+
+        rows = list(exports.export_rows("rides", ["public_code", "pickup_poi"]))
+        self.assertEqual(rows, [(old.public_code, "RECEPTION"), (recent.public_code, "RECEPTION")])
+
+    def test_export_keeps_archived_rows_whose_poi_or_buggy_was_deleted(self):
+        old = self._ride(days_ago=40)
+        archive.archive_completed()
+        self.beach_bar.delete()
+        self.buggy.delete()
+
+        rows = list(exports.export_rows("rides", ["public_code", "pickup_poi", "dropoff_poi", "assigned_buggy"]))
+        self.assertEqual(rows, [(old.public_code, "RECEPTION", None, None)])
+        stops = list(exports.export_rows("stops", ["ride", "buggy", "poi"]))
+        self.assertEqual(stops, [(old.public_code, None, "RECEPTION"), (old.public_code, None, None)])
+
+    def test_rollup_rebuild_includes_archived_rides(self):
+        self._ride(days_ago=40)
+        self._ride(days_ago=1)
+        archive.archive_completed()
+
+        metrics.rebuild_rollups()
+        totals = RideMetricsRollup.objects.filter(
+            granularity=RideMetricsRollup.Granularity.DAY, dimension=RideMetricsRollup.Dimension.BUGGY
+        ).values_list("completed_count", flat=True)
+        self.assertEqual(sum(totals), 2)
@@ -0,0 +1,137 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, RideRequest, User
+from core.services import routing, telemetry
+from core.services.driver_actions import complete_stop, start_stop
+from core.services.routing import (
+    AssignmentConflictError,
+    assign_ride_to_best_buggy,
+    assign_rides_to_best_buggies,
+    pickup_time_score,
+)
+
+
+def conflicts(mode):
+    return telemetry.registry.values[telemetry.ASSIGNMENT_CONFLICTS.name].get((mode,), 0)
+
+
+class ConcurrentAssignmentTests(TestCase):
+    """
+    A second dispatcher is simulated by writing from inside the score
+    callback, i.e. after the candidates were scored but before the chosen
+    buggy is locked.
+    """
+
+    def setUp(self):
+        telemetry.registry.clear()
+        self.bel_air = POI.objects.create(code="BEL_AIR", name="Bel Air")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.beach_bar, travel_time_s=120)
+        self.buggy = Buggy.objects.create(
+            code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=self.bel_air
+        )
+
+    def ride(self):
+        return RideRequest.objects.create(pickup_poi=self.beach_bar, dropoff_poi=self.bel_air, num_guests=2)
+
+    def test_replans_when_another_dispatcher_took_the_buggy(self):
+        mine, theirs = self.ride(), self.ride()
+        interleaved = []
+
+        def score(sim):
+            if not interleaved:
+                interleaved.append(assign_ride_to_best_buggy(theirs))
+            return pickup_time_score(sim)
+
+        assign_ride_to_best_buggy(mine, score=score)
+
+        stops = BuggyRouteStop.objects.filter(buggy=self.buggy).order_by("sequence_index")
+        self.assertEqual(
+            [(s.ride_request_id, s.sequence_index) for s in stops],
+            [(theirs.id, 0), (theirs.id, 1), (mine.id, 2), (mine.id, 3)],
+        )
+        self.assertEqual(Buggy.objects.get().route_version, 2)
+        self.assertEqual(conflicts("single"), 1)
+
+    def test_replans_onto_another_buggy_when_the_chosen_one_went_inactive(self):
+        other = Buggy.objects.create(
+            code="BUGGY_2", display_name="Buggy #2", status=Buggy.Status.ACTIVE, current_poi=self.bel_air
+        )
+
+        def score(sim):
+            Buggy.objects.filter(pk=self.buggy.pk).update(status=Buggy.Status.INACTIVE)
+            return pickup_time_score(sim)
+
+        self.assertEqual(assign_ride_to_best_buggy(self.ride(), score=score), other)
+
+    @override_settings(ASSIGNMENT_CONFLICT_RETRIES=1)
+    def test_gives_up_without_writing_when_conflicts_persist(self):
+        ride = self.ride()
+
+        def score(sim):
+            routing.bump_route_versions([self.buggy.id])
+            return pickup_time_score(sim)
+
+        with self.assertRaises(AssignmentConflictError):
+            assign_ride_to_best_buggy(ride, score=score)
+        ride.refresh_from_db()
+        self.assertEqual(ride.status, RideRequest.Status.PENDING)
+        self.assertFalse(BuggyRouteStop.objects.exists())
+        self.assertEqual(conflicts("single"), 2)
+
+    def test_completing_a_stop_invalidates_plans_from_before(self):
+        assign_ride_to_best_buggy(self.ride())
+        stop = BuggyRouteStop.objects.select_related("buggy", "ride_request", "poi").first()
+        start_stop(stop)
+        complete_stop(stop.buggy, stop)
+        complete_stop(stop.buggy, stop)  # the same instance saved again still increments
+        self.assertEqual(Buggy.objects.get().route_version, 3)
+
+    def test_bulk_replans_the_batch_on_conflict(self):
+        assign_ride_to_best_buggy(self.ride())
+        rides = [self.ride(), self.ride()]
+        real = routing.lock_if_unchanged
+        calls = []
+
+        def lock_once_stale(buggies):
+            calls.append(buggies)
+            return len(calls) > 1 and real(buggies)
+
+        with mock.patch.object(routing, "lock_if_unchanged", side_effect=lock_once_stale):
+            assign_rides_to_best_buggies(rides)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(
+            list(BuggyRouteStop.objects.filter(buggy=self.buggy).values_list("sequence_index", flat=True)),
+            list(range(6)),
+        )
+        self.assertEqual(Buggy.objects.get().route_version, 2)
+        self.assertEqual(conflicts("bulk"), 1)
+
+
+class AssignmentConflictViewTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(
+            User.objects.create_user(username="dispatcher", password="dispatcher", role=User.Role.DISPATCHER)
+        )
+        bel_air = POI.objects.create(code="BEL_AIR", name="Bel Air")
+        beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        PoiEdge.objects.create(from_poi=bel_air, to_poi=beach_bar, travel_time_s=120)
+        Buggy.objects.create(code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=bel_air)
+
+    @override_settings(ASSIGNMENT_CONFLICT_RETRIES=0)
+    def test_create_answers_409_and_drops_the_ride(self):
+        with mock.patch.object(routing, "lock_if_unchanged", return_value=False):
+            response = self.client.post(
+                reverse("rides-create-and-assign"),
+                {"pickup_poi_code": "BEL_AIR", "dropoff_poi_code": "BEACH_BAR", "num_guests": 2},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["code"], "ASSIGNMENT_CONFLICT")
+        self.assertFalse(RideRequest.objects.exists())
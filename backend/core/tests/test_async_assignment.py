@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import AssignmentJob, Buggy, BuggyRouteStop, POI, PoiEdge, RideRequest, User
+from core.services import assignment_queue
+
+
+class AsyncAssignmentTests(APITestCase):
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(
+            username="dispatcher", password="dispatcher", role=User.Role.DISPATCHER
+        )
+        self.client.force_authenticate(user=self.dispatcher)
+
+        self.bel_air = POI.objects.create(code="BEL_AIR", name="Bel Air")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.beach_bar, travel_time_s=120)
+        self.buggy = Buggy.objects.create(
+            code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=self.bel_air
+        )
+        self.url = reverse("rides-create-and-assign")
+        self.payload = {"pickup_poi_code": "BEL_AIR", "dropoff_poi_code": "BEACH_BAR", "num_guests": 2}
+
+    def _create_async(self):
+        response = self.client.post(self.url, self.payload, format="json", HTTP_PREFER="respond-async")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response
+
+    def test_accepts_then_worker_assigns_and_client_polls(self):
+        response = self._create_async()
+        code = response.data["code"]
+        self.assertEqual(response.data["status"], AssignmentJob.Status.QUEUED)
+        self.assertEqual(response["Location"], reverse("rides-assignment-status", args=[code]))
+        self.assertEqual(response.data["ride"]["status"], RideRequest.Status.PENDING)
+        self.assertFalse(BuggyRouteStop.objects.exists())
+
+        poll = self.client.get(response["Location"])
+        self.assertEqual(poll.data["status"], AssignmentJob.Status.QUEUED)
+        self.assertIsNone(poll.data["assigned_buggy"])
+
+        self.assertEqual(assignment_queue.work("test"), 1)
+        poll = self.client.get(response["Location"])
+        self.assertEqual(poll.status_code, status.HTTP_200_OK)
+        self.assertEqual(poll.data["status"], AssignmentJob.Status.DONE)
+        self.assertEqual(poll.data["ride"]["status"], RideRequest.Status.ASSIGNED)
+        self.assertEqual(poll.data["assigned_buggy"]["code"], "BUGGY_1")
+        self.assertEqual(BuggyRouteStop.objects.filter(ride_request__public_code=code).count(), 2)
+
+    def test_sync_mode_is_unchanged_and_setting_enables_async(self):
+        response = self.client.post(self.url, self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["assigned_buggy"]["code"], "BUGGY_1")
+        self.assertFalse(AssignmentJob.objects.exists())
+        self.assertEqual(
+            self.client.get(reverse("rides-assignment-status", args=[response.data["ride"]["public_code"]]))
+            .status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+
+        with override_settings(RIDE_ASSIGNMENT_MODE="async"):
+            response = self.client.post(self.url, self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+    @override_settings(ASSIGNMENT_MAX_ATTEMPTS=2)
+    def test_retries_with_backoff_then_fails_and_cancels(self):
+        Buggy.objects.update(status=Buggy.Status.INACTIVE)
+        code = self._create_async().data["code"]
+        job = AssignmentJob.objects.get()
+
+        self.assertEqual(assignment_queue.work("test"), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error_code),
+                         (AssignmentJob.Status.QUEUED, 1, assignment_queue.ERROR_NO_ACTIVE_BUGGIES))
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertEqual(assignment_queue.work("test"), 0)  # backing off
+
+        AssignmentJob.objects.update(available_at=timezone.now())
+        assignment_queue.work("test")
+        job.refresh_from_db()
+        self.assertEqual(job.status, AssignmentJob.Status.FAILED)
+        self.assertEqual(RideRequest.objects.get(public_code=code).status, RideRequest.Status.CANCELLED)
+        self.assertEqual(self.client.get(reverse("rides-assignment-status", args=[code])).data["error_code"],
+                         assignment_queue.ERROR_NO_ACTIVE_BUGGIES)
+
+    def test_claims_are_exclusive_and_expired_leases_are_reclaimed(self):
+        self._create_async()
+        [job] = assignment_queue.claim("worker-a")
+        self.assertEqual(assignment_queue.claim("worker-b"), [])
+
+        # worker-a assigned the ride, then died before marking the job done
+        assignment_queue.assign_ride_to_best_buggy(job.ride)
+        AssignmentJob.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+        [again] = assignment_queue.claim("worker-b")
+        self.assertEqual((again.locked_by, again.attempts), ("worker-b", 2))
+
+        assignment_queue.run_job(again)
+        self.assertEqual(again.status, AssignmentJob.Status.DONE)
+        self.assertEqual(BuggyRouteStop.objects.count(), 2)  # not assigned twice
+
+    def test_worker_that_lost_its_lease_writes_nothing(self):
+        self._create_async()
+        [slow] = assignment_queue.claim("worker-a")
+        AssignmentJob.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+        [again] = assignment_queue.claim("worker-b")
+
+        # worker-a finally gets to run: its assignment is rolled back
+        assignment_queue.run_job(slow)
+        self.assertEqual(RideRequest.objects.get().status, RideRequest.Status.PENDING)
+        self.assertFalse(BuggyRouteStop.objects.exists())
+        job = AssignmentJob.objects.get()
+        self.assertEqual((job.status, job.locked_by), (AssignmentJob.Status.RUNNING, "worker-b"))
+
+        assignment_queue.run_job(again)
+        self.assertEqual(RideRequest.objects.get().status, RideRequest.Status.ASSIGNED)
+        self.assertEqual(BuggyRouteStop.objects.count(), 2)
+
+        # and a late failure from worker-a does not requeue the finished job
+        with self.assertRaises(assignment_queue.LeaseLost):
+            assignment_queue._retry_or_fail(slow, assignment_queue.ERROR_ASSIGNMENT_FAILED, "boom")
+        self.assertEqual(AssignmentJob.objects.get().status, AssignmentJob.Status.DONE)
+
+    def test_worker_command_drains_the_queue(self):
+        for _ in range(3):
+            self._create_async()
+        out = StringIO()
+        call_command("assignment_worker", "--once", "--batch-size=2", stdout=out)
+        self.assertIn("Ran 3 assignment jobs", out.getvalue())
+        self.assertEqual(RideRequest.objects.filter(status=RideRequest.Status.ASSIGNED).count(), 3)
@@ -0,0 +1,66 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Buggy, POI, RideRequest
+from core.services import benchmarks
+
+
+class BenchmarkSuiteTests(TestCase):
+    def setUp(self):
+        Buggy.objects.create(code="REAL", display_name="Real", status=Buggy.Status.ACTIVE)
+
+    def test_runs_every_benchmark_in_a_scratch_database(self):
+        dataset = benchmarks.Dataset(pois=40, fleet_sizes=(2, 5), list_rides=10)
+        report = benchmarks.run_benchmarks(dataset, iterations=3)
+
+        self.assertEqual(
+            set(report["results"]),
+            set(benchmarks.BENCHMARKS) | {"routing.assign[fleet=2]", "routing.assign[fleet=5]"},
+        )
+        for stats in report["results"].values():
+            self.assertEqual(stats["iterations"], 3)
+            self.assertLessEqual(stats["min_ms"], stats["median_ms"])
+        self.assertEqual(report["environment"]["database"], "sqlite")
+        self.assertIn("python", report["environment"])
+        self.assertEqual(report["dataset"]["fleet_sizes"], [2, 5])
+
+        self.assertFalse(POI.objects.exists())
+        self.assertFalse(RideRequest.objects.exists())
+        self.assertEqual(list(Buggy.objects.values_list("code", "status")), [("REAL", Buggy.Status.ACTIVE)])
+
+    def test_refuses_to_load_into_a_live_database(self):
+        with mock.patch.object(benchmarks, "is_throwaway_database", return_value=False):
+            with self.assertRaisesMessage(benchmarks.BenchmarkError, "Refusing"):
+                benchmarks.Dataset(pois=40, fleet_sizes=(2,)).load()
+        self.assertFalse(POI.objects.exists())
+
+    def test_compare_flags_slowdowns(self):
+        report = {"results": {"a": {"median_ms": 13.0}, "b": {"median_ms": 5.0}, "c": {"median_ms": 1.0},
+                              "d": {"median_ms": 2.0}}}
+        baseline = {"results": {"a": {"median_ms": 10.0}, "b": {"median_ms": 10.0}, "c": {"median_ms": 1.1}}}
+        statuses = {row["benchmark"]: row["status"] for row in benchmarks.compare(report, baseline, 0.2)}
+        self.assertEqual(statuses, {"a": "slower", "b": "faster", "c": "ok", "d": "new"})
+
+    def test_command_updates_and_checks_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = os.path.join(tmp, "baseline.json")
+            args = ["benchmark", "--pois=30", "--fleet-sizes=2", "--list-rides=5", "--iterations=2",
+                    "--only=graph", f"--baseline={baseline}"]
+            call_command(*args, "--update-baseline", stdout=StringIO(), stderr=StringIO())
+            with open(baseline) as f:
+                stored = json.load(f)
+            self.assertEqual(set(stored["results"]), {"graph.from_db", "graph.shortest_path"})
+
+            for stats in stored["results"].values():
+                stats["median_ms"] = 1e-6  # make the current run look much slower
+            with open(baseline, "w") as f:
+                json.dump(stored, f)
+            with self.assertRaises(CommandError):
+                call_command(*args, "--fail-on-regression", stdout=StringIO(), stderr=StringIO())
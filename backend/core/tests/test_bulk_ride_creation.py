@@ -0,0 +1,115 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, RideRequest, User
+from core.serializers import ensure_placeholder_pois_and_edges
+
+
+class BulkRideCreationTests(APITestCase):
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(
+            username="dispatcher", password="dispatcher", role=User.Role.DISPATCHER
+        )
+        self.client.force_authenticate(user=self.dispatcher)
+
+        self.bel_air = POI.objects.create(code="BEL_AIR", name="Bel Air")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.beach_bar, travel_time_s=120)
+        PoiEdge.objects.create(from_poi=self.beach_bar, to_poi=self.reception, travel_time_s=240)
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.reception, travel_time_s=90)
+
+        self.buggy1 = Buggy.objects.create(
+            code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=self.bel_air
+        )
+        self.buggy2 = Buggy.objects.create(
+            code="BUGGY_2", display_name="Buggy #2", status=Buggy.Status.ACTIVE, current_poi=self.reception
+        )
+        self.url = reverse("rides-bulk-create-and-assign")
+
+    def _ride(self, pickup, dropoff, guests=2):
+        return {"pickup_poi_code": pickup, "dropoff_poi_code": dropoff, "num_guests": guests}
+
+    def test_rides_are_created_and_assigned_in_order(self):
+        payload = [
+            self._ride("bel_air", "BEACH_BAR"),
+            self._ride("RECEPTION", "BEL_AIR"),
+            self._ride("BEACH_BAR", "RECEPTION"),
+        ]
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        results = response.data["results"]
+        self.assertEqual([r["index"] for r in results], [0, 1, 2])
+        # Each buggy takes the ride starting where it stands; for the third ride Buggy 1
+        # reaches Beach Bar after its first dropoff (170s), Buggy 2 only after 260s.
+        self.assertEqual(
+            [r["assigned_buggy"]["code"] for r in results],
+            ["BUGGY_1", "BUGGY_2", "BUGGY_1"],
+        )
+        self.assertEqual(results[0]["ride"]["pickup_poi"]["code"], "BEL_AIR")
+        self.assertIsNotNone(results[0]["ride"]["requested_at"])
+
+        stops = BuggyRouteStop.objects.filter(buggy=self.buggy1).order_by("sequence_index")
+        self.assertEqual([s.sequence_index for s in stops], [0, 1, 2, 3])
+        self.assertEqual([s.poi.code for s in stops], ["BEL_AIR", "BEACH_BAR", "BEACH_BAR", "RECEPTION"])
+        self.assertEqual(
+            RideRequest.objects.filter(status=RideRequest.Status.ASSIGNED, assigned_at__isnull=False).count(), 3
+        )
+
+    def test_continues_existing_route_sequence(self):
+        ride = RideRequest.objects.create(
+            pickup_poi=self.reception, dropoff_poi=self.bel_air, num_guests=1, assigned_buggy=self.buggy1
+        )
+        BuggyRouteStop.objects.create(
+            buggy=self.buggy1,
+            ride_request=ride,
+            stop_type=BuggyRouteStop.StopType.DROPOFF,
+            poi=self.bel_air,
+            sequence_index=7,
+        )
+        response = self.client.post(self.url, {"rides": [self._ride("BEL_AIR", "BEACH_BAR")]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["results"][0]["assigned_buggy"]["code"], "BUGGY_1")
+        self.assertEqual(
+            list(BuggyRouteStop.objects.filter(buggy=self.buggy1).values_list("sequence_index", flat=True)),
+            [7, 8, 9],
+        )
+
+    def test_unknown_codes_reject_the_whole_batch(self):
+        payload = [self._ride("BEL_AIR", "BEACH_BAR"), self._ride("UNKNOWN", "BEACH_BAR")]
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["rides"][0], {})
+        self.assertIn("pickup_poi_code", response.data["rides"][1])
+        self.assertFalse(RideRequest.objects.exists())
+
+    def test_no_active_buggies_rolls_back(self):
+        Buggy.objects.update(status=Buggy.Status.INACTIVE)
+        response = self.client.post(self.url, [self._ride("BEL_AIR", "BEACH_BAR")], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["code"], "NO_ACTIVE_BUGGIES")
+        self.assertFalse(RideRequest.objects.exists())
+
+    def test_blank_codes_use_placeholder_pois(self):
+        response = self.client.post(self.url, [self._ride("", "")], format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        ride = response.data["results"][0]["ride"]
+        self.assertEqual(ride["pickup_poi"]["code"], "N/A-PICKUP")
+        self.assertEqual(ride["dropoff_poi"]["code"], "N/A-DROPOFF")
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        ensure_placeholder_pois_and_edges()
+
+        def count_queries(size):
+            payload = [self._ride("BEL_AIR", "RECEPTION")] * size
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(self.url, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries)
+
+        count_queries(20)  # warm the graph cache and create the metrics rollup buckets
+        self.assertEqual(count_queries(2), count_queries(20))
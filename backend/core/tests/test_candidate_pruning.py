@@ -0,0 +1,48 @@
+import random
+
+from django.test import TestCase
+
+from core.models import Buggy, POI
+from core.services import graph, synthetic
+from core.services.routing import (
+    build_current_routes,
+    pickup_time_score,
+    plan_greedy,
+    route_state,
+    total_time_score,
+)
+
+
+class CandidatePruningTests(TestCase):
+    """Lower-bound pruning must pick exactly what simulating every buggy picks."""
+
+    def setUp(self):
+        synthetic.generate_resort(synthetic.ResortSpec(
+            pois=150, buggies=60, drivers=0, active_ratio=1.0, days=0, open_rides_per_buggy=3, seed=3,
+        ))
+        self.g = graph.get_graph(force_reload=True)
+        buggies = list(Buggy.objects.order_by("id"))
+        routes = build_current_routes(buggies)
+        self.states = [route_state(b, routes[b.id]) for b in buggies]
+        rng = random.Random(7)
+        poi_ids = list(POI.objects.values_list("id", flat=True))
+        self.rides = [(*rng.sample(poi_ids, 2), rng.randint(1, 4)) for _ in range(25)]
+
+    def tearDown(self):
+        graph.invalidate()
+
+    def test_same_choices_as_exhaustive_search_with_far_fewer_simulations(self):
+        for score in (pickup_time_score, total_time_score):
+            with self.subTest(score=score.__name__):
+                pruned = plan_greedy(self.g, self.states, self.rides, score)
+                exhaustive = plan_greedy(self.g, self.states, self.rides, lambda sim: score(sim))
+
+                self.assertEqual(pruned.choices, exhaustive.choices)
+                self.assertEqual(exhaustive.evaluated, [len(self.states)] * len(self.rides))
+                self.assertLess(sum(pruned.evaluated), sum(exhaustive.evaluated) / 3)
+
+    def test_ties_go_to_the_earlier_buggy(self):
+        here = self.states[0][1]
+        idle = [(1, here, 0, ()), (2, here, 0, ()), (3, here, 0, ())]
+        plan = plan_greedy(self.g, idle[::-1], [(here, self.rides[0][1], 2)], pickup_time_score)
+        self.assertEqual(plan.choices, [0])
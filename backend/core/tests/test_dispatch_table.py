@@ -0,0 +1,157 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, BuggyRouteStop, DispatchRanking, POI, PoiEdge, RideRequest, User
+from core.services import dispatch_table, graph, routing
+from core.services.driver_actions import complete_stop, start_stop
+from core.services.routing import assign_ride_to_best_buggy, refresh_dispatch_rankings
+
+
+class DispatchTableTests(TestCase):
+    def setUp(self):
+        self.bel_air = POI.objects.create(code="BEL_AIR", name="Bel Air")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.beach_bar, travel_time_s=120)
+        self.slow = PoiEdge.objects.create(from_poi=self.beach_bar, to_poi=self.reception, travel_time_s=240)
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.reception, travel_time_s=90)
+        self.buggy1 = Buggy.objects.create(
+            code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=self.bel_air
+        )
+        self.buggy2 = Buggy.objects.create(
+            code="BUGGY_2", display_name="Buggy #2", status=Buggy.Status.ACTIVE, current_poi=self.reception
+        )
+        call_command("rebuild_dispatch_table", stdout=StringIO())
+
+    def tearDown(self):
+        graph.invalidate()
+
+    def ride(self, pickup, dropoff):
+        return RideRequest.objects.create(pickup_poi=pickup, dropoff_poi=dropoff, num_guests=2)
+
+    def eta(self, buggy, poi):
+        return DispatchRanking.objects.get(buggy=buggy, poi=poi).eta_s
+
+    def test_rebuild_ranks_every_poi_for_every_active_buggy(self):
+        self.assertEqual(DispatchRanking.objects.count(), 6)
+        self.assertEqual(self.eta(self.buggy1, self.beach_bar), 120)
+        self.assertEqual(self.eta(self.buggy2, self.beach_bar), 210)
+
+    def test_lookup_picks_what_planning_picks_without_planning(self):
+        rides = [
+            (self.beach_bar, self.reception), (self.reception, self.bel_air),
+            (self.bel_air, self.beach_bar), (self.beach_bar, self.bel_air), (self.reception, self.beach_bar),
+        ]
+        with mock.patch.object(routing, "plan_greedy", side_effect=AssertionError("planned")):
+            looked_up = [assign_ride_to_best_buggy(self.ride(*r)).code for r in rides]
+
+        BuggyRouteStop.objects.all().delete()
+        with mock.patch.object(dispatch_table, "best_buggy", return_value=None):
+            planned = [assign_ride_to_best_buggy(self.ride(*r)).code for r in rides]
+
+        self.assertEqual(looked_up, planned)
+        self.assertEqual(set(looked_up), {"BUGGY_1", "BUGGY_2"})
+
+    def test_appending_and_completing_stops_rewrite_the_buggys_rows(self):
+        assign_ride_to_best_buggy(self.ride(self.beach_bar, self.reception))
+        # 120s to Beach Bar, 25s pickup, 210s to Reception via Bel Air, 25s dropoff, then 90s back to Bel Air
+        self.assertEqual(self.eta(self.buggy1, self.bel_air), 470)
+        self.assertEqual(DispatchRanking.objects.get(buggy=self.buggy1, poi=self.bel_air).route_version, 1)
+
+        stop = BuggyRouteStop.objects.select_related("buggy", "ride_request", "poi").get(sequence_index=0)
+        start_stop(stop)
+        complete_stop(stop.buggy, stop)
+        refresh_dispatch_rankings(list(Buggy.objects.filter(pk=self.buggy1.pk)))
+        self.assertEqual(self.eta(self.buggy1, self.bel_air), 325)
+
+    def test_stale_or_missing_rows_fall_back_to_planning(self):
+        routing.bump_route_versions([self.buggy2.id])
+        self.assertIsNone(dispatch_table.best_buggy(self.reception.id, list(Buggy.objects.order_by("id"))))
+        self.assertEqual(assign_ride_to_best_buggy(self.ride(self.reception, self.bel_air)), self.buggy2)
+
+    def test_edge_changes_clear_the_table(self):
+        self.slow.travel_time_s = 30
+        self.slow.save()
+        self.assertFalse(DispatchRanking.objects.exists())
+        self.assertEqual(assign_ride_to_best_buggy(self.ride(self.beach_bar, self.bel_air)), self.buggy2)
+
+
+class NextAvailableViewTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(
+            User.objects.create_user(username="dispatcher", password="dispatcher", role=User.Role.DISPATCHER)
+        )
+        bel_air = POI.objects.create(code="BEL_AIR", name="Bel Air")
+        beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        PoiEdge.objects.create(from_poi=bel_air, to_poi=beach_bar, travel_time_s=120)
+        Buggy.objects.create(code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=bel_air)
+        Buggy.objects.create(code="BUGGY_2", display_name="Buggy #2", status=Buggy.Status.INACTIVE, current_poi=beach_bar)
+
+    def tearDown(self):
+        graph.invalidate()
+
+    def test_lists_the_first_buggy_at_each_poi(self):
+        self.assertEqual(
+            [row["buggy"] for row in self.client.get(reverse("pois-next-available")).json()],
+            [None, None],
+        )
+        call_command("rebuild_dispatch_table", stdout=StringIO())
+        self.assertEqual(
+            self.client.get(reverse("pois-next-available")).json(),
+            [
+                {"poi": {"code": "BEACH_BAR", "name": "Beach Bar"},
+                 "buggy": {"code": "BUGGY_1", "display_name": "Buggy #1"}, "eta_s": 120},
+                {"poi": {"code": "BEL_AIR", "name": "Bel Air"},
+                 "buggy": {"code": "BUGGY_1", "display_name": "Buggy #1"}, "eta_s": 0},
+            ],
+        )
+
+
+class ManagerBuggyUpdateTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(
+            User.objects.create_user(username="manager", password="manager", role=User.Role.MANAGER)
+        )
+        self.bel_air = POI.objects.create(code="BEL_AIR", name="Bel Air")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.beach_bar, travel_time_s=120)
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.reception, travel_time_s=90)
+        self.buggy1 = Buggy.objects.create(
+            code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=self.bel_air
+        )
+        self.buggy2 = Buggy.objects.create(
+            code="BUGGY_2", display_name="Buggy #2", status=Buggy.Status.ACTIVE, current_poi=self.reception
+        )
+        call_command("rebuild_dispatch_table", stdout=StringIO())
+
+    def tearDown(self):
+        graph.invalidate()
+
+    def move(self, buggy, **data):
+        response = self.client.put(reverse("manager-buggy-detail", args=[buggy.id]), data, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_moving_buggies_rewrites_their_rankings(self):
+        self.move(self.buggy1, current_poi_id=self.reception.id)
+        self.move(self.buggy2, current_poi_id=self.bel_air.id)
+
+        ride = RideRequest.objects.create(pickup_poi=self.bel_air, dropoff_poi=self.beach_bar, num_guests=2)
+        with mock.patch.object(routing, "plan_greedy", side_effect=AssertionError("planned")):
+            self.assertEqual(assign_ride_to_best_buggy(ride), self.buggy2)  # the one now at the pickup
+        self.assertEqual(DispatchRanking.objects.get(buggy=self.buggy1, poi=self.bel_air).eta_s, 90)
+
+    def test_status_changes_invalidate_and_restore_rankings(self):
+        self.move(self.buggy2, status=Buggy.Status.INACTIVE)
+        version = Buggy.objects.get(pk=self.buggy2.pk).route_version
+        self.move(self.buggy2, status=Buggy.Status.ACTIVE)
+        self.assertEqual(Buggy.objects.get(pk=self.buggy2.pk).route_version, version + 1)
+        self.assertEqual(dispatch_table.best_buggy(self.reception.id, [self.buggy1, self.buggy2]), self.buggy2)
+
+        self.move(self.buggy2, display_name="Renamed")  # neither moved nor status: version untouched
+        self.assertEqual(Buggy.objects.get(pk=self.buggy2.pk).route_version, version + 1)
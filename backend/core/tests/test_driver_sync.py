@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, BuggyRouteStop, POI, RideRequest, User
+
+
+class DriverSyncTests(APITestCase):
+    def setUp(self):
+        self.driver = User.objects.create_user(username="driver1", password="driver1", role=User.Role.DRIVER)
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        self.buggy = Buggy.objects.create(
+            code="BUGGY_1",
+            display_name="Buggy #1",
+            status=Buggy.Status.ACTIVE,
+            current_poi=self.reception,
+            driver=self.driver,
+        )
+        self.ride = RideRequest.objects.create(
+            pickup_poi=self.reception,
+            dropoff_poi=self.beach_bar,
+            num_guests=2,
+            status=RideRequest.Status.ASSIGNED,
+            assigned_buggy=self.buggy,
+        )
+        self.pickup = BuggyRouteStop.objects.create(
+            buggy=self.buggy,
+            ride_request=self.ride,
+            stop_type=BuggyRouteStop.StopType.PICKUP,
+            poi=self.reception,
+            sequence_index=0,
+        )
+        self.dropoff = BuggyRouteStop.objects.create(
+            buggy=self.buggy,
+            ride_request=self.ride,
+            stop_type=BuggyRouteStop.StopType.DROPOFF,
+            poi=self.beach_bar,
+            sequence_index=1,
+        )
+        self.client.force_authenticate(user=self.driver)
+        self.url = reverse("driver-sync")
+
+        base = timezone.now() - timedelta(minutes=10)
+        self.picked_up_at = base + timedelta(minutes=1)
+        self.dropped_off_at = base + timedelta(minutes=4)
+        self.full_trip = [
+            {"stop_id": self.pickup.id, "action": "start", "recorded_at": base.isoformat()},
+            {"stop_id": self.pickup.id, "action": "complete", "recorded_at": self.picked_up_at.isoformat()},
+            {"stop_id": self.dropoff.id, "action": "start", "recorded_at": self.picked_up_at.isoformat()},
+            {"stop_id": self.dropoff.id, "action": "complete", "recorded_at": self.dropped_off_at.isoformat()},
+        ]
+
+    def _results(self, response):
+        return [r["result"] for r in response.data["results"]]
+
+    def test_full_trip_applies_with_recorded_times(self):
+        response = self.client.post(self.url, {"actions": self.full_trip}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._results(response), ["applied"] * 4)
+
+        self.ride.refresh_from_db()
+        self.dropoff.refresh_from_db()
+        self.buggy.refresh_from_db()
+        self.assertEqual(self.ride.status, RideRequest.Status.COMPLETED)
+        self.assertEqual(self.ride.pickup_completed_at, self.picked_up_at)
+        self.assertEqual(self.ride.dropoff_completed_at, self.dropped_off_at)
+        self.assertEqual(self.dropoff.completed_at, self.dropped_off_at)
+        self.assertEqual(self.buggy.current_poi, self.beach_bar)
+        self.assertEqual(self.buggy.current_onboard_guests, 0)
+
+    def test_replay_is_idempotent(self):
+        self.client.post(self.url, {"actions": self.full_trip[:2]}, format="json")
+        response = self.client.post(self.url, {"actions": self.full_trip}, format="json")
+
+        self.assertEqual(self._results(response), ["duplicate", "duplicate", "applied", "applied"])
+        self.buggy.refresh_from_db()
+        self.assertEqual(self.buggy.current_onboard_guests, 0)
+
+        replay = self.client.post(self.url, {"actions": self.full_trip}, format="json")
+        self.assertEqual(self._results(replay), ["duplicate"] * 4)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.dropoff_completed_at, self.dropped_off_at)
+
+    def test_out_of_sequence_action_stops_the_batch(self):
+        actions = [
+            {"stop_id": self.dropoff.id, "action": "start"},
+            {"stop_id": self.pickup.id, "action": "start"},
+        ]
+        response = self.client.post(self.url, {"actions": actions}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._results(response), ["rejected", "skipped"])
+        self.assertEqual(response.data["results"][0]["detail"], "Can only start the next stop in sequence")
+
+        self.pickup.refresh_from_db()
+        self.assertEqual(self.pickup.status, BuggyRouteStop.StopStatus.PLANNED)
+
+    def test_other_buggys_stop_is_rejected(self):
+        other = Buggy.objects.create(code="BUGGY_2", display_name="Buggy #2")
+        stop = BuggyRouteStop.objects.create(
+            buggy=other,
+            ride_request=self.ride,
+            stop_type=BuggyRouteStop.StopType.PICKUP,
+            poi=self.reception,
+            sequence_index=0,
+        )
+        response = self.client.post(self.url, {"actions": [{"stop_id": stop.id, "action": "start"}]}, format="json")
+        self.assertEqual(self._results(response), ["rejected"])
+
+    def test_driver_without_buggy_is_forbidden(self):
+        self.buggy.driver = None
+        self.buggy.save()
+        self.driver.refresh_from_db()
+        response = self.client.post(self.url, {"actions": self.full_trip}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
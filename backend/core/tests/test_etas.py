@@ -0,0 +1,122 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, RideRequest, User
+from core.services import eta, graph
+from core.services.driver_actions import complete_stop, start_stop
+from core.services.routing import assign_ride_to_best_buggy
+
+
+class EtaTestMixin:
+    def setUp(self):
+        eta.clear()
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        self.bel_air = POI.objects.create(code="BEL_AIR", name="Bel Air")
+        PoiEdge.objects.create(from_poi=self.reception, to_poi=self.beach_bar, travel_time_s=120)
+        PoiEdge.objects.create(from_poi=self.beach_bar, to_poi=self.bel_air, travel_time_s=60)
+        self.driver = User.objects.create_user(username="driver1", password="driver1", role=User.Role.DRIVER)
+        self.buggy = Buggy.objects.create(
+            code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=self.reception,
+            driver=self.driver,
+        )
+
+    def tearDown(self):
+        graph.invalidate()
+        eta.clear()
+
+    def assign(self, pickup, dropoff):
+        ride = RideRequest.objects.create(pickup_poi=pickup, dropoff_poi=dropoff, num_guests=2)
+        assign_ride_to_best_buggy(ride)
+        return ride
+
+    def changed_at(self):
+        return Buggy.objects.get(pk=self.buggy.pk).route_changed_at
+
+
+class EtaEngineTests(EtaTestMixin, TestCase):
+    def test_arrivals_sum_travel_and_service_of_the_stops_before(self):
+        first = self.assign(self.reception, self.beach_bar)
+        second = self.assign(self.beach_bar, self.bel_air)
+        t0 = self.changed_at()
+
+        etas = eta.for_buggies([self.buggy.id])[self.buggy.id]
+        # 0s to Reception, 25s pickup, 120s to Beach Bar, 25s dropoff, 25s pickup, 60s to Bel Air
+        self.assertEqual([(at - t0).total_seconds() for at in etas.rides[first.id]], [0, 145])
+        self.assertEqual([(at - t0).total_seconds() for at in etas.rides[second.id]], [170, 255])
+        self.assertEqual(len(etas.stops), 4)
+
+    def test_only_changed_buggies_are_recomputed(self):
+        other = Buggy.objects.create(
+            code="BUGGY_2", display_name="Buggy #2", status=Buggy.Status.INACTIVE, current_poi=self.bel_air
+        )
+        self.assign(self.reception, self.beach_bar)
+        with mock.patch.object(eta, "_compute", wraps=eta._compute) as compute:
+            eta.for_buggies()
+            self.assertEqual(compute.call_count, 2)
+            with self.assertNumQueries(1):  # versions only
+                eta.for_buggies()
+            self.assertEqual(compute.call_count, 2)
+
+            self.assign(self.beach_bar, self.bel_air)
+            eta.for_buggies()
+            recomputed = [c.args[2:4] for c in compute.call_args_list[2:]]
+            self.assertEqual(recomputed, [(self.changed_at(), self.reception.id)])
+        self.assertEqual(eta.for_buggies([other.id])[other.id].stops, {})
+
+    def test_completing_a_stop_counts_from_the_completion(self):
+        ride = self.assign(self.reception, self.beach_bar)
+        stop = BuggyRouteStop.objects.select_related("buggy", "ride_request", "poi").get(sequence_index=0)
+        start_stop(stop)
+        done_at = self.changed_at() + timedelta(minutes=3)
+        complete_stop(stop.buggy, stop, completed_at=done_at)
+
+        etas = eta.for_buggies([self.buggy.id])[self.buggy.id]
+        self.assertEqual(etas.rides[ride.id], (None, done_at + timedelta(seconds=120)))
+
+
+    def test_appending_a_ride_later_leaves_planned_etas_alone(self):
+        first = self.assign(self.reception, self.beach_bar)
+        stop = BuggyRouteStop.objects.select_related("buggy", "ride_request", "poi").get(sequence_index=0)
+        start_stop(stop)
+        done_at = self.changed_at() + timedelta(minutes=3)
+        complete_stop(stop.buggy, stop, completed_at=done_at)
+        before = eta.for_buggies([self.buggy.id])[self.buggy.id].rides[first.id]
+
+        with mock.patch("django.utils.timezone.now", return_value=done_at + timedelta(minutes=10)):
+            second = self.assign(self.beach_bar, self.bel_air)
+        etas = eta.for_buggies([self.buggy.id])[self.buggy.id]
+        self.assertEqual(etas.rides[first.id], before)
+        self.assertEqual(etas.rides[second.id], (before[1] + timedelta(seconds=25), before[1] + timedelta(seconds=110)))
+
+
+class EtaViewTests(EtaTestMixin, APITestCase):
+    def test_rides_list_includes_pickup_and_dropoff_etas(self):
+        self.client.force_authenticate(
+            User.objects.create_user(username="dispatcher", password="dispatcher", role=User.Role.DISPATCHER)
+        )
+        self.assign(self.reception, self.beach_bar)
+        RideRequest.objects.create(pickup_poi=self.bel_air, dropoff_poi=self.reception, num_guests=1)
+        t0 = self.changed_at()
+
+        rows = self.client.get(reverse("rides-list")).json()
+        self.assertEqual([(r["pickup_eta"], r["dropoff_eta"]) for r in rows[:1]], [(None, None)])
+        self.assertEqual(
+            [parse_datetime(rows[1]["pickup_eta"]), parse_datetime(rows[1]["dropoff_eta"])],
+            [t0, t0 + timedelta(seconds=145)],
+        )
+
+    def test_driver_route_includes_stop_etas(self):
+        self.client.force_authenticate(self.driver)
+        self.assign(self.beach_bar, self.bel_air)
+        t0 = self.changed_at()
+
+        rows = self.client.get(reverse("driver-my-route")).json()
+        self.assertEqual(
+            [parse_datetime(r["eta"]) - t0 for r in rows], [timedelta(seconds=120), timedelta(seconds=205)]
+        )
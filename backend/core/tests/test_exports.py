@@ -0,0 +1,129 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, BuggyRouteStop, POI, RideRequest, User
+from core.services import exports
+
+
+class HistoryExportTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username="manager", password="manager", role=User.Role.MANAGER)
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        self.buggy = Buggy.objects.create(code="BUGGY_1", display_name="Buggy #1", current_poi=self.reception)
+        now = timezone.now()
+        self.rides = []
+        for days_ago in (10, 3, 0):
+            ride = RideRequest.objects.create(
+                pickup_poi=self.reception,
+                dropoff_poi=self.beach_bar,
+                num_guests=2,
+                guest_name="Zoë, \"VIP\"",
+                assigned_buggy=self.buggy,
+            )
+            RideRequest.objects.filter(pk=ride.pk).update(requested_at=now - timedelta(days=days_ago))
+            self.rides.append(ride)
+        BuggyRouteStop.objects.create(
+            buggy=self.buggy,
+            ride_request=self.rides[0],
+            stop_type=BuggyRouteStop.StopType.PICKUP,
+            poi=self.reception,
+            sequence_index=0,
+        )
+        self.client.force_authenticate(user=self.manager)
+
+    def _body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_csv_export_with_columns_and_date_filter(self):
+        start = (timezone.localdate() - timedelta(days=5)).isoformat()
+        response = self.client.get(
+            reverse("export", args=["rides", "csv"]),
+            {"columns": "public_code,guest_name,pickup_poi,requested_at", "from": start},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+
+        rows = list(csv.reader(io.StringIO(self._body(response).decode("utf-8"))))
+        self.assertEqual(rows[0], ["public_code", "guest_name", "pickup_poi", "requested_at"])
+        self.assertEqual([r[0] for r in rows[1:]], [self.rides[1].public_code, self.rides[2].public_code])
+        self.assertEqual(rows[1][1], "Zoë, \"VIP\"")
+        self.assertEqual(rows[1][2], "RECEPTION")
+
+    def test_ndjson_export_gzipped_when_accepted(self):
+        response = self.client.get(reverse("export", args=["stops", "ndjson"]), HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+        lines = gzip.decompress(self._body(response)).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 1)
+        record = json.loads(lines[0])
+        self.assertEqual(record["ride"], self.rides[0].public_code)
+        self.assertEqual(record["buggy"], "BUGGY_1")
+        self.assertEqual(list(record), list(exports.DATASETS["stops"]["columns"]))
+
+    def test_invalid_requests(self):
+        self.assertEqual(
+            self.client.get(reverse("export", args=["rides", "xml"])).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.get(reverse("export", args=["users", "csv"])).status_code, status.HTTP_400_BAD_REQUEST
+        )
+        response = self.client.get(reverse("export", args=["rides", "csv"]), {"columns": "id,password"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("password", response.data["error"])
+
+        for window in ({"to": "2026-02-30"}, {"from": "2026-13-01"}, {"from": "2026-03-02", "to": "2026-03-01"}):
+            response = self.client.get(reverse("export", args=["rides", "csv"]), window)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, window)
+
+        dispatcher = User.objects.create_user(username="d", password="d", role=User.Role.DISPATCHER)
+        self.client.force_authenticate(user=dispatcher)
+        self.assertEqual(
+            self.client.get(reverse("export", args=["rides", "csv"])).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+    def test_stream_flushes_in_chunks(self):
+        chunks = list(exports.iter_ndjson(["n"], ((i,) for i in range(20000))))
+        self.assertGreater(len(chunks), 2)
+        self.assertTrue(all(len(c) < exports.FLUSH_BYTES + 100 for c in chunks))
+
+    def test_management_command_writes_gzip_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rides.csv.gz")
+            call_command("export_history", "rides", "--columns", "public_code", "--gzip", "-o", path, stderr=io.StringIO())
+            with gzip.open(path, "rt") as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["public_code"])
+        self.assertEqual(len(rows), 4)
+
+    def test_api_and_command_export_the_same_window(self):
+        start = (timezone.localdate() - timedelta(days=5)).isoformat()
+        end = timezone.localdate().isoformat()  # exclusive in both: today's ride is left out
+        response = self.client.get(
+            reverse("export", args=["rides", "csv"]), {"columns": "public_code", "from": start, "to": end}
+        )
+        api_rows = list(csv.reader(io.StringIO(self._body(response).decode("utf-8"))))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rides.csv")
+            call_command(
+                "export_history", "rides", "--columns", "public_code", "--from", start, "--to", end, "-o", path,
+                stderr=io.StringIO(),
+            )
+            with open(path, newline="", encoding="utf-8") as f:
+                command_rows = list(csv.reader(f))
+        self.assertEqual(command_rows, api_rows)
+        self.assertEqual(api_rows[1:], [[self.rides[1].public_code]])
@@ -0,0 +1,141 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from core import fast_serializers
+from core.services import eta
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, RideRequest, User
+from core.renderers import FastJSONRenderer
+from core.serializers import (
+    BuggyRouteStopSerializer,
+    BuggySummarySerializer,
+    POISerializer,
+    RideRequestSerializer,
+    RideWithAssignmentSerializer,
+    RideWithEtaSerializer,
+    RouteStopWithEtaSerializer,
+)
+
+
+def drf_bytes(data):
+    return JSONRenderer().render(data)
+
+
+def fast_bytes(data):
+    return FastJSONRenderer().render(data)
+
+
+class FastSerializerEquivalenceTests(APITestCase):
+    """The fast read path must produce exactly the bytes the DRF serializers produce."""
+
+    def setUp(self):
+        self.driver = User.objects.create_user(username="driver1", password="driver1", role=User.Role.DRIVER)
+        self.reception = POI.objects.create(code="RECEPTION", name="Réception")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar \"quoted\" 🍹")
+        PoiEdge.objects.create(from_poi=self.reception, to_poi=self.beach_bar, travel_time_s=120)
+
+        self.buggy = Buggy.objects.create(
+            code="BUGGY_1",
+            display_name="Buggy #1",
+            status=Buggy.Status.ACTIVE,
+            current_poi=self.reception,
+            driver=self.driver,
+        )
+        self.nowhere_buggy = Buggy.objects.create(code="BUGGY_2", display_name="Buggy #2")
+
+        now = timezone.now()
+        self.assigned = RideRequest.objects.create(
+            pickup_poi=self.reception,
+            dropoff_poi=self.beach_bar,
+            num_guests=2,
+            guest_name="Zoë",
+            status=RideRequest.Status.IN_PROGRESS,
+            assigned_buggy=self.buggy,
+            assigned_at=now,
+            pickup_completed_at=now + timedelta(seconds=90, microseconds=123456),
+        )
+        self.unassigned = RideRequest.objects.create(
+            pickup_poi=self.beach_bar,
+            dropoff_poi=self.reception,
+            num_guests=1,
+            room_number="101",
+            guest_name="line\u2028separator",
+        )
+        RideRequest.objects.create(
+            pickup_poi=self.beach_bar,
+            dropoff_poi=self.reception,
+            num_guests=3,
+            assigned_buggy=self.nowhere_buggy,
+        )
+        BuggyRouteStop.objects.create(
+            buggy=self.buggy,
+            ride_request=self.assigned,
+            stop_type=BuggyRouteStop.StopType.DROPOFF,
+            poi=self.beach_bar,
+            sequence_index=0,
+        )
+
+    def test_rides_match_serializer(self):
+        qs = RideRequest.objects.order_by("-requested_at")
+        self.assertEqual(
+            fast_bytes(fast_serializers.ride_mapper.map_queryset(qs)),
+            drf_bytes(RideRequestSerializer(qs, many=True).data),
+        )
+
+    def test_buggies_pois_and_stops_match_serializers(self):
+        cases = [
+            (fast_serializers.buggy_mapper, BuggySummarySerializer, Buggy.objects.order_by("id")),
+            (fast_serializers.poi_mapper, POISerializer, POI.objects.order_by("name")),
+            (fast_serializers.route_stop_mapper, BuggyRouteStopSerializer, BuggyRouteStop.objects.all()),
+        ]
+        for mapper, serializer_class, qs in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assertEqual(
+                    fast_bytes(mapper.map_queryset(qs)),
+                    drf_bytes(serializer_class(qs, many=True).data),
+                )
+
+    def test_ride_with_assignment_matches_serializer(self):
+        ride = RideRequest.objects.get(id=self.assigned.id)
+        expected = RideWithAssignmentSerializer({"ride": ride, "assigned_buggy": self.buggy}).data
+        actual = fast_serializers.ride_with_assignment_data(ride, self.buggy)
+        self.assertEqual(fast_bytes(actual), drf_bytes(expected))
+
+    def test_list_endpoints_match_serializers(self):
+        self.client.force_authenticate(user=self.driver)
+
+        rides = (
+            RideRequest.objects
+            .select_related("pickup_poi", "dropoff_poi", "assigned_buggy", "assigned_buggy__current_poi")
+            .order_by("-requested_at")[:100]
+        )
+        etas = {"etas": eta.for_buggies()}
+        open_stops = BuggyRouteStop.objects.exclude(status=BuggyRouteStop.StopStatus.COMPLETED)
+        cases = [
+            ("/api/rides/", RideWithEtaSerializer(rides, many=True, context=etas).data),
+            ("/api/buggies/", BuggySummarySerializer(Buggy.objects.all(), many=True).data),
+            ("/api/pois/", POISerializer(POI.objects.order_by("name"), many=True).data),
+            ("/api/driver/my-route/", RouteStopWithEtaSerializer(open_stops, many=True, context=etas).data),
+        ]
+        for url, expected in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_ACCEPT="application/json")
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.content, drf_bytes(expected))
+
+    def test_rides_match_serializer_without_orjson(self):
+        qs = RideRequest.objects.order_by("-requested_at")
+        with mock.patch("core.renderers.orjson", None):
+            self.assertEqual(
+                fast_bytes(fast_serializers.ride_mapper.map_queryset(qs)),
+                drf_bytes(RideRequestSerializer(qs, many=True).data),
+            )
+
+    def test_renderer_falls_back_for_non_native_types(self):
+        data = {"when": timezone.now(), "amount": Decimal("1.50")}
+        self.assertEqual(fast_bytes(data), drf_bytes(data))
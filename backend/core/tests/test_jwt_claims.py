@@ -0,0 +1,133 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import Buggy, BuggyRouteStop, POI, RideRequest, User
+from core.services import user_cache
+
+
+class JWTClaimsTests(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.manager = User.objects.create_user(username="manager", password="manager", role=User.Role.MANAGER)
+        self.driver = User.objects.create_user(username="driver1", password="driver1", role=User.Role.DRIVER)
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        self.buggy = Buggy.objects.create(
+            code="BUGGY_1",
+            display_name="Buggy #1",
+            status=Buggy.Status.ACTIVE,
+            current_poi=self.reception,
+            driver=self.driver,
+        )
+        ride = RideRequest.objects.create(
+            pickup_poi=self.reception, dropoff_poi=self.reception, num_guests=1, assigned_buggy=self.buggy
+        )
+        self.stop = BuggyRouteStop.objects.create(
+            buggy=self.buggy,
+            ride_request=ride,
+            stop_type=BuggyRouteStop.StopType.PICKUP,
+            poi=self.reception,
+            sequence_index=0,
+        )
+
+    def _login(self, username):
+        response = self.client.post("/api/auth/login/", {"username": username, "password": username})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["access"]
+
+    def _user_queries(self, ctx):
+        return [q["sql"] for q in ctx.captured_queries if '"core_user"' in q["sql"]]
+
+    def test_token_carries_role_and_buggy_claims(self):
+        token = AccessToken(self._login("driver1"))
+        self.assertEqual(token["role"], User.Role.DRIVER)
+        self.assertEqual(token["buggy_id"], self.buggy.id)
+        self.assertEqual(token["username"], "driver1")
+
+    def test_hot_read_endpoints_skip_the_user_query(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('driver1')}")
+        user_cache.get_principal(self.driver.id)  # my-route checks the buggy against the warm cache
+        for url in ["/api/auth/me/", "/api/rides/", "/api/buggies/", "/api/driver/my-route/"]:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self._user_queries(ctx), [])
+
+        me = self.client.get("/api/auth/me/")
+        self.assertEqual(me.data, {"username": "driver1", "role": User.Role.DRIVER})
+        route = self.client.get("/api/driver/my-route/")
+        self.assertEqual([s["id"] for s in route.data], [self.stop.id])
+
+    def test_manager_role_claim_grants_manager_reads(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('manager')}")
+        self.assertEqual(self.client.get("/api/manager/drivers/").status_code, status.HTTP_200_OK)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('driver1')}")
+        self.assertEqual(self.client.get("/api/manager/drivers/").status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_writes_use_cache_invalidated_on_buggy_edit(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('driver1')}")
+        start_url = f"/api/driver/stops/{self.stop.id}/start/"
+
+        # Warm the cache, then move the driver off the buggy.
+        self.assertEqual(user_cache.get_principal(self.driver.id).buggy_id, self.buggy.id)
+        self.buggy.driver = None
+        self.buggy.save()
+
+        response = self.client.post(start_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.buggy.driver = self.driver
+        self.buggy.save()
+        response = self.client.post(start_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_route_follows_the_driver_not_a_stale_buggy_claim(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self._login('driver1')}")
+        other = Buggy.objects.create(
+            code="BUGGY_2", display_name="Buggy #2", status=Buggy.Status.ACTIVE, current_poi=self.reception
+        )
+        self.buggy.driver = None
+        self.buggy.save()
+        route = self.client.get("/api/driver/my-route/")
+        self.assertEqual(route.data, [])  # the token still names BUGGY_1
+
+        other.driver = self.driver
+        other.save()
+        ride = RideRequest.objects.create(
+            pickup_poi=self.reception, dropoff_poi=self.reception, num_guests=1, assigned_buggy=other
+        )
+        stop = BuggyRouteStop.objects.create(
+            buggy=other,
+            ride_request=ride,
+            stop_type=BuggyRouteStop.StopType.PICKUP,
+            poi=self.reception,
+            sequence_index=0,
+        )
+        route = self.client.get("/api/driver/my-route/")
+        self.assertEqual([s["id"] for s in route.data], [stop.id])
+
+    def test_cached_principal_is_reused_within_ttl(self):
+        user_cache.get_principal(self.driver.id)
+        with CaptureQueriesContext(connection) as ctx:
+            user_cache.get_principal(self.driver.id)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        # Stop completions only touch the buggy's position, not its driver.
+        self.buggy.save(update_fields=["current_poi", "current_onboard_guests"])
+        with CaptureQueriesContext(connection) as ctx:
+            user_cache.get_principal(self.driver.id)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_legacy_token_without_claims_uses_user_cache(self):
+        token = AccessToken.for_user(self.driver)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.data, {"username": "driver1", "role": User.Role.DRIVER})
+
+        self.driver.is_active = False
+        self.driver.save()
+        response = self.client.get("/api/auth/me/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TransactionTestCase
+
+from core.models import Buggy, POI, PoiEdge, RideRequest, User
+from core.services import loadtest
+from core.services.loadtest import Recorder, percentile, summarize
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    """Threads use their own connections, so the data must be committed."""
+
+    def setUp(self):
+        pois = [POI.objects.create(code=f"POI_{i}", name=f"POI {i}") for i in range(4)]
+        for a, b in zip(pois, pois[1:]):
+            PoiEdge.objects.create(from_poi=a, to_poi=b, travel_time_s=60)
+
+    def test_in_process_run_reports_every_workflow(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "report.json")
+            call_command(
+                "loadtest", "--duration=1.5", "--dispatchers=2", "--ride-rate=4", "--bulk-fraction=0.3",
+                "--drivers=2", "--driver-interval=0.05", "--dashboards=1", "--dashboard-interval=0.1",
+                f"--output={path}", stdout=StringIO(), stderr=StringIO(),
+            )
+            with open(path) as f:
+                report = json.load(f)
+
+        self.assertEqual(report["transport"], "wsgi")
+        self.assertEqual(report["config"]["drivers"], 2)
+        self.assertGreater(RideRequest.objects.count(), 0)
+        # the fixtures are retired when the run ends
+        self.assertEqual(Buggy.objects.filter(code__startswith="LOAD_", status=Buggy.Status.INACTIVE).count(), 2)
+        accounts = User.objects.filter(username__startswith="load_")
+        self.assertEqual(accounts.count(), 4)
+        self.assertFalse(any(u.is_active or u.has_usable_password() for u in accounts))
+
+        endpoints = report["endpoints"]
+        for name in ("rides-create-and-assign", "driver-my-route", "rides-list"):
+            self.assertGreater(endpoints[name]["requests"], 0, name)
+        self.assertIn("driver-stop-start", endpoints)
+        self.assertEqual(report["requests"], sum(e["requests"] for e in endpoints.values()))
+        self.assertGreater(report["throughput_rps"], 0)
+        self.assertLessEqual(endpoints["rides-list"]["p50_ms"], endpoints["rides-list"]["p99_ms"])
+        self.assertEqual(report["db"]["vendor"], "sqlite")
+        self.assertIn("lock_errors", report["db"])
+
+    def test_refuses_a_live_database_without_opt_in(self):
+        with mock.patch.object(loadtest, "is_throwaway_database", return_value=False):
+            with self.assertRaisesMessage(CommandError, "--allow-writes"):
+                call_command("loadtest", "--duration=0.1", stdout=StringIO())
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Buggy.objects.exists())
+
+    def test_needs_a_connected_graph(self):
+        PoiEdge.objects.all().delete()
+        with self.assertRaisesMessage(CommandError, "seed_pois_and_edges"):
+            call_command("loadtest", "--duration=0.1", stdout=StringIO())
+
+
+class SummaryTests(SimpleTestCase):
+    def test_percentiles_throughput_and_errors(self):
+        recorder = Recorder()
+        for ms in range(1, 101):
+            recorder.record("rides-list", ms / 1000, 200)
+        recorder.record("rides-create-and-assign", 0.5, 500)
+        recorder.record("rides-create-and-assign", 0.1, 0)  # connection failure
+
+        summary = summarize(recorder, elapsed_s=2.0)
+        rides = summary["endpoints"]["rides-list"]
+        self.assertEqual((rides["p50_ms"], rides["p99_ms"], rides["max_ms"]), (51.0, 99.0, 100.0))
+        self.assertEqual(rides["throughput_rps"], 50.0)
+        self.assertEqual(summary["endpoints"]["rides-create-and-assign"]["error_rate"], 1.0)
+        self.assertEqual(summary["endpoints"]["rides-create-and-assign"]["statuses"], {"0": 1, "500": 1})
+        self.assertEqual((summary["requests"], summary["errors"]), (102, 2))
+        self.assertIsNone(percentile([], 0.5))
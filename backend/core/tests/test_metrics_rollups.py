@@ -0,0 +1,147 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, RideMetricsRollup, RideRequest, User
+from core.services import metrics
+
+
+class MetricsRollupTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username="manager", password="manager", role=User.Role.MANAGER)
+        self.driver = User.objects.create_user(username="driver1", password="driver1", role=User.Role.DRIVER)
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        PoiEdge.objects.create(from_poi=self.reception, to_poi=self.beach_bar, travel_time_s=120)
+        self.buggy = Buggy.objects.create(
+            code="BUGGY_1",
+            display_name="Buggy #1",
+            status=Buggy.Status.ACTIVE,
+            current_poi=self.reception,
+            driver=self.driver,
+        )
+
+    def _create_ride(self):
+        self.client.force_authenticate(user=self.manager)
+        response = self.client.post(
+            "/api/rides/create-and-assign/",
+            {"pickup_poi_code": "RECEPTION", "dropoff_poi_code": "BEACH_BAR", "num_guests": 2},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return RideRequest.objects.get(id=response.data["ride"]["id"])
+
+    def _drive(self, ride):
+        self.client.force_authenticate(user=self.driver)
+        for stop in ride.route_stops.order_by("sequence_index"):
+            self.client.post(f"/api/driver/stops/{stop.id}/start/")
+            self.client.post(f"/api/driver/stops/{stop.id}/complete/")
+
+    def _rollup_rows(self):
+        return sorted(
+            RideMetricsRollup.objects.values_list(
+                "granularity", "bucket_start", "dimension", "dimension_id",
+                "requested_count", "assigned_count", "wait_count", "completed_count", "ride_duration_count",
+            )
+        )
+
+    def test_assignment_and_completion_update_rollups(self):
+        ride = self._create_ride()
+        self._create_ride()
+        self._drive(ride)
+
+        day = RideMetricsRollup.objects.get(
+            granularity=RideMetricsRollup.Granularity.DAY,
+            dimension=RideMetricsRollup.Dimension.BUGGY,
+            dimension_id=self.buggy.id,
+        )
+        self.assertEqual(day.assigned_count, 2)
+        self.assertEqual(day.wait_count, 2)
+        self.assertEqual(day.completed_count, 1)
+        self.assertEqual(day.ride_duration_count, 1)
+        self.assertEqual(
+            RideMetricsRollup.objects.filter(
+                granularity=RideMetricsRollup.Granularity.HOUR,
+                dimension=RideMetricsRollup.Dimension.POI,
+                dimension_id=self.reception.id,
+            ).get().assigned_count,
+            2,
+        )
+
+    def test_summary_reads_rollups_without_scanning_rides(self):
+        self._create_ride()
+        self._create_ride()
+
+        self.client.force_authenticate(user=self.manager)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/metrics/summary/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["date"], timezone.localdate().isoformat())
+        self.assertEqual(response.data["total_rides"], 2)
+        self.assertEqual(response.data["avg_wait_time_s"], 0)
+        self.assertFalse(any("core_riderequest" in q["sql"] for q in ctx.captured_queries))
+
+    def test_total_rides_matches_counting_requests_of_the_day(self):
+        self._create_ride()
+        with override_settings(RIDE_ASSIGNMENT_MODE="async"):
+            queued = self.client.post(
+                "/api/rides/create-and-assign/",
+                {"pickup_poi_code": "BEACH_BAR", "dropoff_poi_code": "RECEPTION", "num_guests": 1},
+            )
+        self.assertEqual(queued.status_code, status.HTTP_202_ACCEPTED)
+        self.client.post(
+            "/api/rides/bulk-create-and-assign/",
+            [{"pickup_poi_code": "RECEPTION", "dropoff_poi_code": "BEACH_BAR", "num_guests": 1}] * 2,
+            format="json",
+        )
+        Buggy.objects.update(status=Buggy.Status.INACTIVE)
+        rejected = self.client.post(
+            "/api/rides/create-and-assign/",
+            {"pickup_poi_code": "RECEPTION", "dropoff_poi_code": "BEACH_BAR", "num_guests": 1},
+        )
+        self.assertEqual(rejected.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # what the summary counted before rollups: every ride requested today, pending ones included
+        baseline = RideRequest.objects.filter(requested_at__date=timezone.localdate()).count()
+        self.assertEqual(baseline, 4)
+        self.assertEqual(metrics.summarize(timezone.localdate())["total_rides"], baseline)
+
+        incremental = self._rollup_rows()
+        RideMetricsRollup.objects.all().delete()
+        metrics.rebuild_rollups()
+        self.assertEqual(self._rollup_rows(), incremental)
+
+    def test_summary_without_rides(self):
+        self.assertEqual(metrics.summarize(timezone.localdate()), {"total_rides": 0, "avg_wait_time_s": None})
+
+    def test_backfill_matches_incremental_rollups(self):
+        ride = self._create_ride()
+        self._create_ride()
+        self._drive(ride)
+        incremental = self._rollup_rows()
+
+        RideMetricsRollup.objects.all().delete()
+        call_command("rebuild_metrics_rollups", stdout=StringIO())
+        self.assertEqual(self._rollup_rows(), incremental)
+
+    def test_backfill_only_touches_requested_days(self):
+        old = RideRequest.objects.create(
+            pickup_poi=self.reception, dropoff_poi=self.beach_bar, num_guests=1, assigned_buggy=self.buggy
+        )
+        yesterday = timezone.now() - timedelta(days=1)
+        RideRequest.objects.filter(id=old.id).update(
+            requested_at=yesterday, assigned_at=yesterday + timedelta(seconds=30)
+        )
+        self._create_ride()
+        today_rows = self._rollup_rows()
+
+        metrics.rebuild_rollups(start=timezone.localdate(yesterday), end=timezone.localdate(yesterday))
+        summary = metrics.summarize(timezone.localdate(yesterday))
+        self.assertEqual(summary, {"total_rides": 1, "avg_wait_time_s": 30})
+        self.assertTrue(set(today_rows) <= set(self._rollup_rows()))
@@ -0,0 +1,148 @@
+import random
+from datetime import timedelta
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, POI, PoiEdge, RideMetricsSketch, RideRequest, User
+from core.services import metrics
+from core.services.sketches import DDSketch
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+class DDSketchTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.values = [rng.lognormvariate(4, 1) for _ in range(5000)]
+
+    def test_quantiles_within_relative_accuracy(self):
+        sketch = DDSketch()
+        sketch.extend(self.values)
+        for q in (0.5, 0.9, 0.99):
+            exact = exact_quantile(self.values, q)
+            self.assertLessEqual(abs(sketch.quantile(q) - exact), exact * 0.011)
+
+    def test_merge_matches_single_sketch(self):
+        whole = DDSketch()
+        whole.extend(self.values)
+        left, right = DDSketch(), DDSketch()
+        left.extend(self.values[:1234])
+        right.extend(self.values[1234:])
+        left.merge(right)
+        self.assertEqual(left.count, whole.count)
+        self.assertEqual(left.bins, whole.bins)
+        self.assertEqual(left.quantile(0.9), whole.quantile(0.9))
+
+    def test_serialization_round_trip_is_compact(self):
+        sketch = DDSketch()
+        sketch.extend(self.values)
+        sketch.add(0)
+        data = sketch.to_bytes()
+        self.assertLess(len(data), 1024)
+        restored = DDSketch.from_bytes(data)
+        self.assertEqual(restored.bins, sketch.bins)
+        self.assertEqual(restored.zero_count, 1)
+        self.assertEqual(restored.quantile(0.99), sketch.quantile(0.99))
+        self.assertIsNone(DDSketch.from_bytes(DDSketch().to_bytes()).quantile(0.5))
+
+    def test_rejects_mismatched_accuracy(self):
+        a, b = DDSketch(0.01), DDSketch(0.02)
+        b.add(1.0)
+        with self.assertRaises(ValueError):
+            a.merge(b)
+
+
+class MetricsPercentilesTests(APITestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username="manager", password="manager", role=User.Role.MANAGER)
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        PoiEdge.objects.create(from_poi=self.reception, to_poi=self.beach_bar, travel_time_s=120)
+        self.buggy = Buggy.objects.create(
+            code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=self.reception
+        )
+        self.client.force_authenticate(user=self.manager)
+        self.url = reverse("metrics-percentiles")
+
+    def _ride(self, pickup, requested_at, wait_s, pickup_wait_s, duration_s):
+        ride = RideRequest.objects.create(
+            pickup_poi=pickup,
+            dropoff_poi=self.beach_bar,
+            num_guests=1,
+            assigned_buggy=self.buggy,
+            status=RideRequest.Status.COMPLETED,
+        )
+        ride.requested_at = requested_at
+        ride.assigned_at = requested_at + timedelta(seconds=wait_s)
+        ride.pickup_completed_at = requested_at + timedelta(seconds=pickup_wait_s)
+        ride.dropoff_completed_at = ride.pickup_completed_at + timedelta(seconds=duration_s)
+        ride.save()
+        return ride
+
+    def test_live_recording_matches_rebuild(self):
+        now = timezone.now()
+        for wait in range(1, 101):
+            ride = self._ride(self.reception, now, wait, wait * 10, 300)
+            metrics.record_assignments([ride])
+            metrics.record_pickup(ride)
+            metrics.record_completion(ride)
+        live = metrics.percentiles(now - timedelta(hours=1), now + timedelta(hours=1))
+
+        metrics.rebuild_rollups()
+        rebuilt = metrics.percentiles(now - timedelta(hours=1), now + timedelta(hours=1))
+        self.assertEqual(live, rebuilt)
+
+        self.assertEqual(live["assignment_wait"]["count"], 100)
+        self.assertAlmostEqual(live["assignment_wait"]["p50"], 50, delta=1)
+        self.assertAlmostEqual(live["assignment_wait"]["p99"], 99, delta=1.5)
+        self.assertAlmostEqual(live["pickup_wait"]["p90"], 900, delta=10)
+        self.assertAlmostEqual(live["ride_duration"]["p50"], 300, delta=3)
+        self.assertEqual(RideMetricsSketch.objects.filter(metric=RideMetricsSketch.Metric.ASSIGNMENT_WAIT).count(), 1)
+
+    def test_endpoint_merges_hours_and_filters_by_poi(self):
+        start = metrics.day_bucket(timezone.localdate() - timedelta(days=1))
+        for hour in range(3):
+            for _ in range(10):
+                self._ride(self.reception, start + timedelta(hours=hour), 60 * (hour + 1), 600, 120)
+        self._ride(self.beach_bar, start, 5, 10, 60)
+        metrics.rebuild_rollups()
+
+        response = self.client.get(self.url, {"from": start.isoformat(), "to": (start + timedelta(hours=2)).isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["assignment_wait"]["count"], 21)
+
+        day = start.date().isoformat()
+        response = self.client.get(self.url, {"from": day, "to": day, "poi": "reception"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)  # to is exclusive: an empty window
+
+        next_day = (start.date() + timedelta(days=1)).isoformat()
+        response = self.client.get(self.url, {"from": day, "to": next_day, "poi": "reception"})
+        self.assertEqual(response.data["poi"], "RECEPTION")
+        waits = response.data["assignment_wait"]
+        self.assertEqual(waits["count"], 30)
+        self.assertAlmostEqual(waits["p50"], 120, delta=2)
+        self.assertAlmostEqual(waits["p99"], 180, delta=2)
+
+    def test_defaults_to_today_and_validates_input(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["ride_duration"], {"count": 0, "p50": None, "p90": None, "p99": None})
+
+        self.assertEqual(self.client.get(self.url, {"from": "yesterday"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {"from": "2026-02-30"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(self.url, {"from": "2026-03-02", "to": "2026-03-01"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(
+            self.client.get(self.url, {"from": "2026-03-01", "to": "2026-03-01"}).status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(self.client.get(self.url, {"poi": "NOWHERE"}).status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,123 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password as django_check_password
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import User
+from core.services import passwords
+
+
+class PasswordPoolTests(TestCase):
+    def tearDown(self):
+        passwords.shutdown()
+
+    @override_settings(PASSWORD_HASH_POOL_SIZE=0)
+    def test_inline_hashing_round_trip(self):
+        encoded = passwords.make_password("s3cret")
+        self.assertTrue(passwords.check_password("s3cret", encoded))
+        self.assertFalse(passwords.check_password("wrong", encoded))
+
+    @override_settings(PASSWORD_HASH_POOL_SIZE=1)
+    def test_pool_hashes_are_compatible_with_django(self):
+        encoded = passwords.make_password("s3cret")
+        self.assertTrue(django_check_password("s3cret", encoded))
+        self.assertTrue(passwords.check_password("s3cret", encoded))
+        self.assertFalse(passwords.check_password("wrong", encoded))
+
+    def test_must_update_detects_outdated_hashes(self):
+        current = passwords.make_password("s3cret")
+        self.assertFalse(passwords.must_update(current))
+        self.assertTrue(passwords.must_update("pbkdf2_sha256$1000$salt$hash"))
+
+
+@override_settings(PASSWORD_HASH_POOL_SIZE=0)
+class LoginAdmissionTests(APITestCase):
+    def setUp(self):
+        User.objects.create_user(username="driver1", password="driver1", role=User.Role.DRIVER)
+        self.manager = User.objects.create_user(username="manager", password="manager", role=User.Role.MANAGER)
+
+    def _login(self, password="driver1"):
+        return self.client.post("/api/auth/login/", {"username": "driver1", "password": password})
+
+    def test_login_succeeds_and_rejects_bad_password(self):
+        self.assertEqual(self._login().status_code, status.HTTP_200_OK)
+        self.assertEqual(self._login("nope").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(LOGIN_ADMISSION_TIMEOUT_S=0.01)
+    def test_login_over_capacity_returns_429(self):
+        slots = threading.BoundedSemaphore(1)
+        with mock.patch.object(passwords, "_login_slots", slots):
+            slots.acquire()
+            try:
+                response = self._login()
+            finally:
+                slots.release()
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response["Retry-After"], "1")
+            self.assertEqual(self._login().status_code, status.HTTP_200_OK)
+
+    @override_settings(PASSWORD_HASH_POOL_SIZE=1)
+    def test_hash_timeout_returns_503_and_recycles_the_pool(self):
+        executor = mock.Mock()
+        future = executor.submit.return_value
+        future.result.side_effect = FutureTimeoutError
+        with mock.patch.object(passwords, "_executor", executor):
+            response = self._login()
+            self.assertIsNone(passwords._executor)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "5")
+        future.cancel.assert_called_once_with()
+        executor.shutdown.assert_called_once_with(wait=False, cancel_futures=False)
+
+    @override_settings(PASSWORD_HASH_POOL_SIZE=1)
+    def test_timeout_keeps_a_pool_another_call_already_replaced(self):
+        stale, fresh = mock.Mock(), mock.Mock()
+        stale.submit.return_value.result.side_effect = FutureTimeoutError
+
+        def replaced():
+            passwords._executor = fresh  # another login recycled the pool meanwhile
+            return stale
+
+        with mock.patch.object(passwords, "_executor", None), \
+                mock.patch.object(passwords, "_get_executor", side_effect=replaced):
+            self.assertEqual(self._login().status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertIs(passwords._executor, fresh)
+        stale.shutdown.assert_not_called()
+        fresh.shutdown.assert_not_called()
+
+    @override_settings(PASSWORD_HASH_POOL_SIZE=1)
+    def test_submit_to_a_recycled_pool_returns_503(self):
+        executor = mock.Mock()
+        executor.submit.side_effect = RuntimeError("cannot schedule new futures after shutdown")
+        with mock.patch.object(passwords, "_executor", executor):
+            response = self._login()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.data["code"], "LOGIN_UNAVAILABLE")
+
+    @override_settings(PASSWORD_HASH_POOL_SIZE=1)
+    def test_driver_create_and_update_return_503_on_hash_timeout(self):
+        self.client.force_authenticate(user=self.manager)
+        driver = User.objects.get(username="driver1")
+        with mock.patch.object(passwords, "make_password", side_effect=passwords.HashTimeout):
+            created = self.client.post("/api/manager/drivers/", {"username": "driver2", "password": "pw-driver2"})
+            updated = self.client.put(f"/api/manager/drivers/{driver.id}/", {"password": "pw-new"})
+        for response in (created, updated):
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response["Retry-After"], "5")
+            self.assertEqual(response.data["code"], "HASH_UNAVAILABLE")
+        self.assertFalse(User.objects.filter(username="driver2").exists())
+        self.assertTrue(User.objects.get(pk=driver.pk).check_password("driver1"))
+
+    def test_driver_passwords_are_hashed_through_the_pool(self):
+        self.client.force_authenticate(user=self.manager)
+        with mock.patch.object(passwords, "make_password", wraps=passwords.make_password) as make_password:
+            response = self.client.post(
+                "/api/manager/drivers/", {"username": "driver2", "password": "pw-driver2"}
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        make_password.assert_called_once_with("pw-driver2")
+        self.assertTrue(User.objects.get(username="driver2").check_password("pw-driver2"))
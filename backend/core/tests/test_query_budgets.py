@@ -0,0 +1,195 @@
+import logging
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core import querycount, urls as core_urls
+from core.authentication import ClaimsTokenObtainPairSerializer
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, RideRequest, User
+from core.querycount import QueryBudgetExceeded, fingerprint, query_budget, record_queries
+from core.services.graph import get_graph
+
+
+class QueryBudgetTests(APITestCase):
+    """Run every route once against a small fleet and hold it to its declared budget."""
+
+    N_BUGGIES = 6
+
+    def setUp(self):
+        self.manager = User.objects.create_user(username="manager", password="manager", role=User.Role.MANAGER)
+        self.dispatcher = User.objects.create_user(
+            username="dispatcher", password="dispatcher", role=User.Role.DISPATCHER
+        )
+        self.driver = User.objects.create_user(username="driver1", password="driver1", role=User.Role.DRIVER)
+        self.spare_driver = User.objects.create_user(username="driver2", password="driver2", role=User.Role.DRIVER)
+
+        self.pois = [POI.objects.create(code=f"POI_{i}", name=f"POI {i}") for i in range(5)]
+        self.edges = [
+            PoiEdge.objects.create(from_poi=a, to_poi=b, travel_time_s=60)
+            for a, b in zip(self.pois, self.pois[1:])
+        ]
+        self.buggies = [
+            Buggy.objects.create(
+                code=f"BUGGY_{i}",
+                display_name=f"Buggy #{i}",
+                status=Buggy.Status.ACTIVE,
+                current_poi=self.pois[i % len(self.pois)],
+                driver=self.driver if i == 0 else None,
+            )
+            for i in range(self.N_BUGGIES)
+        ]
+        get_graph(force_reload=True)
+
+        self.login(self.dispatcher)
+        for i in range(self.N_BUGGIES):
+            self.client.post(
+                reverse("rides-create-and-assign"),
+                {"pickup_poi_code": f"POI_{i % 5}", "dropoff_poi_code": "POI_4", "num_guests": 1},
+                format="json",
+            )
+
+    def login(self, user):
+        token = ClaimsTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def request(self, url_name, method="get", args=None, data=None, expected=status.HTTP_200_OK):
+        with query_budget(url_name) as stats:
+            response = getattr(self.client, method)(reverse(url_name, args=args), data, format="json")
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, expected, getattr(response, "data", None))
+        return stats
+
+    def test_every_route_declares_a_budget(self):
+        names = {p.name for p in core_urls.urlpatterns}
+        self.assertNotIn(None, names)
+        self.assertEqual(names - set(querycount.QUERY_BUDGETS), set())
+
+    def test_read_endpoints(self):
+        self.client.credentials()
+        self.request("healthz")
+        self.login(self.dispatcher)
+        for name in (
+            "auth-me", "pois-list", "pois-next-available", "buggies-list", "rides-list",
+            "metrics-summary", "metrics-percentiles",
+        ):
+            self.request(name)
+        self.request("rides-quote", data={"pickup_poi_code": "POI_1", "dropoff_poi_code": "POI_3", "num_guests": 2})
+        self.login(self.driver)
+        self.request("driver-my-route")
+        self.login(self.manager)
+        self.request("export", args=["rides", "csv"])
+        self.request("manager-driver-list")
+        self.request("manager-poi-edge-list")
+
+    def test_assignment_endpoints(self):
+        self.login(self.dispatcher)
+        stats = self.request(
+            "rides-create-and-assign",
+            "post",
+            data={"pickup_poi_code": "POI_0", "dropoff_poi_code": "POI_3", "num_guests": 2},
+            expected=status.HTTP_201_CREATED,
+        )
+        # Routes for the whole fleet come from a single query.
+        self.assertEqual([n for _, n in stats.repeated() if n >= self.N_BUGGIES], [])
+
+        payload = [{"pickup_poi_code": "POI_1", "dropoff_poi_code": "POI_2", "num_guests": 1}] * 10
+        self.request("rides-bulk-create-and-assign", "post", data=payload, expected=status.HTTP_201_CREATED)
+
+        response = self.client.post(
+            reverse("rides-create-and-assign"),
+            {"pickup_poi_code": "POI_0", "dropoff_poi_code": "POI_3", "num_guests": 2},
+            format="json", HTTP_PREFER="respond-async",
+        )
+        self.request("rides-assignment-status", args=[response.data["code"]])
+
+    def test_driver_endpoints(self):
+        self.login(self.driver)
+        stop = BuggyRouteStop.objects.filter(buggy=self.buggies[0]).order_by("sequence_index").first()
+        self.request("driver-stop-start", "post", args=[stop.id])
+        self.request("driver-stop-complete", "post", args=[stop.id])
+        following = BuggyRouteStop.objects.filter(buggy=self.buggies[0]).order_by("sequence_index")[1]
+        actions = [
+            {"stop_id": following.id, "action": "start"},
+            {"stop_id": following.id, "action": "complete"},
+        ]
+        self.request("driver-sync", "post", data={"actions": actions})
+
+    def test_manager_endpoints(self):
+        self.login(self.manager)
+        self.request(
+            "manager-buggy-list", "post", data={"code": "BUGGY_NEW", "display_name": "New"},
+            expected=status.HTTP_201_CREATED,
+        )
+        new_buggy = Buggy.objects.get(code="BUGGY_NEW")
+        self.request("manager-buggy-detail", "put", args=[new_buggy.id], data={"display_name": "Renamed"})
+        self.request("manager-buggy-detail", "delete", args=[new_buggy.id], expected=status.HTTP_204_NO_CONTENT)
+
+        self.request(
+            "manager-driver-list", "post", data={"username": "driver3", "password": "pw"},
+            expected=status.HTTP_201_CREATED,
+        )
+        self.request("manager-driver-detail", "put", args=[self.spare_driver.id], data={"first_name": "Sam"})
+        self.request(
+            "manager-driver-detail", "delete", args=[self.spare_driver.id], expected=status.HTTP_204_NO_CONTENT
+        )
+
+        self.request(
+            "manager-poi-list", "post", data={"code": "spa", "name": "Spa"}, expected=status.HTTP_201_CREATED
+        )
+        spa = POI.objects.get(code="SPA")
+        self.request("manager-poi-detail", "put", args=[spa.id], data={"name": "Spa & Wellness"})
+
+        self.request(
+            "manager-poi-edge-list", "post",
+            data={"from_poi_id": spa.id, "to_poi_id": self.pois[0].id, "travel_time_s": 30},
+            expected=status.HTTP_201_CREATED,
+        )
+        edge = PoiEdge.objects.get(to_poi=spa)
+        self.request("manager-poi-edge-detail", "put", args=[edge.id], data={"travel_time_s": 45})
+        self.request("manager-poi-edge-detail", "delete", args=[edge.id], expected=status.HTTP_204_NO_CONTENT)
+        self.request("manager-poi-detail", "delete", args=[spa.id], expected=status.HTTP_204_NO_CONTENT)
+
+
+class QueryCountToolsTests(APITestCase):
+    def test_fingerprint_collapses_literals_and_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "code" = \'X\' LIMIT 21'),
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s) AND "code" = \'Y\'  LIMIT 5'),
+        )
+
+    def test_budget_failure_lists_repeated_queries(self):
+        POI.objects.create(code="A", name="A")
+        with self.assertRaises(QueryBudgetExceeded) as ctx:
+            with query_budget("pois-list", budget=1):
+                for _ in range(3):
+                    list(POI.objects.filter(code="A"))
+        self.assertIn("3 queries (budget 1)", str(ctx.exception))
+        self.assertIn("3x SELECT", str(ctx.exception))
+
+    def test_record_queries_counts_and_times(self):
+        with record_queries() as stats:
+            RideRequest.objects.count()
+            RideRequest.objects.count()
+        self.assertEqual(stats.count, 2)
+        self.assertGreater(stats.duration_s, 0)
+        self.assertEqual(len(stats.repeated()), 1)
+
+    def test_runtime_logging_is_opt_in(self):
+        user = User.objects.create_user(username="m", password="m")
+        tight_budget = mock.patch.dict(querycount.QUERY_BUDGETS, {"pois-list": 0})
+
+        with tight_budget, self.assertNoLogs("core.querycount", logging.WARNING):
+            self.client.force_authenticate(user=user)
+            self.client.get(reverse("pois-list"))
+
+        client = self.client_class()  # middleware is loaded on a client's first request
+        client.force_authenticate(user=user)
+        with tight_budget, override_settings(QUERY_BUDGET_LOGGING=True), \
+                self.assertLogs("core.querycount", logging.WARNING) as logs:
+            client.get(reverse("pois-list"))
+        self.assertIn("Query budget exceeded: GET /api/pois/", logs.output[0])
+        self.assertIn("pois-list: 1 queries (budget 0)", logs.output[0])
@@ -0,0 +1,165 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, RideRequest, User
+from core.services.graph import get_graph
+
+# Read whole by design (the routing graph is cached per process).
+FULL_SCAN_ALLOWED = {"core_poi", "core_poiedge"}
+
+SQLITE_SCAN = re.compile(r"\bSCAN (?:TABLE )?(\w+)( USING)?")
+POSTGRES_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+def full_scans(sql):
+    """Tables the planner would read sequentially for ``sql``."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+        plan = "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+    if connection.vendor == "sqlite":
+        return {m.group(1) for m in SQLITE_SCAN.finditer(plan) if not m.group(2)}
+    return set(POSTGRES_SEQ_SCAN.findall(plan))
+
+
+class HotQueryPlanTests(APITestCase):
+    """
+    EXPLAIN every SELECT issued by the hot endpoints against a seeded history
+    and fail on sequential scans, so a dropped index or a rewritten filter
+    that can no longer use one shows up here.
+    """
+
+    N_POIS = 40
+    N_BUGGIES = 300
+    N_ACTIVE = 8
+    N_HISTORY_RIDES = 6000
+
+    @classmethod
+    def setUpTestData(cls):
+        pois = POI.objects.bulk_create(
+            [POI(code=f"POI_{i}", name=f"POI {i}") for i in range(cls.N_POIS)]
+        )
+        PoiEdge.objects.bulk_create(
+            [PoiEdge(from_poi=a, to_poi=b, travel_time_s=60) for a, b in zip(pois, pois[1:])]
+        )
+        cls.driver = User.objects.create_user(username="driver1", password="driver1", role=User.Role.DRIVER)
+        cls.dispatcher = User.objects.create_user(
+            username="dispatcher", password="dispatcher", role=User.Role.DISPATCHER
+        )
+        buggies = Buggy.objects.bulk_create([
+            Buggy(
+                code=f"BUGGY_{i}",
+                display_name=f"Buggy #{i}",
+                status=Buggy.Status.ACTIVE if i < cls.N_ACTIVE else Buggy.Status.INACTIVE,
+                current_poi=pois[i % cls.N_POIS],
+            )
+            for i in range(cls.N_BUGGIES)
+        ])
+        cls.buggy = buggies[0]
+        Buggy.objects.filter(pk=cls.buggy.pk).update(driver=cls.driver)
+
+        now = timezone.now()
+        rides = RideRequest.objects.bulk_create([
+            RideRequest(
+                public_code=f"H{i:07d}",
+                pickup_poi=pois[i % cls.N_POIS],
+                dropoff_poi=pois[(i + 3) % cls.N_POIS],
+                num_guests=2,
+                status=RideRequest.Status.COMPLETED,
+                assigned_buggy=buggies[i % cls.N_BUGGIES],
+                assigned_at=now,
+                pickup_completed_at=now,
+                dropoff_completed_at=now,
+            )
+            for i in range(cls.N_HISTORY_RIDES)
+        ])
+        next_index = {}
+        stops = []
+        for ride in rides:
+            for stop_type, poi_id in ((BuggyRouteStop.StopType.PICKUP, ride.pickup_poi_id),
+                                      (BuggyRouteStop.StopType.DROPOFF, ride.dropoff_poi_id)):
+                index = next_index.get(ride.assigned_buggy_id, 0)
+                next_index[ride.assigned_buggy_id] = index + 1
+                stops.append(BuggyRouteStop(
+                    buggy_id=ride.assigned_buggy_id,
+                    ride_request=ride,
+                    stop_type=stop_type,
+                    poi_id=poi_id,
+                    sequence_index=index,
+                    status=BuggyRouteStop.StopStatus.COMPLETED,
+                    completed_at=now,
+                ))
+        BuggyRouteStop.objects.bulk_create(stops, batch_size=2000)
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        get_graph(force_reload=True)  # bulk_create skips the signals that reset the cache
+
+    def assertNoFullScans(self, ctx):
+        selects = [q["sql"] for q in ctx.captured_queries if q["sql"].lstrip().upper().startswith("SELECT")]
+        self.assertTrue(selects)
+        for sql in selects:
+            scans = full_scans(sql) - FULL_SCAN_ALLOWED
+            self.assertFalse(scans, f"Sequential scan on {sorted(scans)} for:\n{sql}")
+
+    def _create_ride(self, pickup="POI_0", dropoff="POI_5"):
+        self.client.force_authenticate(user=self.dispatcher)
+        response = self.client.post(
+            reverse("rides-create-and-assign"),
+            {"pickup_poi_code": pickup, "dropoff_poi_code": dropoff, "num_guests": 2},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def test_ride_assignment(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._create_ride()
+        self.assertNoFullScans(ctx)
+
+    def test_bulk_ride_assignment(self):
+        self.client.force_authenticate(user=self.dispatcher)
+        payload = [{"pickup_poi_code": "POI_1", "dropoff_poi_code": "POI_2", "num_guests": 1}] * 3
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse("rides-bulk-create-and-assign"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNoFullScans(ctx)
+
+    def test_rides_list(self):
+        self.client.force_authenticate(user=self.dispatcher)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/rides/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNoFullScans(ctx)
+
+    def test_driver_route_and_stop_transitions(self):
+        # Queue enough rides that one lands on the driver's buggy.
+        for _ in range(self.N_ACTIVE):
+            self._create_ride(pickup="POI_0")
+        stop = (
+            BuggyRouteStop.objects.filter(buggy=self.buggy)
+            .exclude(status=BuggyRouteStop.StopStatus.COMPLETED)
+            .order_by("sequence_index")
+            .first()
+        )
+        self.assertIsNotNone(stop)
+
+        self.client.force_authenticate(user=self.driver)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get("/api/driver/my-route/").status_code, status.HTTP_200_OK)
+            response = self.client.post(reverse("driver-stop-start", args=[stop.id]))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.post(reverse("driver-stop-complete", args=[stop.id]))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNoFullScans(ctx)
+
+    def test_detects_sequential_scans(self):
+        sql = str(BuggyRouteStop.objects.filter(completed_at__isnull=False).values("id").query)
+        self.assertIn("core_buggyroutestop", full_scans(sql))
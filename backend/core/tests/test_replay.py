@@ -0,0 +1,136 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, PoiEdgeVersion, RideRequest, RideRequestHistory
+from core.services import graph, replay
+from core.services.metrics import day_bucket
+from core.services.routing import DROPOFF_SERVICE_S, PICKUP_SERVICE_S
+
+
+class RideReplayTests(TestCase):
+    def setUp(self):
+        self.pois = [POI.objects.create(code=f"POI_{i}", name=f"POI {i}") for i in range(3)]
+        self.edges = [
+            PoiEdge.objects.create(from_poi=a, to_poi=b, travel_time_s=60)
+            for a, b in zip(self.pois, self.pois[1:])
+        ]
+        self.day = day_bucket(timezone.now() - timedelta(days=10))
+        PoiEdgeVersion.objects.update(valid_from=self.day - timedelta(days=30))
+
+        self.buggy = Buggy.objects.create(
+            code="B1", display_name="Buggy 1", status=Buggy.Status.ACTIVE, current_poi=self.pois[2]
+        )
+        self.ride = self._record("AAA111", hour=10, wait_s=300, ride_s=200)
+
+        # travel times have since gone up tenfold
+        for edge in self.edges:
+            edge.travel_time_s = 600
+            edge.save()
+        graph.get_graph(force_reload=True)
+
+    def _record(self, code, hour, wait_s, ride_s):
+        requested = self.day + timedelta(hours=hour)
+        ride = RideRequest.objects.create(
+            public_code=code, pickup_poi=self.pois[0], dropoff_poi=self.pois[2], num_guests=2,
+            status=RideRequest.Status.COMPLETED, assigned_buggy=self.buggy,
+        )
+        RideRequest.objects.filter(pk=ride.pk).update(
+            requested_at=requested,
+            assigned_at=requested,
+            pickup_completed_at=requested + timedelta(seconds=wait_s),
+            dropoff_completed_at=requested + timedelta(seconds=wait_s + ride_s),
+        )
+        return ride
+
+    def test_graph_as_of_follows_edge_history(self):
+        a, c = self.pois[0].id, self.pois[2].id
+        self.assertEqual(graph.graph_as_of(self.day).shortest_path(a, c).travel_time_s, 120)
+        self.assertEqual(graph.graph_as_of(timezone.now()).shortest_path(a, c).travel_time_s, 1200)
+        self.assertEqual(len(graph.graph_changes(self.day, timezone.now() + timedelta(seconds=1))), 2)  # one per edge
+
+        self.edges[0].delete()
+        self.assertNotIn(a, graph.graph_as_of(timezone.now()).adjacency)
+        self.assertIn(a, graph.graph_as_of(self.day).adjacency)
+
+    def test_replay_uses_the_graph_of_the_day(self):
+        result = replay.replay(self.day, self.day + timedelta(days=1), ["earliest_pickup"])
+        out = replay.report(result)
+
+        self.assertEqual(out["rides"], 1)
+        self.assertEqual(out["recorded"]["wait_s"]["p50"], 300)
+        [row] = out["per_ride"]
+        replayed = row["earliest_pickup"]
+        self.assertEqual(replayed["buggy"], "B1")
+        # starts at its first recorded pickup, and drives the old 60s edges
+        self.assertEqual(replayed["wait_s"], PICKUP_SERVICE_S)
+        self.assertEqual(replayed["ride_s"], 120 + DROPOFF_SERVICE_S)
+        self.assertEqual(replayed["wait_delta_s"], PICKUP_SERVICE_S - 300)
+        self.assertEqual(out["policies"]["earliest_pickup"]["rides_waiting_less"], 1)
+
+        # nothing written to the live database, and the live graph is back
+        self.assertEqual(list(RideRequest.objects.values_list("public_code", flat=True)), ["AAA111"])
+        self.assertFalse(BuggyRouteStop.objects.exists())
+        self.assertEqual(list(Buggy.objects.values_list("code", flat=True)), ["B1"])
+        self.assertEqual(graph.get_graph().shortest_path(self.pois[0].id, self.pois[2].id).travel_time_s, 1200)
+
+    def test_each_policy_runs_in_a_scratch_database(self):
+        seen = []
+        on_arrival = replay.ReplaySimulator._on_arrival
+
+        def probe(simulator, arrival):
+            seen.append((connection.settings_dict["NAME"], list(Buggy.objects.values_list("code", flat=True))))
+            on_arrival(simulator, arrival)
+
+        with mock.patch.object(replay.ReplaySimulator, "_on_arrival", probe):
+            replay.replay(self.day, self.day + timedelta(days=1), ["earliest_pickup", "earliest_dropoff"])
+        self.assertEqual(seen, [(":memory:", ["REPLAY_B1"])] * 2)
+        self.assertEqual(Buggy.objects.get().status, Buggy.Status.ACTIVE)
+
+    def test_archived_rides_are_replayed_and_deleted_pois_skipped(self):
+        self._record("BBB222", hour=11, wait_s=100, ride_s=200)
+        archived = RideRequest.objects.get(public_code="BBB222")
+        RideRequestHistory.objects.create(**{
+            f: getattr(archived, f) for f in [
+                "id", "public_code", "pickup_poi_id", "dropoff_poi_id", "num_guests", "status",
+                "assigned_buggy_id", "requested_at", "assigned_at", "pickup_completed_at", "dropoff_completed_at",
+            ]
+        })
+        archived.delete()
+        RideRequestHistory.objects.create(
+            id=999, public_code="GONE", pickup_poi_id=12345, dropoff_poi_id=self.pois[1].id, num_guests=1,
+            status=RideRequest.Status.COMPLETED, requested_at=self.day + timedelta(hours=12),
+        )
+
+        result = replay.replay(self.day, self.day + timedelta(days=1))
+        self.assertEqual([r.code for r in result.rides], ["AAA111", "BBB222"])
+        self.assertEqual(result.skipped, {"deleted_poi": 1, "unroutable": 0})
+        self.assertEqual(set(result.results), {"earliest_pickup", "earliest_dropoff"})
+        for sim in result.results.values():
+            self.assertEqual(len(sim.outcomes), 2)
+
+    def test_empty_range_is_an_error(self):
+        with self.assertRaises(replay.ReplayError):
+            replay.replay(self.day - timedelta(days=2), self.day - timedelta(days=1))
+
+    def test_command_writes_summary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "replay.json")
+            call_command(
+                "replay_rides", f"--from={timezone.localtime(self.day).date().isoformat()}",
+                "--policy=earliest_dropoff", "--summary-only", f"--output={path}",
+                stdout=StringIO(), stderr=StringIO(),
+            )
+            with open(path) as f:
+                out = json.load(f)
+        self.assertEqual(list(out["policies"]), ["earliest_dropoff"])
+        self.assertNotIn("per_ride", out)
+        self.assertIn("speedup", out["policies"]["earliest_dropoff"])
@@ -0,0 +1,100 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, RideRequest, User
+from core.services import graph, quotes, telemetry
+from core.services.routing import NoActiveBuggiesError, assign_ride_to_best_buggy
+
+
+def quote_lookups(result):
+    return telemetry.registry.values[telemetry.QUOTES.name].get((result,), 0)
+
+
+class QuoteTestMixin:
+    def setUp(self):
+        quotes.clear()
+        telemetry.registry.clear()
+        self.bel_air = POI.objects.create(code="BEL_AIR", name="Bel Air")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.beach_bar, travel_time_s=120)
+        PoiEdge.objects.create(from_poi=self.beach_bar, to_poi=self.reception, travel_time_s=240)
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.reception, travel_time_s=90)
+        self.buggy1 = Buggy.objects.create(
+            code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=self.bel_air
+        )
+        self.buggy2 = Buggy.objects.create(
+            code="BUGGY_2", display_name="Buggy #2", status=Buggy.Status.ACTIVE, current_poi=self.reception
+        )
+
+    def tearDown(self):
+        graph.invalidate()
+        quotes.clear()
+
+
+class QuoteTests(QuoteTestMixin, TestCase):
+    def test_ranks_buggies_like_assignment_without_writing(self):
+        with CaptureQueriesContext(connection) as ctx:
+            options = quotes.quote(self.beach_bar.id, self.reception.id, 2)
+        self.assertTrue(all(q["sql"].lstrip().upper().startswith("SELECT") for q in ctx.captured_queries))
+        self.assertFalse(RideRequest.objects.exists())
+
+        # Buggy #1: 120s to Beach Bar, 25s pickup, 210s to Reception via Bel Air
+        self.assertEqual(
+            [(q.buggy_code, q.pickup_eta_s, q.dropoff_eta_s) for q in options],
+            [("BUGGY_1", 120, 355), ("BUGGY_2", 210, 445)],
+        )
+        ride = RideRequest.objects.create(pickup_poi=self.beach_bar, dropoff_poi=self.reception, num_guests=2)
+        self.assertEqual(assign_ride_to_best_buggy(ride).id, options[0].buggy_id)
+
+    def test_repeated_quotes_are_cached_until_the_fleet_changes(self):
+        first = quotes.quote(self.beach_bar.id, self.reception.id, 2, k=1)
+        with self.assertNumQueries(1):  # the fleet's route versions only
+            self.assertEqual(quotes.quote(self.beach_bar.id, self.reception.id, 2, k=1), first)
+        self.assertEqual((quote_lookups("miss"), quote_lookups("hit")), (1, 1))
+
+        ride = RideRequest.objects.create(pickup_poi=self.bel_air, dropoff_poi=self.beach_bar, num_guests=2)
+        assign_ride_to_best_buggy(ride)
+        [after] = quotes.quote(self.beach_bar.id, self.reception.id, 2, k=1)
+        self.assertEqual(quote_lookups("miss"), 2)
+        self.assertEqual((after.buggy_code, after.pickup_eta_s), ("BUGGY_1", 170))  # after its new ride
+
+    def test_no_active_buggies(self):
+        Buggy.objects.update(status=Buggy.Status.INACTIVE)
+        with self.assertRaises(NoActiveBuggiesError):
+            quotes.quote(self.beach_bar.id, self.reception.id, 2)
+
+
+class QuoteViewTests(QuoteTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(
+            User.objects.create_user(username="dispatcher", password="dispatcher", role=User.Role.DISPATCHER)
+        )
+
+    def get(self, **params):
+        return self.client.get(reverse("rides-quote"), {"num_guests": 2, **params})
+
+    def test_returns_the_top_k_buggies(self):
+        response = self.get(pickup_poi_code="beach_bar", dropoff_poi_code="RECEPTION", k=1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {"quotes": [{"buggy": {"code": "BUGGY_1", "display_name": "Buggy #1"},
+                         "pickup_eta_s": 120, "dropoff_eta_s": 355}]},
+        )
+        self.assertFalse(BuggyRouteStop.objects.exists())
+
+    def test_rejects_unknown_pois_and_an_empty_fleet(self):
+        response = self.get(pickup_poi_code="NOWHERE", dropoff_poi_code="RECEPTION")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("pickup_poi_code", response.json())
+
+        Buggy.objects.update(status=Buggy.Status.INACTIVE)
+        response = self.get(pickup_poi_code="BEACH_BAR", dropoff_poi_code="RECEPTION")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["code"], "NO_ACTIVE_BUGGIES")
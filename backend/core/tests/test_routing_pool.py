@@ -0,0 +1,112 @@
+from unittest import mock
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.test import TestCase, override_settings
+
+from core.models import Buggy, POI, PoiEdge, RideRequest
+from core.services import graph, routing, routing_pool
+from core.services.routing import assign_rides_to_best_buggies, pickup_time_score, plan_greedy
+
+
+@override_settings(ROUTING_POOL_SIZE=1, ROUTING_POOL_MIN_WORK=0)
+class RoutingPoolTests(TestCase):
+    def setUp(self):
+        self.bel_air = POI.objects.create(code="BEL_AIR", name="Bel Air")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.beach_bar, travel_time_s=120)
+        self.slow = PoiEdge.objects.create(from_poi=self.beach_bar, to_poi=self.reception, travel_time_s=240)
+        PoiEdge.objects.create(from_poi=self.bel_air, to_poi=self.reception, travel_time_s=90)
+        self.buggy1 = Buggy.objects.create(
+            code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=self.bel_air
+        )
+        self.buggy2 = Buggy.objects.create(
+            code="BUGGY_2", display_name="Buggy #2", status=Buggy.Status.ACTIVE, current_poi=self.reception
+        )
+        self.states = [(self.buggy1.id, self.bel_air.id, 0, ()), (self.buggy2.id, self.reception.id, 0, ())]
+
+    def tearDown(self):
+        routing_pool.shutdown()
+
+    def test_pool_plans_match_inline_plans(self):
+        rides = [
+            (self.bel_air.id, self.beach_bar.id, 2),
+            (self.reception.id, self.bel_air.id, 2),
+            (self.beach_bar.id, self.reception.id, 2),
+        ]
+        inline = plan_greedy(graph.get_graph(), self.states, rides, pickup_time_score)
+        self.assertEqual(routing_pool.plan(self.states, rides, pickup_time_score), inline)
+        self.assertEqual(inline.choices, [0, 1, 0])
+
+    def test_bulk_assignment_goes_through_the_pool(self):
+        rides = [
+            RideRequest.objects.create(pickup_poi=self.bel_air, dropoff_poi=self.beach_bar, num_guests=2),
+            RideRequest.objects.create(pickup_poi=self.reception, dropoff_poi=self.bel_air, num_guests=2),
+        ]
+        with mock.patch.object(routing, "plan_greedy", side_effect=AssertionError("planned inline")):
+            buggies = assign_rides_to_best_buggies(rides)
+        self.assertEqual([b.code for b in buggies], ["BUGGY_1", "BUGGY_2"])
+
+    def test_planning_processes_pick_up_graph_changes(self):
+        ride = [(self.beach_bar.id, self.beach_bar.id, 1)]
+        self.assertEqual(routing_pool.plan(self.states, ride, pickup_time_score).choices, [0])  # 120s vs 210s
+
+        self.slow.travel_time_s = 30  # Reception -> Beach Bar now beats Bel Air -> Beach Bar
+        self.slow.save()
+        self.assertEqual(routing_pool.plan(self.states, ride, pickup_time_score).choices, [1])
+
+    def test_small_plans_and_unpicklable_scores_stay_inline(self):
+        self.assertTrue(routing_pool.should_offload(10, pickup_time_score))
+        self.assertFalse(routing_pool.should_offload(10, lambda sim: sim.total_time_s))
+        with override_settings(ROUTING_POOL_MIN_WORK=100):
+            self.assertFalse(routing_pool.should_offload(10, pickup_time_score))
+        with override_settings(ROUTING_POOL_SIZE=0):
+            self.assertFalse(routing_pool.should_offload(10, pickup_time_score))
+
+    def test_broken_pool_falls_back_to_inline(self):
+        with mock.patch.object(routing_pool.ProcessPoolExecutor, "submit", side_effect=BrokenProcessPool):
+            self.assertIsNone(routing_pool.plan(self.states, [(self.bel_air.id, self.beach_bar.id, 1)],
+                                                pickup_time_score))
+        self.assertIsNone(routing_pool._executor)
+
+    def test_timed_out_plan_recycles_the_pool_and_falls_back_to_inline(self):
+        executor = mock.Mock()
+        future = executor.submit.return_value
+        future.result.side_effect = FutureTimeoutError
+        with mock.patch.object(routing_pool, "_executor", executor):
+            self.assertIsNone(routing_pool.plan(self.states, [(self.bel_air.id, self.beach_bar.id, 1)],
+                                                pickup_time_score))
+            self.assertIsNone(routing_pool._executor)
+        future.cancel.assert_called_once_with()
+        executor.shutdown.assert_called_once_with(wait=False, cancel_futures=False)
+
+        ride = RideRequest.objects.create(pickup_poi=self.bel_air, dropoff_poi=self.beach_bar, num_guests=1)
+        with mock.patch.object(routing_pool, "_executor", executor):
+            [buggy] = assign_rides_to_best_buggies([ride])
+        self.assertEqual(buggy, self.buggy1)  # planned inline instead
+
+    def test_timeout_keeps_a_pool_another_call_already_replaced(self):
+        stale, fresh = mock.Mock(), mock.Mock()
+        stale.submit.return_value.result.side_effect = FutureTimeoutError
+
+        def replaced():
+            routing_pool._executor = fresh  # another plan recycled the pool meanwhile
+            return stale
+
+        with mock.patch.object(routing_pool, "_executor", None), \
+                mock.patch.object(routing_pool, "_get_executor", side_effect=replaced):
+            self.assertIsNone(routing_pool.plan(self.states, [(self.bel_air.id, self.beach_bar.id, 1)],
+                                                pickup_time_score))
+            self.assertIs(routing_pool._executor, fresh)
+        stale.shutdown.assert_not_called()
+        fresh.shutdown.assert_not_called()
+
+    def test_recycled_pool_falls_back_to_inline(self):
+        for error in (RuntimeError("cannot schedule new futures after shutdown"), CancelledError()):
+            executor = mock.Mock()
+            executor.submit.side_effect = error
+            with mock.patch.object(routing_pool, "_executor", executor):
+                self.assertIsNone(routing_pool.plan(self.states, [(self.bel_air.id, self.beach_bar.id, 1)],
+                                                    pickup_time_score))
+                self.assertIs(routing_pool._executor, executor)  # left to whoever recycled it
@@ -0,0 +1,116 @@
+import json
+import os
+import random
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, RideRequest
+from core.services import policies, simulation
+from core.services.graph import get_graph
+from core.services.routing import DROPOFF_SERVICE_S, PICKUP_SERVICE_S
+from core.services.simulation import Arrival, SimulationError
+
+
+class DispatchSimulationTests(TestCase):
+    def setUp(self):
+        self.pois = [POI.objects.create(code=f"POI_{i}", name=f"POI {i}") for i in range(4)]
+        for a, b in zip(self.pois, self.pois[1:]):
+            PoiEdge.objects.create(from_poi=a, to_poi=b, travel_time_s=60)
+        self.real_buggy = Buggy.objects.create(
+            code="REAL", display_name="Real", status=Buggy.Status.ACTIVE, current_poi=self.pois[0]
+        )
+        get_graph(force_reload=True)
+
+    def test_single_ride_timings(self):
+        a, b = self.pois[0], self.pois[2]
+        result = simulation.run_simulation(
+            [Arrival(t_s=100, pickup_poi_id=a.id, dropoff_poi_id=b.id, num_guests=2)],
+            fleet_size=1, start_poi_ids=[a.id],
+        )
+        [outcome] = result.outcomes
+        self.assertEqual(outcome.buggy_code, "SIM_000")
+        self.assertEqual(outcome.wait_s, PICKUP_SERVICE_S)  # already at the pickup
+        self.assertEqual(outcome.ride_s, 120 + DROPOFF_SERVICE_S)
+        self.assertEqual(result.busy_s, {"SIM_000": PICKUP_SERVICE_S + 120 + DROPOFF_SERVICE_S})
+
+    def test_queued_rides_wait_for_the_buggy(self):
+        a, d = self.pois[0], self.pois[3]
+        arrivals = [Arrival(t_s=0, pickup_poi_id=a.id, dropoff_poi_id=d.id, num_guests=1) for _ in range(2)]
+        result = simulation.run_simulation(arrivals, fleet_size=1, start_poi_ids=[a.id])
+        first, second = sorted(result.outcomes, key=lambda o: o.pickup_done_s)
+        # The second guest waits for the first round trip: 25 + 180 + 25 + 180 back + 25.
+        self.assertEqual(first.wait_s, 25)
+        self.assertEqual(second.wait_s, 25 + 180 + 25 + 180 + 25)
+
+    def test_day_leaves_nothing_behind_and_the_fleet_alone(self):
+        result = simulation.simulate_day(rides_per_hour=30, hours=range(8, 10), seed=3, fleet_size=2)
+        summary = simulation.summarize(result)
+
+        self.assertGreater(summary["rides"], 20)
+        self.assertEqual(summary["completed"], summary["rides"])
+        self.assertEqual(set(summary["utilization"]["per_buggy"]), {"SIM_000", "SIM_001"})
+        self.assertTrue(0 < summary["utilization"]["fleet"] <= 1)
+        self.assertGreaterEqual(summary["wait_s"]["p50"], PICKUP_SERVICE_S)
+        self.assertLessEqual(summary["wait_s"]["p50"], summary["wait_s"]["p99"])
+        self.assertEqual(summary["assignment_compute_ms"]["count"], summary["rides"])
+
+        self.assertFalse(RideRequest.objects.exists())
+        self.assertFalse(BuggyRouteStop.objects.exists())
+        self.assertEqual(list(Buggy.objects.values_list("code", "status")), [("REAL", Buggy.Status.ACTIVE)])
+
+    def test_runs_in_a_scratch_database(self):
+        seen = []
+
+        class Probe(simulation.Simulator):
+            def _on_arrival(self, arrival):
+                seen.append((connection.settings_dict["NAME"], list(Buggy.objects.values_list("code", flat=True))))
+                super()._on_arrival(arrival)
+
+        a, b = self.pois[0], self.pois[1]
+        simulation.run_simulation(
+            [Arrival(t_s=0, pickup_poi_id=a.id, dropoff_poi_id=b.id, num_guests=1)],
+            fleet_size=1, start_poi_ids=[a.id], simulator=Probe,
+        )
+        self.assertEqual(seen, [(":memory:", ["SIM_000"])])
+        self.assertNotEqual(connection.settings_dict["NAME"], ":memory:")
+        self.assertEqual(Buggy.objects.get(code="REAL").status, Buggy.Status.ACTIVE)
+
+    def test_arrivals_are_seeded_and_follow_the_profile(self):
+        pois = simulation.routable_pois()
+        profile = {"POI_1": [0.0] * 24}
+        profile["POI_1"][9] = 120.0
+        arrivals = simulation.generate_arrivals(profile, pois, random.Random(7))
+        self.assertEqual(arrivals, simulation.generate_arrivals(profile, pois, random.Random(7)))
+        self.assertTrue(80 < len(arrivals) < 160)
+        self.assertTrue(all(9 * 3600 <= a.t_s < 10 * 3600 for a in arrivals))
+        self.assertEqual({a.pickup_poi_id for a in arrivals}, {pois["POI_1"]})
+        self.assertNotIn(pois["POI_1"], {a.dropoff_poi_id for a in arrivals})
+
+        with self.assertRaises(SimulationError):
+            simulation.generate_arrivals({"NOWHERE": [1.0] * 24}, pois, random.Random(0))
+
+    def test_policies_are_interchangeable(self):
+        self.assertIn("earliest_dropoff", policies.POLICIES)
+        with self.assertRaises(policies.UnknownPolicyError):
+            policies.get_policy("fastest")
+
+        for name in policies.POLICIES:
+            result = simulation.simulate_day(rides_per_hour=20, hours=[9], seed=1, fleet_size=2, policy=name)
+            self.assertEqual(result.policy, name)
+            self.assertTrue(all(o.dropoff_done_s is not None for o in result.outcomes))
+
+    def test_command_writes_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sim.json")
+            call_command(
+                "simulate_dispatch", "--buggies=2", "--rides-per-hour=10", "--hours=9-11",
+                "--policy=earliest_dropoff", f"--output={path}", stdout=StringIO(), stderr=StringIO(),
+            )
+            with open(path) as f:
+                report = json.load(f)
+        self.assertEqual(report["policy"], "earliest_dropoff")
+        self.assertIn("p90", report["ride_time_s"])
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Buggy, BuggyRouteStop, POI, PoiEdge, PoiEdgeVersion, RideRequest, User
+from core.services import synthetic
+from core.services.graph import get_graph
+from core.services.metrics import day_bucket
+
+
+class SyntheticResortTests(TestCase):
+    spec = synthetic.ResortSpec(pois=60, buggies=6, drivers=5, active_ratio=0.5, days=3, rides_per_day=40)
+
+    def test_generates_connected_resort_with_history(self):
+        now = timezone.now()
+        out = synthetic.generate_resort(self.spec, chunk_size=50, now=now)
+
+        self.assertEqual((out.pois, out.drivers, out.buggies), (60, 5, 6))
+        self.assertEqual(out.rides, 3 * 40 + 3)  # history plus one open ride per active buggy
+        self.assertEqual(out.stops, 2 * out.rides)
+        self.assertEqual(PoiEdgeVersion.objects.count(), out.edges)
+        self.assertLess(out.edges, 3 * out.pois)  # sparse
+
+        graph = get_graph(force_reload=True)
+        ids = list(POI.objects.filter(code__startswith="SYN_").values_list("id", flat=True))
+        self.assertGreater(graph.shortest_path(ids[0], ids[-1]).travel_time_s, 0)
+        self.assertEqual({graph.shortest_path(ids[0], pk).poi_ids[-1] for pk in ids}, set(ids))
+
+        history = RideRequest.objects.filter(status=RideRequest.Status.COMPLETED)
+        self.assertEqual(history.count(), 120)
+        self.assertTrue(all(
+            day_bucket(now) - timedelta(days=3) <= r.requested_at < day_bucket(now) and
+            r.requested_at < r.pickup_completed_at < r.dropoff_completed_at
+            for r in history
+        ))
+        self.assertEqual(Buggy.objects.filter(status=Buggy.Status.ACTIVE).count(), 3)
+        self.assertEqual(
+            BuggyRouteStop.objects.exclude(status=BuggyRouteStop.StopStatus.COMPLETED).count(), 6
+        )
+        self.assertTrue(User.objects.get(username="syn_driver_0").check_password("synthetic"))
+
+    def test_same_seed_same_data_and_queries_by_batch(self):
+        def snapshot():
+            return (
+                sorted(PoiEdge.objects.values_list("from_poi__code", "to_poi__code", "travel_time_s")),
+                list(RideRequest.objects.order_by("public_code")
+                     .values_list("public_code", "pickup_poi__code", "assigned_buggy__code")),
+            )
+
+        now = timezone.now()
+        synthetic.generate_resort(self.spec, chunk_size=500, now=now)
+        first = snapshot()
+        synthetic.clear_resort("SYN")
+        self.assertFalse(POI.objects.exists())
+
+        bigger = synthetic.ResortSpec(**{**self.spec.__dict__, "rides_per_day": 400})
+        with CaptureQueriesContext(connection) as big:
+            synthetic.generate_resort(bigger, chunk_size=500, now=now)
+        # batches, not rows (SQLite caps each batch well below chunk_size)
+        self.assertLess(len(big), bigger.days * bigger.rides_per_day / 20)
+        synthetic.clear_resort("SYN")
+
+        synthetic.generate_resort(self.spec, chunk_size=500, now=now)
+        self.assertEqual(snapshot(), first)
+
+        with self.assertRaises(synthetic.SyntheticDataError):
+            synthetic.generate_resort(self.spec)
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            "generate_resort", "--pois=30", "--buggies=4", "--drivers=4", "--days=2", "--rides-per-day=10",
+            "--prefix=T1", "--with-metrics", stdout=out,
+        )
+        self.assertIn("Created 30 POIs", out.getvalue())
+        self.assertEqual(RideRequest.objects.count(), 20 + 3)
+        call_command(
+            "generate_resort", "--pois=30", "--buggies=4", "--drivers=4", "--days=2", "--rides-per-day=10",
+            "--prefix=T1", "--replace", stdout=StringIO(),
+        )
+        self.assertEqual(POI.objects.count(), 30)
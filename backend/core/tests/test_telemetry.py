@@ -0,0 +1,126 @@
+import json
+import os
+import re
+import tempfile
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core.models import Buggy, POI, PoiEdge, User
+from core.services import graph, telemetry
+
+
+def sample(text, name, **labels):
+    """Value of one sample line in Prometheus text output, or None."""
+    label_str = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    pattern = "^" + re.escape(name + (f"{{{label_str}}}" if labels else "")) + r" (\S+)$"
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+class PrometheusMetricsTests(APITestCase):
+    def setUp(self):
+        telemetry.registry.clear()
+        self.dispatcher = User.objects.create_user(
+            username="dispatcher", password="dispatcher", role=User.Role.DISPATCHER
+        )
+        self.reception = POI.objects.create(code="RECEPTION", name="Reception")
+        self.beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        PoiEdge.objects.create(from_poi=self.reception, to_poi=self.beach_bar, travel_time_s=120)
+        for i in range(3):
+            Buggy.objects.create(
+                code=f"BUGGY_{i}", display_name=f"Buggy #{i}", status=Buggy.Status.ACTIVE, current_poi=self.reception
+            )
+        self.client.force_authenticate(user=self.dispatcher)
+
+    def scrape(self, **extra):
+        response = self.client.get("/metrics", **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode()
+
+    def test_request_latency_queries_and_assignment_are_reported(self):
+        graph.invalidate()
+        for _ in range(2):
+            response = self.client.post(
+                reverse("rides-create-and-assign"),
+                {"pickup_poi_code": "RECEPTION", "dropoff_poi_code": "BEACH_BAR", "num_guests": 2},
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.client.get(reverse("pois-list"))
+
+        text = self.scrape()
+        view = {"view": "rides-create-and-assign", "method": "POST"}
+        self.assertEqual(sample(text, "buggy_http_request_duration_seconds_count", **view), 2)
+        self.assertEqual(sample(text, "buggy_http_request_duration_seconds_bucket", **view, le="+Inf"), 2)
+        self.assertEqual(
+            sample(text, "buggy_http_requests_total", view="rides-create-and-assign", method="POST", status="201"), 2
+        )
+        self.assertEqual(sample(text, "buggy_db_queries_per_request_bucket", view="pois-list", le="1"), 1)
+        self.assertGreater(sample(text, "buggy_db_time_per_request_seconds_sum", view="pois-list"), 0)
+
+        self.assertEqual(sample(text, "buggy_assignment_duration_seconds_count", mode="single"), 2)
+        self.assertEqual(sample(text, "buggy_assignment_candidates_bucket", le="5"), 2)
+        self.assertEqual(sample(text, "buggy_assignment_candidates_count"), 2)
+        self.assertLessEqual(sample(text, "buggy_assignment_candidates_sum"), 6)  # 3 buggies, some pruned
+        self.assertEqual(sample(text, "buggy_graph_cache_rebuilds_total"), 1)
+        self.assertGreater(sample(text, "buggy_graph_cache_hits_total"), 0)
+        self.assertIn("# TYPE buggy_http_request_duration_seconds histogram", text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        for value in (0.003, 0.02, 0.02, 30):
+            telemetry.observe(telemetry.ASSIGNMENT_DURATION, value, "bulk")
+        text = telemetry.render()
+        self.assertEqual(sample(text, "buggy_assignment_duration_seconds_bucket", mode="bulk", le="0.005"), 1)
+        self.assertEqual(sample(text, "buggy_assignment_duration_seconds_bucket", mode="bulk", le="0.025"), 3)
+        self.assertEqual(sample(text, "buggy_assignment_duration_seconds_bucket", mode="bulk", le="10"), 3)
+        self.assertEqual(sample(text, "buggy_assignment_duration_seconds_bucket", mode="bulk", le="+Inf"), 4)
+        self.assertAlmostEqual(sample(text, "buggy_assignment_duration_seconds_sum", mode="bulk"), 30.043)
+
+    def test_values_from_every_worker_file_are_summed(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(PROMETHEUS_METRICS_DIR=tmp):
+            telemetry.inc(telemetry.GRAPH_CACHE_HITS, amount=3)
+            telemetry.observe(telemetry.ASSIGNMENT_CANDIDATES, 4)
+            # Another worker's file, as its flush thread would have written it.
+            other = {
+                "buggy_graph_cache_hits_total": [[[], 5]],
+                "buggy_assignment_candidates": [[[], [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 9]]],
+            }
+            with open(os.path.join(tmp, "metrics_999999.json"), "w") as f:
+                json.dump(other, f)
+
+            text = self.scrape()
+            self.assertTrue(os.path.exists(os.path.join(tmp, f"metrics_{os.getpid()}.json")))
+
+        self.assertEqual(sample(text, "buggy_graph_cache_hits_total"), 8)
+        self.assertEqual(sample(text, "buggy_assignment_candidates_bucket", le="5"), 1)
+        self.assertEqual(sample(text, "buggy_assignment_candidates_bucket", le="10"), 2)
+        self.assertEqual(sample(text, "buggy_assignment_candidates_sum"), 13)
+
+    def test_exited_workers_are_folded_into_the_dead_file(self):
+        def worker_file(pid, hits):
+            with open(os.path.join(tmp, f"metrics_{pid}.json"), "w") as f:
+                json.dump({"buggy_graph_cache_hits_total": [[[], hits]]}, f)
+
+        with tempfile.TemporaryDirectory() as tmp, override_settings(PROMETHEUS_METRICS_DIR=tmp):
+            worker_file(999998, 5)
+            worker_file(999999, 2)
+            telemetry.mark_process_dead(999998)
+            telemetry.mark_process_dead(999999)
+            telemetry.mark_process_dead(999999)  # already folded
+            worker_file(999999, 1)  # a new worker reusing the pid
+            text = self.scrape()
+            files = set(os.listdir(tmp))
+
+            telemetry.clear_dir()
+            self.assertEqual(os.listdir(tmp), [".lock"])
+
+        self.assertEqual(sample(text, "buggy_graph_cache_hits_total"), 8)
+        self.assertEqual(files, {".lock", "metrics_999999.json", "metrics_dead.json", f"metrics_{os.getpid()}.json"})
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_optional_bearer_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("# HELP", self.scrape(HTTP_AUTHORIZATION="Bearer s3cret"))
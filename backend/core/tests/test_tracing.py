@@ -0,0 +1,103 @@
+import json
+import logging
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core import tracing
+from core.models import Buggy, POI, PoiEdge, User
+from core.services import graph
+
+
+def parse_server_timing(header):
+    timings = {}
+    for part in header.split(","):
+        name, dur = part.strip().split(";dur=")
+        timings[name] = float(dur)
+    return timings
+
+
+@override_settings(TRACING_ENABLED=True)
+class TracingTests(APITestCase):
+    def setUp(self):
+        self.dispatcher = User.objects.create_user(
+            username="dispatcher", password="dispatcher", role=User.Role.DISPATCHER
+        )
+        reception = POI.objects.create(code="RECEPTION", name="Reception")
+        beach_bar = POI.objects.create(code="BEACH_BAR", name="Beach Bar")
+        PoiEdge.objects.create(from_poi=reception, to_poi=beach_bar, travel_time_s=120)
+        Buggy.objects.create(code="BUGGY_1", display_name="Buggy #1", status=Buggy.Status.ACTIVE, current_poi=reception)
+        graph.invalidate()
+        self.client.force_authenticate(user=self.dispatcher)
+
+    def create_ride(self, **data):
+        payload = {"pickup_poi_code": "RECEPTION", "dropoff_poi_code": "BEACH_BAR", "num_guests": 2, **data}
+        response = self.client.post(reverse("rides-create-and-assign"), payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response
+
+    def test_server_timing_lists_assignment_phases(self):
+        timings = parse_server_timing(self.create_ride()["Server-Timing"])
+        self.assertEqual(
+            list(timings),
+            ["validate", "create", "assign", "load_fleet", "ranking_lookup", "load_routes", "score", "graph_load",
+             "write", "refresh_rankings", "serialize", "total"],
+        )
+        self.assertGreaterEqual(timings["total"], timings["assign"])
+        self.assertGreaterEqual(timings["assign"], timings["write"])
+
+    def test_placeholder_span_only_when_a_code_is_blank(self):
+        self.assertNotIn("placeholders", self.create_ride()["Server-Timing"])
+        self.assertIn("placeholders", self.create_ride(dropoff_poi_code="")["Server-Timing"])
+
+    @override_settings(TRACE_SAMPLE_RATE=1.0)
+    def test_sampled_requests_are_logged_as_json(self):
+        with self.assertLogs("core.tracing", logging.INFO) as logs:
+            self.create_ride()
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["view"], "rides-create-and-assign")
+        self.assertEqual(record["status"], 201)
+        self.assertEqual(len(record["trace_id"]), 32)
+        parents = {s["name"]: s["parent"] for s in record["spans"]}
+        self.assertIsNone(parents["assign"])
+        self.assertEqual(parents["score"], "assign")
+        self.assertEqual(parents["graph_load"], "score")
+
+    def test_unsampled_requests_are_not_logged(self):
+        with self.assertNoLogs("core.tracing", logging.INFO):
+            response = self.create_ride()
+        self.assertIn("Server-Timing", response)
+
+    @override_settings(TRACING_ENABLED=False)
+    def test_off_by_default(self):
+        client = self.client_class()  # middleware is loaded on a client's first request
+        client.force_authenticate(user=self.dispatcher)
+        response = client.post(
+            reverse("rides-create-and-assign"),
+            {"pickup_poi_code": "RECEPTION", "dropoff_poi_code": "BEACH_BAR", "num_guests": 1},
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Server-Timing", response)
+
+
+class SpanTests(SimpleTestCase):
+    def test_span_without_trace_is_a_shared_noop(self):
+        self.assertIsNone(tracing.current_trace())
+        self.assertIs(tracing.span("a"), tracing.span("b"))
+        with tracing.span("a") as record:
+            self.assertIsNone(record)
+
+    def test_repeated_spans_are_summed_in_the_header(self):
+        trace = tracing.Trace()
+        token = tracing._current.set(trace)
+        try:
+            for _ in range(3):
+                with tracing.span("graph load"):
+                    pass
+        finally:
+            tracing._current.reset(token)
+        self.assertEqual(len(trace.spans), 3)
+        header = tracing.server_timing(trace, 0.0015)
+        self.assertRegex(header, r"^graph_load;dur=\d+\.\d\d, total;dur=1\.50$")
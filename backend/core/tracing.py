@@ -0,0 +1,138 @@
+"""
+Request tracing: named spans around the phases of a request.
+
+TracingMiddleware opens a trace per request (when TRACING_ENABLED is on),
+code marks its phases with ``with span("name"):`` and the response gets a
+``Server-Timing`` header with the total time per span name. A sample of the
+requests (TRACE_SAMPLE_RATE) is also logged as one JSON object with every
+span, its parent and its offset, on the ``core.tracing`` logger.
+
+With tracing off there is no current trace, and ``span()`` costs one
+context-variable lookup and returns a shared no-op context manager.
+"""
+from __future__ import annotations
+import json
+import logging
+import random
+import time
+import uuid
+from contextlib import nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("core_trace", default=None)
+_NOOP = nullcontext()
+
+
+@dataclass
+class SpanRecord:
+    name: str
+    parent: Optional[str]
+    start_s: float  # offset from the start of the trace
+    duration_s: float = 0.0
+
+
+@dataclass
+class Trace:
+    trace_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    started: float = field(default_factory=time.perf_counter)
+    spans: List[SpanRecord] = field(default_factory=list)
+    stack: List[str] = field(default_factory=list)
+
+    def totals(self) -> Dict[str, float]:
+        """Seconds per span name, in first-seen order (repeated spans are summed)."""
+        out: Dict[str, float] = {}
+        for s in self.spans:
+            out[s.name] = out.get(s.name, 0.0) + s.duration_s
+        return out
+
+
+class _Span:
+    __slots__ = ("trace", "record", "t0")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.record = SpanRecord(
+            name=name, parent=trace.stack[-1] if trace.stack else None, start_s=0.0
+        )
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        self.record.start_s = self.t0 - self.trace.started
+        self.trace.stack.append(self.record.name)
+        self.trace.spans.append(self.record)
+        return self.record
+
+    def __exit__(self, *exc):
+        self.record.duration_s = time.perf_counter() - self.t0
+        self.trace.stack.pop()
+        return False
+
+
+def span(name: str):
+    """Time the enclosed block as ``name`` in the current trace, if there is one."""
+    trace = _current.get()
+    if trace is None:
+        return _NOOP
+    return _Span(trace, name)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def _token(name: str) -> str:
+    # Server-Timing metric names are HTTP tokens
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+
+
+def server_timing(trace: Trace, total_s: float) -> str:
+    parts = [f"{_token(name)};dur={seconds * 1000:.2f}" for name, seconds in trace.totals().items()]
+    parts.append(f"total;dur={total_s * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class TracingMiddleware:
+    """Trace each request; only installed when TRACING_ENABLED is on."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "TRACING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trace = Trace()
+        token = _current.set(trace)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_s = time.perf_counter() - trace.started
+
+        response["Server-Timing"] = server_timing(trace, total_s)
+        if random.random() < getattr(settings, "TRACE_SAMPLE_RATE", 0.0):
+            match = request.resolver_match
+            logger.info(json.dumps({
+                "trace_id": trace.trace_id,
+                "method": request.method,
+                "path": request.path,
+                "view": match.url_name if match else None,
+                "status": response.status_code,
+                "duration_ms": round(total_s * 1000, 3),
+                "spans": [
+                    {
+                        "name": s.name,
+                        "parent": s.parent,
+                        "start_ms": round(s.start_s * 1000, 3),
+                        "duration_ms": round(s.duration_s * 1000, 3),
+                    }
+                    for s in trace.spans
+                ],
+            }))
+        return response
@@ -2,16 +2,23 @@ from django.urls import path
 from core import views
 
 urlpatterns = [
-    path("healthz/", views.HealthCheckView.as_view()),
-    path("auth/me/", views.MeView.as_view()),
-    path("pois/", views.POIsListView.as_view()),
-    path("buggies/", views.BuggiesListView.as_view()),
-    path("rides/", views.RidesListView.as_view()),
+    path("healthz/", views.HealthCheckView.as_view(), name="healthz"),
+    path("auth/me/", views.MeView.as_view(), name="auth-me"),
+    path("pois/", views.POIsListView.as_view(), name="pois-list"),
+    path("pois/next-available/", views.POIsNextAvailableView.as_view(), name="pois-next-available"),
+    path("buggies/", views.BuggiesListView.as_view(), name="buggies-list"),
+    path("rides/", views.RidesListView.as_view(), name="rides-list"),
     path("rides/create-and-assign/", views.RideCreateAndAssignView.as_view(), name="rides-create-and-assign"),
-    path("driver/my-route/", views.DriverMyRouteView.as_view()),
+    path("rides/bulk-create-and-assign/", views.RideBulkCreateAndAssignView.as_view(), name="rides-bulk-create-and-assign"),
+    path("rides/quote/", views.RideQuoteView.as_view(), name="rides-quote"),
+    path("rides/<str:code>/assignment/", views.RideAssignmentStatusView.as_view(), name="rides-assignment-status"),
+    path("driver/my-route/", views.DriverMyRouteView.as_view(), name="driver-my-route"),
     path("driver/stops/<int:stop_id>/start/", views.DriverStopStartView.as_view(), name="driver-stop-start"),
     path("driver/stops/<int:stop_id>/complete/", views.DriverStopCompleteView.as_view(), name="driver-stop-complete"),
-    path("metrics/summary/", views.MetricsSummaryView.as_view()),
+    path("driver/sync/", views.DriverSyncView.as_view(), name="driver-sync"),
+    path("metrics/summary/", views.MetricsSummaryView.as_view(), name="metrics-summary"),
+    path("metrics/percentiles/", views.MetricsPercentilesView.as_view(), name="metrics-percentiles"),
+    path("exports/<slug:dataset>.<slug:fmt>", views.ExportView.as_view(), name="export"),
     
     # Manager CRUD endpoints
     path("manager/buggies/", views.BuggyCRUDView.as_view(), name="manager-buggy-list"),
@@ -1,23 +1,75 @@
 from rest_framework.views import APIView
 from rest_framework.generics import ListAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
-from django.db import models
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db import models, transaction
+from dataclasses import asdict
+from datetime import timedelta
 
-from core.models import Buggy, BuggyRouteStop, RideRequest, User, POI
+from core.models import AssignmentJob, Buggy, BuggyRouteStop, RideRequest, User, POI
 from core.serializers import (
     UserSerializer,
     BuggySummarySerializer,
-    BuggyRouteStopSerializer,
-    RideRequestSerializer,
+    RouteStopWithEtaSerializer,
+    RideWithEtaSerializer,
     RideRequestCreateSerializer,
-    RideWithAssignmentSerializer,
+    RideBulkCreateSerializer,
+    DriverSyncSerializer,
     POISerializer,
+    RideQuoteSerializer,
 )
-from core.services.routing import assign_ride_to_best_buggy, NoActiveBuggiesError
+from core import fast_serializers
+from core.authentication import get_assigned_buggy_id, get_role
+from core.renderers import FastJSONRenderer
+from core.tracing import span
+from core.services import (
+    assignment_queue, dispatch_table, driver_actions, eta, exports, metrics, passwords, quotes, telemetry,
+)
+from core.services.routing import (
+    assign_ride_to_best_buggy,
+    assign_rides_to_best_buggies,
+    AssignmentConflictError,
+    NoActiveBuggiesError,
+    bump_route_versions,
+    refresh_dispatch_rankings,
+)
+
+FAST_RENDERER_CLASSES = [FastJSONRenderer, BrowsableAPIRenderer]
+
+
+def _hash_unavailable(detail: str, code: str) -> Response:
+    """503 for a password hash that timed out in the hashing pool (passwords.HashTimeout)."""
+    return Response(
+        {"detail": detail, "code": code},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "5"},
+    )
+
+
+class LoginView(TokenObtainPairView):
+    """Obtain a JWT pair, with a cap on concurrent logins per worker."""
+
+    def post(self, request, *args, **kwargs):
+        try:
+            with passwords.login_slot():
+                return super().post(request, *args, **kwargs)
+        except passwords.LoginCapacityExceeded:
+            return Response(
+                {"detail": "Too many concurrent logins, please retry.", "code": "LOGIN_BUSY"},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={"Retry-After": "1"},
+            )
+        except passwords.HashTimeout:
+            return _hash_unavailable("Login is temporarily unavailable, please retry.", "LOGIN_UNAVAILABLE")
 
 
 class MeView(APIView):
@@ -35,24 +87,63 @@ class HealthCheckView(APIView):
         return Response({"status": "ok"})
 
 
-class POIsListView(ListAPIView):
+def prometheus_metrics(request):
+    """Prometheus text exposition, summed over all worker processes."""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(telemetry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+class FastListMixin:
+    """Render list endpoints through a precompiled row mapper instead of the DRF serializer."""
+    renderer_classes = FAST_RENDERER_CLASSES
+    row_mapper = None
+
+    def list(self, request, *args, **kwargs):
+        return Response(self.row_mapper.map_queryset(self.get_queryset()))
+
+
+class POIsListView(FastListMixin, ListAPIView):
     """List all Points of Interest in the resort."""
     permission_classes = [IsAuthenticated]
     serializer_class = POISerializer
+    row_mapper = fast_serializers.poi_mapper
     queryset = POI.objects.all().order_by('name')
 
 
-class BuggiesListView(ListAPIView):
+class POIsNextAvailableView(APIView):
+    """For each POI, the buggy that could be there first if a ride were requested now (dispatch table)."""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    def get(self, request):
+        return Response([
+            {
+                "poi": {"code": row["code"], "name": row["name"]},
+                "buggy": (
+                    {"code": row["buggy_code"], "display_name": row["buggy_display_name"]}
+                    if row["buggy_code"] else None
+                ),
+                "eta_s": row["eta_s"],
+            }
+            for row in dispatch_table.next_available()
+        ])
+
+
+class BuggiesListView(FastListMixin, ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = BuggySummarySerializer
+    row_mapper = fast_serializers.buggy_mapper
 
     def get_queryset(self):
         return Buggy.objects.select_related("current_poi")
 
 
-class RidesListView(ListAPIView):
+class RidesListView(FastListMixin, ListAPIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = RideRequestSerializer
+    serializer_class = RideWithEtaSerializer
+    row_mapper = fast_serializers.ride_mapper
 
     def get_queryset(self):
         return (
@@ -61,60 +152,192 @@ class RidesListView(ListAPIView):
             .order_by("-requested_at")[:100]
         )
 
+    def list(self, request, *args, **kwargs):
+        rows = self.row_mapper.map_queryset(self.get_queryset())
+        etas = eta.for_buggies({
+            row["assigned_buggy"]["id"] for row in rows
+            if row["assigned_buggy"] and row["status"] in eta.OPEN_RIDE_STATUSES
+        })
+        return Response(fast_serializers.add_ride_etas(rows, etas))
+
 
 class RideCreateAndAssignView(APIView):
     permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
 
     def post(self, request):
         serializer = RideRequestCreateSerializer(data=request.data, context={"request": request})
-        serializer.is_valid(raise_exception=True)
-        ride = serializer.save()
+        with span("validate"):
+            serializer.is_valid(raise_exception=True)
+        if assignment_queue.async_enabled(request):
+            return self._enqueue(serializer)
+        with span("create"):
+            ride = serializer.save()
 
         try:
-            buggy = assign_ride_to_best_buggy(ride)
+            with span("assign"):
+                buggy = assign_ride_to_best_buggy(ride)
         except NoActiveBuggiesError:
             ride.delete()
             return Response(
                 {"detail": "Cannot create ride: no active buggies.", "code": "NO_ACTIVE_BUGGIES"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        except AssignmentConflictError:
+            ride.delete()
+            return Response(
+                {"detail": "Cannot create ride: routes kept changing, try again.", "code": "ASSIGNMENT_CONFLICT"},
+                status=status.HTTP_409_CONFLICT,
+            )
 
-        out = RideWithAssignmentSerializer({"ride": ride, "assigned_buggy": buggy}).data
+        metrics.record_requests([ride])
+        with span("serialize"):
+            out = fast_serializers.ride_with_assignment_data(ride, buggy)
         return Response(out, status=status.HTTP_201_CREATED)
 
+    def _enqueue(self, serializer):
+        """Async mode: save the ride as PENDING, queue its assignment and answer 202."""
+        with span("create"), transaction.atomic():
+            ride = serializer.save()
+            job = assignment_queue.enqueue(ride)
+            metrics.record_requests([ride])
+        job.ride = ride
+        status_url = reverse("rides-assignment-status", args=[ride.public_code])
+        out = {
+            **assignment_queue.status_data(job),
+            "status_url": status_url,
+            "ride": fast_serializers.ride_mapper.map_instance(ride),
+        }
+        return Response(
+            out,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": status_url},
+        )
+
+
+class RideQuoteView(APIView):
+    """How soon the best buggies could serve a prospective ride, without creating it (read-only)."""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    def get(self, request):
+        serializer = RideQuoteSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        try:
+            options = quotes.quote(
+                params["pickup_poi_id"],
+                params["dropoff_poi_id"],
+                params["num_guests"],
+                k=params.get("k", quotes.DEFAULT_TOP_K),
+            )
+        except NoActiveBuggiesError:
+            return Response(
+                {"detail": "Cannot quote ride: no active buggies.", "code": "NO_ACTIVE_BUGGIES"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({
+            "quotes": [
+                {
+                    "buggy": {"code": q.buggy_code, "display_name": q.buggy_display_name},
+                    "pickup_eta_s": q.pickup_eta_s,
+                    "dropoff_eta_s": q.dropoff_eta_s,
+                }
+                for q in options
+            ],
+        })
+
+
+class RideAssignmentStatusView(APIView):
+    """Poll the outcome of an asynchronous assignment (see RideCreateAndAssignView)."""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    def get(self, request, code):
+        job = AssignmentJob.objects.select_related("ride").filter(ride__public_code=code).first()
+        if job is None:
+            return Response({"detail": "No queued assignment for this ride."}, status=status.HTTP_404_NOT_FOUND)
+        [ride] = fast_serializers.ride_mapper.map_queryset(RideRequest.objects.filter(pk=job.ride_id))
+        return Response(
+            {**assignment_queue.status_data(job), "ride": ride, "assigned_buggy": ride["assigned_buggy"]}
+        )
+
+
+class RideBulkCreateAndAssignView(APIView):
+    """Create and assign a batch of rides (group check-outs, transfers) in one transaction."""
+    permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    def post(self, request):
+        data = {"rides": request.data} if isinstance(request.data, list) else request.data
+        serializer = RideBulkCreateSerializer(data=data, context={"request": request})
+        with span("validate"):
+            serializer.is_valid(raise_exception=True)
+
+        try:
+            with transaction.atomic():
+                with span("create"):
+                    rides = serializer.save()
+                with span("assign"):
+                    buggies = assign_rides_to_best_buggies(rides)
+                metrics.record_requests(rides)
+        except NoActiveBuggiesError:
+            return Response(
+                {"detail": "Cannot create rides: no active buggies.", "code": "NO_ACTIVE_BUGGIES"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except AssignmentConflictError:
+            return Response(
+                {"detail": "Cannot create rides: routes kept changing, try again.", "code": "ASSIGNMENT_CONFLICT"},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        results = [
+            {"index": index, **fast_serializers.ride_with_assignment_data(ride, buggy)}
+            for index, (ride, buggy) in enumerate(zip(rides, buggies))
+        ]
+        return Response({"results": results}, status=status.HTTP_201_CREATED)
 
-class DriverMyRouteView(ListAPIView):
+
+class DriverMyRouteView(FastListMixin, ListAPIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = BuggyRouteStopSerializer
+    serializer_class = RouteStopWithEtaSerializer
+    row_mapper = fast_serializers.route_stop_mapper
 
     def get_queryset(self):
-        user = self.request.user
-        buggy = getattr(user, "assigned_buggy", None)
-        if not buggy:
+        # verified, not the token claim: a driver moved to another buggy must
+        # not keep reading (and acting on) the old buggy's route
+        buggy_id = get_assigned_buggy_id(self.request.user, verify=True)
+        if not buggy_id:
             return BuggyRouteStop.objects.none()
         return (
             BuggyRouteStop.objects
-            .filter(buggy=buggy)
+            .filter(buggy_id=buggy_id)
             .exclude(status=BuggyRouteStop.StopStatus.COMPLETED)
             .select_related("poi", "ride_request")
             .order_by("sequence_index")
         )
 
+    def list(self, request, *args, **kwargs):
+        rows = self.row_mapper.map_queryset(self.get_queryset())
+        buggy_id = get_assigned_buggy_id(request.user, verify=True)
+        etas = eta.for_buggies([buggy_id]).get(buggy_id) if rows else None
+        return Response(fast_serializers.add_stop_etas(rows, etas))
+
 
 class DriverStopStartView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, stop_id):
-        user = request.user
-        buggy = getattr(user, "assigned_buggy", None)
-        if not buggy:
+        buggy_id = get_assigned_buggy_id(request.user, verify=True)
+        if not buggy_id:
             return Response({"detail": "No buggy assigned"}, status=status.HTTP_403_FORBIDDEN)
 
-        stop = get_object_or_404(BuggyRouteStop, id=stop_id, buggy=buggy)
+        stop = get_object_or_404(BuggyRouteStop.objects.select_related("ride_request"), id=stop_id, buggy_id=buggy_id)
 
         first = (
             BuggyRouteStop.objects
-            .filter(buggy=buggy)
+            .filter(buggy_id=buggy_id)
             .exclude(status=BuggyRouteStop.StopStatus.COMPLETED)
             .order_by("sequence_index")
             .first()
@@ -125,13 +348,7 @@ class DriverStopStartView(APIView):
         if stop.status != BuggyRouteStop.StopStatus.PLANNED:
             return Response({"detail": "Stop is not in PLANNED status"}, status=status.HTTP_400_BAD_REQUEST)
 
-        stop.status = BuggyRouteStop.StopStatus.ON_ROUTE
-        stop.save(update_fields=["status"])
-
-        ride = stop.ride_request
-        if stop.stop_type == BuggyRouteStop.StopType.PICKUP:
-            ride.status = RideRequest.Status.PICKING_UP
-            ride.save(update_fields=["status"])
+        driver_actions.start_stop(stop)
 
         return Response({"detail": "Stop started."})
 
@@ -140,79 +357,159 @@ class DriverStopCompleteView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, stop_id):
-        user = request.user
-        buggy = getattr(user, "assigned_buggy", None)
-        if not buggy:
+        buggy_id = get_assigned_buggy_id(request.user, verify=True)
+        if not buggy_id:
             return Response({"detail": "No buggy assigned"}, status=status.HTTP_403_FORBIDDEN)
 
-        stop = get_object_or_404(BuggyRouteStop, id=stop_id, buggy=buggy)
+        stop = get_object_or_404(
+            BuggyRouteStop.objects.select_related("buggy", "ride_request", "poi"), id=stop_id, buggy_id=buggy_id
+        )
         if stop.status != BuggyRouteStop.StopStatus.ON_ROUTE:
             return Response({"detail": "Stop is not ON_ROUTE"}, status=status.HTTP_400_BAD_REQUEST)
 
-        ride = stop.ride_request
+        driver_actions.complete_stop(stop.buggy, stop)
+        refresh_dispatch_rankings(list(Buggy.objects.filter(pk=buggy_id)))
 
-        buggy.current_poi = stop.poi
+        return Response({"detail": "Stop completed."})
 
-        if stop.stop_type == BuggyRouteStop.StopType.PICKUP:
-            buggy.current_onboard_guests += ride.num_guests
-            ride.status = RideRequest.Status.IN_PROGRESS
-            ride.pickup_completed_at = timezone.now()
-            ride.save(update_fields=["status", "pickup_completed_at"])
-        else:
-            buggy.current_onboard_guests -= ride.num_guests
 
-        buggy.save(update_fields=["current_poi", "current_onboard_guests"])
+class DriverSyncView(APIView):
+    """Apply a batch of stop transitions recorded offline on the driver's device."""
+    permission_classes = [IsAuthenticated]
 
-        stop.status = BuggyRouteStop.StopStatus.COMPLETED
-        stop.completed_at = timezone.now()
-        stop.save(update_fields=["status", "completed_at"])
+    def post(self, request):
+        buggy_id = get_assigned_buggy_id(request.user, verify=True)
+        if not buggy_id:
+            return Response({"detail": "No buggy assigned"}, status=status.HTTP_403_FORBIDDEN)
 
-        if stop.stop_type == BuggyRouteStop.StopType.DROPOFF:
-            remaining = ride.route_stops.exclude(status=BuggyRouteStop.StopStatus.COMPLETED)
-            if not remaining.exists():
-                ride.status = RideRequest.Status.COMPLETED
-                ride.dropoff_completed_at = timezone.now()
-                ride.save(update_fields=["status", "dropoff_completed_at"])
+        serializer = DriverSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        actions = [driver_actions.StopAction(**a) for a in serializer.validated_data["actions"]]
 
-        return Response({"detail": "Stop completed."})
+        results = driver_actions.sync_stop_actions(buggy_id, actions)
+        if any(r.action == driver_actions.ACTION_COMPLETE and r.result == driver_actions.RESULT_APPLIED
+               for r in results):
+            refresh_dispatch_rankings(list(Buggy.objects.filter(pk=buggy_id)))
+        return Response({"results": [asdict(r) for r in results]})
 
 
 class MetricsSummaryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        today = timezone.now().date()
-        qs = RideRequest.objects.filter(requested_at__date=today)
-
-        total_rides = qs.count()
-        avg_wait = (
-            qs.filter(assigned_at__isnull=False)
-            .annotate(wait_s=models.ExpressionWrapper(
-                models.F("assigned_at") - models.F("requested_at"),
-                output_field=models.DurationField(),
-            ))
-            .aggregate(avg=models.Avg("wait_s"))["avg"]
-        )
-        avg_wait_s = int(avg_wait.total_seconds()) if avg_wait else None
+        today = timezone.localdate()
+        return Response({"date": today.isoformat(), **metrics.summarize(today)})
+
+
+def _parse_window_bound(value):
+    """Accept an ISO datetime or a bare date (local midnight); None if it isn't one."""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                return None
+            return metrics.day_bucket(day)
+    except ValueError:  # well formed but not a real date, e.g. 2026-02-30
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class MetricsPercentilesView(APIView):
+    """
+    p50/p90/p99 of assignment wait, pickup wait and ride duration (seconds).
+
+    Query params: ``from`` and ``to`` (ISO datetime or date, default today;
+    the window is [from, to), so a bare-date ``to`` is not included),
+    optional ``poi`` code to restrict to rides picked up there.
+    """
+    permission_classes = [IsAuthenticated]
 
-        return Response(
-            {
-                "date": today.isoformat(),
-                "total_rides": total_rides,
-                "avg_wait_time_s": avg_wait_s,
-            }
+    def get(self, request):
+        today = timezone.localdate()
+        start = request.query_params.get("from")
+        end = request.query_params.get("to")
+        start = _parse_window_bound(start) if start else metrics.day_bucket(today)
+        end = _parse_window_bound(end) if end else metrics.day_bucket(today + timedelta(days=1))
+        if start is None or end is None:
+            return Response(
+                {"error": "from and to must be ISO dates or datetimes"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if start >= end:
+            return Response({"error": "from must be before to"}, status=status.HTTP_400_BAD_REQUEST)
+
+        poi_id = None
+        poi_code = request.query_params.get("poi")
+        if poi_code:
+            poi_id = POI.objects.filter(code=poi_code.upper()).values_list("id", flat=True).first()
+            if poi_id is None:
+                return Response({"error": f"Unknown POI code: {poi_code}"}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "poi": poi_code.upper() if poi_code else None,
+            **metrics.percentiles(start, end, poi_id=poi_id),
+        })
+
+
+class ExportView(APIView):
+    """
+    Stream ride or stop history as CSV or NDJSON (Manager only).
+
+    ``GET /api/exports/rides.csv?columns=public_code,status&from=2025-01-01&to=2025-02-01``
+    exports January: the window is [from, to), as for ``manage.py export_history``.
+    The body is gzipped on the fly when the client accepts it or passes ``gzip=1``.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, dataset, fmt):
+        if not ManagerPermission.check(request):
+            return Response({"error": "Manager role required"}, status=status.HTTP_403_FORBIDDEN)
+
+        raw_start = request.query_params.get("from")
+        raw_end = request.query_params.get("to")
+        start = _parse_window_bound(raw_start) if raw_start else None
+        end = _parse_window_bound(raw_end) if raw_end else None
+        if (raw_start and start is None) or (raw_end and end is None):
+            return Response(
+                {"error": "from and to must be ISO dates or datetimes"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if start and end and start >= end:
+            return Response({"error": "from must be before to"}, status=status.HTTP_400_BAD_REQUEST)
+
+        columns = [c.strip() for c in request.query_params.get("columns", "").split(",") if c.strip()]
+        use_gzip = (
+            request.query_params.get("gzip") == "1"
+            or "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
         )
+        try:
+            body = exports.stream_export(dataset, fmt, columns, start, end, gzip=use_gzip)
+        except exports.ExportError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(body, content_type=exports.CONTENT_TYPES[fmt])
+        response["Content-Disposition"] = f'attachment; filename="{dataset}.{fmt}"'
+        response["Vary"] = "Accept-Encoding"
+        if use_gzip:
+            response["Content-Encoding"] = "gzip"
+        return response
 
 
 # ===== Manager CRUD Views =====
 
 class ManagerPermission:
-    """Helper to check if user is a manager."""
+    """Helper to check if user is a manager (re-verified against the user cache for writes)."""
     @staticmethod
     def check(request):
         if not request.user.is_authenticated:
             return False
-        return request.user.role == User.Role.MANAGER
+        verify = request.method not in SAFE_METHODS
+        return get_role(request.user, verify=verify) == User.Role.MANAGER
 
 
 class BuggyCRUDView(APIView):
@@ -237,10 +534,20 @@ class BuggyCRUDView(APIView):
             return Response({"error": "Manager role required"}, status=status.HTTP_403_FORBIDDEN)
         
         buggy = get_object_or_404(Buggy, id=buggy_id)
+        before = (buggy.current_poi_id, buggy.status)
         from core.serializers import BuggyCreateUpdateSerializer
         serializer = BuggyCreateUpdateSerializer(buggy, data=request.data, partial=True)
         if serializer.is_valid():
-            buggy = serializer.save()
+            with transaction.atomic():
+                buggy = serializer.save()
+                changed = (buggy.current_poi_id, buggy.status) != before
+                if changed:
+                    # moved, or joined or left the fleet: rankings and plans scored
+                    # against its old position must not be used any more
+                    bump_route_versions([buggy.id])
+            if changed:
+                refresh_dispatch_rankings(list(Buggy.objects.filter(pk=buggy.id)))
+                buggy.refresh_from_db()
             return Response(BuggySummarySerializer(buggy).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -289,7 +596,12 @@ class DriverCRUDView(APIView):
         from core.serializers import DriverCreateUpdateSerializer
         serializer = DriverCreateUpdateSerializer(data=request.data)
         if serializer.is_valid():
-            driver = serializer.save()
+            try:
+                driver = serializer.save()
+            except passwords.HashTimeout:
+                return _hash_unavailable(
+                    "Password hashing is temporarily unavailable, please retry.", "HASH_UNAVAILABLE"
+                )
             return Response(DriverCreateUpdateSerializer(driver).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -302,7 +614,12 @@ class DriverCRUDView(APIView):
         from core.serializers import DriverCreateUpdateSerializer
         serializer = DriverCreateUpdateSerializer(driver, data=request.data, partial=True)
         if serializer.is_valid():
-            driver = serializer.save()
+            try:
+                driver = serializer.save()
+            except passwords.HashTimeout:
+                return _hash_unavailable(
+                    "Password hashing is temporarily unavailable, please retry.", "HASH_UNAVAILABLE"
+                )
             return Response(DriverCreateUpdateSerializer(driver).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
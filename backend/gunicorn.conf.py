@@ -0,0 +1,23 @@
+# gunicorn.conf.py
+"""
+gunicorn server hooks, picked up from the working directory by ``gunicorn``.
+
+Keep the per-worker Prometheus files (core.services.telemetry) consistent:
+a new server starts from an empty directory, and an exited worker's values
+are folded into the shared dead-worker file before its pid can be reused.
+"""
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "buggy_project.settings")
+
+
+def on_starting(server):
+    from core.services import telemetry
+
+    telemetry.clear_dir()
+
+
+def child_exit(server, worker):
+    from core.services import telemetry
+
+    telemetry.mark_process_dead(worker.pid)